@@ -17,7 +17,7 @@ import json
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
-def create_app():
+def create_app(async_mode=None):
     """
     Creates and configures the Flask application.
 
@@ -26,6 +26,10 @@ def create_app():
         - Flask-CORS for Cross-Origin Resource Sharing.
         - Logging for debugging and monitoring.
 
+    Args:
+        async_mode (bool): Serve the I/O-heavy routes with async views backed by the
+            Firestore AsyncClient. Defaults to `Config.ASYNC_MODE`.
+
     Returns:
         Flask: The initialized Flask application instance.
     """
@@ -40,6 +44,15 @@ def create_app():
     # Load configuration from the Config object
     app.config.from_object(Config)
 
+    # Take the client IP from X-Forwarded-For only as far as our own proxies appended it
+    if Config.TRUSTED_PROXY_HOPS > 0:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS)
+
+    # Serialize Firestore timestamps natively (and use orjson when installed)
+    from .serialization import FirestoreJSONProvider
+    app.json = FirestoreJSONProvider(app)
+
     # Define allowed file extensions for uploads (used for validation)
     app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg'}
 
@@ -64,15 +77,49 @@ def create_app():
     # Enable Cross-Origin Resource Sharing (CORS)
     CORS(app)
 
+    # Shed load per route class before slow backends tie up every thread
+    from .admission import init_admission
+    init_admission(app)
+
+    # Profile requests on demand (X-Profile header) or by sampling, if configured
+    from .profiling import init_profiler
+    init_profiler(app)
+
+    # Log slow and sampled requests with their Firestore and AppWrite calls
+    from .request_log import init_request_log
+    init_request_log(app)
+
+    # Compress large JSON responses (gzip, or brotli when installed)
+    from .http_cache import init_compression
+    init_compression(app)
+
     # Configure logging
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
     logger.info("Server is starting...")
 
+    if async_mode is None:
+        async_mode = Config.ASYNC_MODE
+
+    if async_mode:
+        # Run async views on the shared event loop instead of a fresh loop per request,
+        # so the Firestore AsyncClient stays bound to a single loop.
+        from .aio import async_to_sync
+        app.async_to_sync = async_to_sync
+
+        # Registered first so its routes take precedence over the synchronous ones
+        from .async_views import async_bp
+        app.register_blueprint(async_bp)
+        logger.info("Async serving mode enabled")
+
     # Import and register the main blueprint for views
     from .views import main_bp
     app.register_blueprint(main_bp)
 
+    # Push events over a WebSocket as well as SSE when flask-sock is installed
+    from .events import init_websocket
+    init_websocket(app)
+
     # Register auth blueprint (Firebase/OTP/Profiles)
     try:
         from .auth import auth_bp
@@ -80,4 +127,8 @@ def create_app():
     except Exception as e:
         logger.warning(f"Auth blueprint not registered: {e}")
 
+    # Periodic maintenance: feed cache, token signing keys, stale reports, message archive
+    from .scheduler import start_scheduler
+    start_scheduler()
+
     return app
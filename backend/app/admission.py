@@ -0,0 +1,262 @@
+"""
+admission.py
+
+Per-worker admission control (load shedding) by route class.
+
+Requests are grouped into classes — `reads`, `writes`, `auth` and `uploads` —
+each with its own bound on in-flight requests and its own latency budget for
+waiting in line. When Firestore or AppWrite slows down, the requests of the
+affected class pile up against that bound instead of taking every server
+thread, and new arrivals are rejected with a fast 503 once their expected wait
+exceeds the budget. A storage outage therefore degrades the upload path
+without blocking the rest of the API.
+
+Reads are prioritized: part of the worker's capacity is reserved for them, and
+other classes are not admitted ahead of waiting reads.
+"""
+
+import math
+import threading
+import time
+from flask import g, jsonify, request
+from config import Config
+from . import metrics
+
+# Routes that are not plain reads (GET) or writes (other methods), by (method, rule).
+# Uploads are recognized by their multipart body instead (see `route_class`).
+ROUTE_CLASSES = {
+    ("POST", "/users"): "auth",
+    ("POST", "/login"): "auth",
+    ("POST", "/signup"): "auth",
+    ("POST", "/firebase-google-login"): "auth",
+    ("POST", "/get_messages"): "reads",
+    ("POST", "/get_chats"): "reads",
+    ("POST", "/check-user-exists"): "reads",
+}
+
+# Long-lived streams, monitoring and cron triggers are never shed
+EXEMPT_RULES = {"/events", "/ws", "/metrics", "/cron/maintenance"}
+
+
+class RouteClass:
+    """
+    The admission state of one route class.
+    """
+
+    def __init__(self, name, limit, budget, priority=False):
+        """
+        Args:
+            name (str): The class name, used in metrics.
+            limit (int): Maximum number of requests of this class in flight.
+            budget (float): Maximum seconds a request may wait for admission.
+            priority (bool): May use the capacity reserved for priority classes.
+        """
+        self.name = name
+        self.limit = max(1, limit)
+        self.budget = budget
+        self.priority = priority
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = None
+
+    def expected_wait(self):
+        """
+        Estimates how long a new arrival would wait, from the average service time.
+        """
+        if self.service_time is None:
+            return 0.0
+        return (self.waiting + 1) * self.service_time / self.limit
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "avg_ms": round(self.service_time * 1000, 1) if self.service_time is not None else None,
+        }
+
+
+class AdmissionController:
+    """
+    Admits requests by route class within a shared per-worker capacity.
+    """
+
+    def __init__(self, capacity, priority_reserve, classes):
+        """
+        Args:
+            capacity (int): Maximum number of requests in flight in the worker.
+            priority_reserve (int): Slots of `capacity` only priority classes may use.
+            classes (list): The `RouteClass`es.
+        """
+        self.capacity = max(1, capacity)
+        self.priority_reserve = min(max(0, priority_reserve), self.capacity - 1)
+        self.classes = {route_class.name: route_class for route_class in classes}
+        self.in_flight = 0
+        self._priority_waiting = 0
+        self._cond = threading.Condition()
+        metrics.register_collector("admission", self.stats)
+
+    def _can_run(self, route_class):
+        if route_class.in_flight >= route_class.limit:
+            return False
+        if route_class.priority:
+            return self.in_flight < self.capacity
+        return self.in_flight < self.capacity - self.priority_reserve and not self._priority_waiting
+
+    def acquire(self, name):
+        """
+        Waits for a slot of a route class within its latency budget.
+
+        Args:
+            name (str): The route class.
+
+        Returns:
+            tuple: (admitted, retry_after); `retry_after` is a suggested number
+            of seconds before retrying when the request is rejected.
+        """
+        route_class = self.classes[name]
+        with self._cond:
+            if not self._can_run(route_class):
+                expected = route_class.expected_wait()
+                if expected > route_class.budget:
+                    metrics.incr(f"admission.{name}.shed")
+                    return False, expected
+                deadline = time.monotonic() + route_class.budget
+                route_class.waiting += 1
+                if route_class.priority:
+                    self._priority_waiting += 1
+                try:
+                    while not self._can_run(route_class):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            metrics.incr(f"admission.{name}.timed_out")
+                            return False, route_class.budget
+                        self._cond.wait(remaining)
+                finally:
+                    route_class.waiting -= 1
+                    if route_class.priority:
+                        self._priority_waiting -= 1
+                    # A class blocked behind waiting priority requests may run now
+                    self._cond.notify_all()
+            route_class.in_flight += 1
+            self.in_flight += 1
+        metrics.incr(f"admission.{name}.admitted")
+        return True, 0.0
+
+    def release(self, name, duration):
+        """
+        Frees the slot of a finished request and records its service time.
+
+        Args:
+            name (str): The route class.
+            duration (float): Seconds the request was in flight.
+        """
+        route_class = self.classes[name]
+        with self._cond:
+            route_class.in_flight -= 1
+            self.in_flight -= 1
+            if route_class.service_time is None:
+                route_class.service_time = duration
+            else:
+                route_class.service_time = 0.8 * route_class.service_time + 0.2 * duration
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Reports the worker's in-flight requests and the state of each class.
+
+        Returns:
+            dict: Capacity, in-flight count and per-class statistics.
+        """
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "classes": {name: route_class.stats() for name, route_class in self.classes.items()},
+            }
+
+
+controller = AdmissionController(
+    capacity=Config.ADMISSION_MAX_IN_FLIGHT,
+    priority_reserve=Config.ADMISSION_READ_RESERVE,
+    classes=[
+        RouteClass("reads", Config.ADMISSION_READ_LIMIT, Config.ADMISSION_READ_BUDGET, priority=True),
+        RouteClass("writes", Config.ADMISSION_WRITE_LIMIT, Config.ADMISSION_WRITE_BUDGET),
+        RouteClass("auth", Config.ADMISSION_AUTH_LIMIT, Config.ADMISSION_AUTH_BUDGET),
+        RouteClass("uploads", Config.ADMISSION_UPLOAD_LIMIT, Config.ADMISSION_UPLOAD_BUDGET),
+    ],
+)
+
+
+def route_class():
+    """
+    Returns the route class of the current request.
+
+    Multipart writes carry a file for AppWrite storage and are `uploads`;
+    JSON writes such as `POST /found-items` stay in their route's class.
+
+    Returns:
+        str: The class name, or None for exempt and unmatched requests.
+    """
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    if rule is None or rule in EXEMPT_RULES or request.method == "OPTIONS":
+        return None
+    name = ROUTE_CLASSES.get((request.method, rule))
+    if name is not None:
+        return name
+    if request.method in ("POST", "PUT", "PATCH") and request.mimetype == "multipart/form-data":
+        return "uploads"
+    return "reads" if request.method in ("GET", "HEAD") else "writes"
+
+
+def server_busy(retry_after):
+    """
+    Builds the 503 response for a shed request.
+
+    Args:
+        retry_after (float): Suggested seconds before retrying.
+
+    Returns:
+        Response: The 503 JSON response with a `Retry-After` header.
+    """
+    response = jsonify({"error": "Server busy, please retry"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, math.ceil(min(retry_after, 60))))
+    return response
+
+
+def admit_request():
+    """
+    `before_request` hook: admits the request or rejects it with 503.
+    """
+    name = route_class()
+    if name is None:
+        return None
+    admitted, retry_after = controller.acquire(name)
+    if not admitted:
+        return server_busy(retry_after)
+    g.admission = (name, time.monotonic())
+    return None
+
+
+def release_request(exc=None):
+    """
+    `teardown_request` hook: releases the slot of an admitted request.
+    """
+    admission = g.pop("admission", None)
+    if admission is not None:
+        name, started = admission
+        controller.release(name, time.monotonic() - started)
+
+
+def init_admission(app):
+    """
+    Enables admission control for the application, if `ADMISSION_ENABLED` is set.
+
+    Args:
+        app (Flask): The application to configure.
+    """
+    if not Config.ADMISSION_ENABLED:
+        return
+    app.before_request(admit_request)
+    app.teardown_request(release_request)
@@ -0,0 +1,91 @@
+"""
+aio.py
+
+Runtime support for the async serving mode.
+
+A single event loop runs on a background thread for the lifetime of the
+process. Async views and the async models are executed on that loop, so the
+Firestore ``AsyncClient`` and the AppWrite HTTP client are always bound to the
+same loop and independent I/O from many requests is multiplexed on it.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from functools import wraps
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """
+    Returns the shared background event loop, starting it on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The loop that runs all async request work.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="aio-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def _transfer(task, future):
+    """
+    Copies the outcome of a finished task onto a concurrent future.
+    """
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+def run(coro):
+    """
+    Runs a coroutine on the shared loop and blocks until it completes.
+
+    The caller's context variables (including the Flask request context)
+    are carried over to the task.
+
+    Args:
+        coro (coroutine): The coroutine to run.
+
+    Returns:
+        object: The coroutine's result.
+    """
+    loop = get_loop()
+    ctx = contextvars.copy_context()
+    future = concurrent.futures.Future()
+
+    def _start():
+        task = ctx.run(loop.create_task, coro)
+        task.add_done_callback(lambda t: _transfer(t, future))
+
+    loop.call_soon_threadsafe(_start)
+    return future.result()
+
+
+def async_to_sync(func):
+    """
+    Wraps a coroutine function so it runs on the shared loop.
+
+    Installed as ``Flask.async_to_sync`` in async mode, so ``async def`` views
+    are awaited on the shared loop instead of a fresh loop per request.
+
+    Args:
+        func (callable): The coroutine function to wrap.
+
+    Returns:
+        callable: A synchronous function with the same signature.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run(func(*args, **kwargs))
+    return wrapper
@@ -0,0 +1,415 @@
+"""
+async_models.py
+
+Async counterparts of the Firestore models in ``models.py``, used by the async
+serving mode. They read and write the same documents as the synchronous models
+but go through the Firestore ``AsyncClient``, so independent queries can be
+awaited concurrently on the shared event loop (see ``aio.py``).
+"""
+
+import asyncio
+import logging
+from firebase_admin import firestore, firestore_async
+from . import events, metrics
+from .dedupe import minhash
+from .models import (conversation_key, conversation_queries, merge_conversation_results,
+                     merge_message_sync, changes_after_query, _change_item, _message_item, sum_unread,
+                     archived_page, archived_after, archive_may_hold, feed_cache, item_reads, lost_items_key,
+                     item_stats_batch, lost_item_data, lost_item_batch, duplicate_candidates_query,
+                     stale_signatures_batch, duplicate_merge_update, record_duplicate_merge, pick_duplicate,
+                     chunk_counts_query, pick_chunks, chunks_after_query, chunk_summaries_query,
+                     prepare_message, message_batch, live_message_count, unread_counters_query,
+                     user_messages_query, build_chat_list)
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Initialize Firestore async client
+db = firestore_async.client()
+
+
+def _to_item(doc):
+    """
+    Converts a Firestore snapshot into a response dict.
+
+    Args:
+        doc (DocumentSnapshot): The snapshot to convert.
+
+    Returns:
+        dict: The document data with `_id` set and `created_at` as a timestamp.
+    """
+    item_data = doc.to_dict()
+    item_data['_id'] = doc.id
+    if 'created_at' in item_data and hasattr(item_data['created_at'], 'timestamp'):
+        item_data['created_at'] = item_data['created_at'].timestamp()
+    return item_data
+
+
+async def _apply_skip(query, skip):
+    """
+    Positions a query after its first `skip` documents.
+
+    Args:
+        query (AsyncQuery): The ordered query.
+        skip (int): The number of documents to skip.
+
+    Returns:
+        AsyncQuery: The query starting after the skipped documents.
+    """
+    if skip > 0:
+        last_doc = None
+        async for doc in query.select(['created_at']).limit(skip).stream():
+            last_doc = doc
+        if last_doc:
+            query = query.start_after(last_doc)
+    return query
+
+
+async def _fetch(query, limit, skip=0, fields=None):
+    """
+    Streams one page of an ordered query.
+
+    Args:
+        query (AsyncQuery): The ordered query.
+        limit (int): The maximum number of documents to return.
+        skip (int): The number of documents to skip.
+        fields (list): Optional field paths to project; only these fields are read.
+
+    Returns:
+        list: The documents as response dicts.
+    """
+    query = await _apply_skip(query, skip)
+    if fields:
+        query = query.select(fields)
+    return [_to_item(doc) async for doc in query.limit(limit).stream()]
+
+
+async def _record_stats(counter, location):
+    """
+    Best-effort statistics update after an item write (see `ItemStatsModel.record`).
+    """
+    try:
+        await item_stats_batch(db, counter, location).commit()
+    except Exception as e:
+        metrics.incr("item_stats.failed")
+        logger.warning(f"Updating item statistics failed: {e}")
+
+
+class AsyncFoundItemModel:
+    """
+    Async database operations related to found items.
+    """
+
+    @staticmethod
+    async def get_found_items(limit=10, skip=0, fields=None):
+        """
+        Retrieves a list of found items.
+
+        Args:
+            limit (int): The maximum number of items to retrieve.
+            skip (int): The number of items to skip.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            list: A list of found items with their details.
+        """
+        query = db.collection('found_items').order_by('created_at', direction=firestore.Query.DESCENDING)
+        return await _fetch(query, limit, skip, fields)
+
+
+class AsyncLostItemModel:
+    """
+    Async database operations related to lost items.
+    """
+
+    @staticmethod
+    async def report_lost_item(description, location, image_path, reported_by, coordinates=None):
+        """
+        Reports a lost item, merging or flagging near-duplicates like
+        `LostItemModel.report_lost_item`.
+
+        Args:
+            description (str): A description of the lost item.
+            location (str): The location where the item was lost.
+            image_path (str): Path to the image of the lost item.
+            reported_by (str): The user who reported the lost item.
+            coordinates (tuple): Optional (lat, lng), stored with a geohash.
+
+        Returns:
+            tuple: (ID of the reported lost item, True if the report was merged
+            into an existing one, whose ID is returned).
+        """
+        signature, duplicate = await AsyncLostItemModel._check_duplicate(description, location)
+        if duplicate and duplicate['reported_by'] == reported_by and Config.DEDUPE_MERGE:
+            if await AsyncLostItemModel._merge(duplicate['item_id'], image_path):
+                return duplicate['item_id'], True
+
+        data = lost_item_data(description, location, image_path, reported_by, coordinates, duplicate)
+        item_ref, batch = lost_item_batch(db, data, signature)
+        await batch.commit()
+        await _record_stats('lost', location)
+        return item_ref.id, False
+
+    @staticmethod
+    async def _check_duplicate(description, location):
+        """
+        Async counterpart of `DuplicateReportModel.check`.
+        """
+        if not Config.DEDUPE_ENABLED:
+            return None, None
+        signature = minhash(description, location)
+        try:
+            candidates = [doc async for doc in duplicate_candidates_query(db, signature).stream()]
+            duplicate, stale = pick_duplicate(signature, candidates)
+            if stale:
+                await stale_signatures_batch(db, stale).commit()
+        except Exception as e:
+            logger.warning(f"Duplicate report check failed: {e}")
+            return signature, None
+        metrics.incr("dedupe.duplicates" if duplicate else "dedupe.unique")
+        return signature, duplicate
+
+    @staticmethod
+    async def _merge(item_id, image_path=None):
+        """
+        Async counterpart of `DuplicateReportModel.merge`.
+        """
+        item_ref = db.collection('lost_items').document(item_id)
+        update = duplicate_merge_update((await item_ref.get()).to_dict(), image_path)
+        if update is None:
+            return False
+        await item_ref.update(update)
+        record_duplicate_merge(update)
+        return True
+
+    @staticmethod
+    async def get_lost_items(limit=10, skip=0, fields=None):
+        """
+        Retrieves a list of lost items (approved and not found).
+
+        Args:
+            limit (int): The maximum number of items to retrieve.
+            skip (int): The number of items to skip.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            list: A list of lost items with their details.
+        """
+        query = db.collection('lost_items').where('is_found', '==', False).where('is_approved', '==', True)
+        query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        items = await item_reads.do_async(lost_items_key(limit, skip, fields),
+                                          lambda: _fetch(query, limit, skip, fields))
+        # Concurrent callers share the fetched list, and callers add response fields in place
+        return [dict(item) for item in items]
+
+    @staticmethod
+    async def get_recent_feed(limit=10, fields=None):
+        """
+        Retrieves a feed of recent lost items (approved and not found).
+
+        Shares the feed cache of the synchronous model.
+
+        Args:
+            limit (int): The maximum number of items to retrieve.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            list: A list of recent lost items.
+        """
+        key = (limit, tuple(fields) if fields else None)
+        items = feed_cache.get(key)
+        if items is None:
+            items = await AsyncLostItemModel.get_lost_items(limit=limit, skip=0, fields=fields)
+            feed_cache.set(key, items)
+        return [dict(item) for item in items]
+
+
+class AsyncMessageChunkModel:
+    """
+    Async reads of the message archive chunks (see `models.MessageChunkModel`).
+    """
+
+    @staticmethod
+    async def get_page(key, skip, limit):
+        """
+        Retrieves a newest-first page of a conversation's archived messages.
+
+        Args:
+            key (str): The conversation key.
+            skip (int): The number of archived messages to skip.
+            limit (int): The maximum number of messages to return.
+
+        Returns:
+            list: The messages, newest first.
+        """
+        count_docs = [doc async for doc in chunk_counts_query(db, key).stream()]
+        refs, skip = pick_chunks(count_docs, skip, limit)
+        if not refs:
+            return []
+        chunks = {doc.id: doc.to_dict() async for doc in db.get_all(refs) if doc.exists}
+        return archived_page([chunks[ref.id] for ref in refs if ref.id in chunks], skip, limit)
+
+    @staticmethod
+    async def get_after(key, created_at, message_id, limit):
+        """
+        Retrieves a conversation's archived messages after a sync cursor, oldest first.
+
+        Args:
+            key (str): The conversation key.
+            created_at (datetime): The cursor's message time.
+            message_id (str): The cursor's message ID, or None.
+            limit (int): The maximum number of messages to return.
+
+        Returns:
+            list: The messages after the cursor.
+        """
+        chunks = [doc.to_dict() async for doc in chunks_after_query(db, key, created_at).stream()]
+        return archived_after(chunks, created_at, message_id, limit)
+
+    @staticmethod
+    async def get_chat_summaries(user_id):
+        """
+        Retrieves the last archived message of each of a user's conversations.
+
+        Args:
+            user_id (str): The user ID/email.
+
+        Returns:
+            list: Message dicts (`author_id`, `receiver_id`, `text`, `created_at`).
+        """
+        return [doc.get('last_message') async for doc in chunk_summaries_query(db, user_id).stream()
+                if doc.get('last_message')]
+
+
+class AsyncMessageModel:
+    """
+    Async database operations related to user messages.
+    """
+
+    @staticmethod
+    async def send_message(data):
+        """
+        Sends a new message.
+
+        Args:
+            data (dict): The message data.
+
+        Returns:
+            str: The unique ID of the sent message.
+        """
+        message_ref, batch = message_batch(db, prepare_message(data))
+        await batch.commit()
+        events.publish_message(message_ref.id, data)
+        return message_ref.id
+
+    @staticmethod
+    async def get_messages(author_id, receiver_id, limit=50, skip=0):
+        """
+        Retrieves messages between two users.
+
+        The queries covering the conversation (see `models.conversation_queries`)
+        run concurrently; when the live messages run out, the page continues into
+        the archive chunks.
+
+        Args:
+            author_id (str): The ID of the author.
+            receiver_id (str): The ID of the receiver.
+            limit (int): The maximum number of messages to retrieve.
+            skip (int): The number of messages to skip.
+
+        Returns:
+            list: A list of messages.
+        """
+        messages_ref = db.collection('messages')
+        queries = conversation_queries(messages_ref, author_id, receiver_id)
+        results = await asyncio.gather(*[
+            _fetch(query.order_by('created_at', direction=firestore.Query.DESCENDING), limit, skip)
+            for query in queries
+        ])
+        messages = merge_conversation_results(results)
+        messages.sort(key=lambda x: x.get('created_at', 0), reverse=True)
+        messages = messages[:limit]
+
+        # Continue into the archive once the live tail is exhausted
+        if len(messages) < limit:
+            archived_skip = 0
+            if skip > 0 and not messages:
+                counts = await asyncio.gather(*[query.count().get() for query in queries])
+                live = live_message_count([result[0][0].value for result in counts])
+                archived_skip = max(0, skip - live)
+            key = conversation_key(author_id, receiver_id)
+            messages += await AsyncMessageChunkModel.get_page(key, archived_skip, limit - len(messages))
+        return messages
+
+    @staticmethod
+    async def get_messages_since(author_id, receiver_id, since, limit=50):
+        """
+        Retrieves what changed in a conversation after a sync cursor.
+
+        The message queries and the change records are read concurrently.
+
+        Args:
+            author_id (str): The ID of one participant.
+            receiver_id (str): The ID of the other participant.
+            since (tuple): The parsed cursor (see `models.parse_message_cursor`).
+            limit (int): The maximum number of messages and of changes to return.
+
+        Returns:
+            dict: The sync result (see `models.merge_message_sync`).
+        """
+        created_at, message_id, changed_at, change_id = since
+        cursor = [created_at, message_id] if message_id else [created_at]
+        messages_ref = db.collection('messages')
+
+        async def _newer(query):
+            query = query.order_by('created_at').order_by('__name__').start_after(cursor)
+            return [_message_item(doc) async for doc in query.limit(limit).stream()]
+
+        async def _changes():
+            query = changes_after_query(db, conversation_key(author_id, receiver_id), changed_at, change_id)
+            return [_change_item(doc) async for doc in query.limit(limit).stream()]
+
+        async def _archived():
+            if not archive_may_hold(created_at):
+                return []
+            return await AsyncMessageChunkModel.get_after(conversation_key(author_id, receiver_id), created_at, message_id, limit)
+
+        *results, changes, archived = await asyncio.gather(
+            *[_newer(query) for query in conversation_queries(messages_ref, author_id, receiver_id)],
+            _changes(),
+            _archived(),
+        )
+        return merge_message_sync(results, changes, since, limit, archived)
+
+    @staticmethod
+    async def get_chats_for_user(user_id):
+        """
+        Retrieves all chats for a user.
+
+        The author and receiver queries, the unread counters and the archive
+        summaries are read concurrently.
+
+        Args:
+            user_id (str): The user ID/email.
+
+        Returns:
+            list: A list of chats with latest message info.
+        """
+        messages_ref = db.collection('messages')
+
+        async def _collect(field, op='=='):
+            return [doc.to_dict() async for doc in user_messages_query(messages_ref, field, op, user_id).stream()]
+
+        async def _unread():
+            return sum_unread([doc async for doc in unread_counters_query(db, user_id).stream()])
+
+        if Config.MESSAGE_READ_MODE == 'conversation':
+            messages, unread, archived = await asyncio.gather(
+                _collect('participants', 'array_contains'), _unread(), AsyncMessageChunkModel.get_chat_summaries(user_id))
+            sent = [msg for msg in messages if msg.get('author_id') == user_id]
+            received = [msg for msg in messages if msg.get('author_id') != user_id]
+        else:
+            sent, received, unread, archived = await asyncio.gather(
+                _collect('author_id'), _collect('receiver_id'), _unread(), AsyncMessageChunkModel.get_chat_summaries(user_id))
+
+        return build_chat_list(user_id, sent, received, archived, unread)
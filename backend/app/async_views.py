@@ -0,0 +1,192 @@
+"""
+async_views.py
+
+Async variants of the I/O-heavy routes, registered ahead of the main blueprint
+when the app runs in async mode. They serve the same URLs and payloads as
+their counterparts in ``views.py`` but await the async models and the async
+AppWrite client, so a request waiting on Firestore or storage does not hold
+the event loop.
+"""
+
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.utils import secure_filename
+from .async_models import AsyncLostItemModel, AsyncFoundItemModel, AsyncMessageModel
+from .storage import upload_image_to_storage_async
+from .geo import parse_coordinates
+from .http_cache import conditional_json
+from .models import parse_message_cursor, LostItemModel, FoundItemModel
+from .serialization import wants_stream, stream_json_array
+from .views import allowed_file, attach_image_urls, with_image_url, parse_fields, projection_for, FEED_CARD_FIELDS
+
+async_bp = Blueprint("async_main", __name__)
+
+
+@async_bp.route('/lost-items', methods=['POST'])
+async def report_lost_item():
+    """
+    Endpoint to report a lost item (async variant).
+
+    @return: JSON response with success message or error.
+    """
+    image_url = None
+    if 'image' in request.files:
+        file = request.files['image']
+
+        if file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        if file and allowed_file(file.filename):
+            try:
+                filename = secure_filename(file.filename)
+                image_url = await upload_image_to_storage_async(file.read(), filename, folder='lost-items')
+            except Exception as e:
+                return jsonify({"error": f"Failed to upload image: {str(e)}"}), 500
+        else:
+            return jsonify({"error": "Invalid file type"}), 400
+
+    data = request.form
+
+    description = data.get("description")
+    location = data.get("location")
+    reported_by = data.get("reported_by")
+
+    if not description or not location or not reported_by:
+        return jsonify({"error": "Missing required fields"}), 400
+
+    try:
+        coordinates = parse_coordinates(data.get("lat"), data.get("lng"))
+    except ValueError:
+        return jsonify({"error": "Invalid coordinates"}), 400
+
+    lost_item_id, merged = await AsyncLostItemModel.report_lost_item(
+        description=description,
+        location=location,
+        image_path=image_url,
+        reported_by=reported_by,
+        coordinates=coordinates,
+    )
+    if merged:
+        return jsonify({"message": "Lost item already reported", "id": lost_item_id, "duplicate": True}), 200
+    return jsonify({"message": "Lost item reported successfully", "id": lost_item_id}), 201
+
+
+@async_bp.route('/lost-items', methods=['GET'])
+async def get_lost_items():
+    """
+    Endpoint to retrieve lost items (async variant).
+
+    Streamed pages (see `wants_stream`) are read with the synchronous model
+    iterator, since Flask can only send a synchronous generator as the body.
+
+    @return: JSON response with list of lost items.
+    """
+    limit = int(request.args.get("limit", 10))
+    skip = int(request.args.get("skip", 0))
+
+    fields = parse_fields()
+
+    if wants_stream(limit):
+        items = LostItemModel.iter_lost_items(limit=limit, skip=skip, fields=projection_for(fields))
+        return stream_json_array(items, transform=lambda item: with_image_url(item, fields))
+
+    items = await AsyncLostItemModel.get_lost_items(limit=limit, skip=skip, fields=projection_for(fields))
+    attach_image_urls(items, fields)
+
+    return conditional_json(items)
+
+
+@async_bp.route('/found-items', methods=['GET'])
+async def get_found_items():
+    """
+    Endpoint to retrieve found items (async variant).
+
+    Streamed pages are read like in `get_lost_items`.
+
+    @return: JSON response with list of found items.
+    """
+    limit = int(request.args.get("limit", 100))
+    skip = int(request.args.get("skip", 0))
+
+    fields = parse_fields()
+
+    if wants_stream(limit):
+        items = FoundItemModel.iter_found_items(limit=limit, skip=skip, fields=projection_for(fields))
+        return stream_json_array(items, transform=lambda item: with_image_url(item, fields))
+
+    items = await AsyncFoundItemModel.get_found_items(limit=limit, skip=skip, fields=projection_for(fields))
+    attach_image_urls(items, fields)
+
+    return conditional_json(items)
+
+
+@async_bp.route("/activity-feed", methods=["GET"])
+async def activity_feed():
+    """
+    Endpoint to retrieve a feed of recent lost items (async variant).
+
+    @return: JSON response with activity feed.
+    """
+    limit = int(request.args.get("limit", 10))
+    fields = parse_fields(default=FEED_CARD_FIELDS)
+    feed = await AsyncLostItemModel.get_recent_feed(limit=limit, fields=projection_for(fields))
+    if fields is not None:
+        attach_image_urls(feed, fields)
+    return conditional_json(feed)
+
+
+@async_bp.route('/send_message', methods=['POST'])
+async def send_message():
+    """
+    Endpoint to send a message (async variant).
+
+    @return: JSON response with the `message_id` of the created message.
+    """
+    data = request.json
+    if not data.get("text") or not data.get("author_id") or not data.get("created_at"):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    message_id = await AsyncMessageModel.send_message(data)
+    return jsonify({"message_id": message_id}), 201
+
+
+@async_bp.route('/get_messages', methods=['POST'])
+async def get_messages():
+    """
+    Endpoint to retrieve messages between two users (async variant).
+
+    @return: JSON response with the list of messages.
+    """
+    data = request.json
+    author_id = data.get("author_id")
+    receiver_id = data.get("receiver_id")
+    limit = int(request.args.get("limit", 50))
+    skip = int(request.args.get("skip", 0))
+
+    since = data.get("since") or request.args.get("since")
+    if since:
+        try:
+            cursor = parse_message_cursor(since)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = max(1, min(limit, current_app.config.get("MESSAGE_SYNC_MAX_LIMIT", 200)))
+        return jsonify(await AsyncMessageModel.get_messages_since(author_id, receiver_id, cursor, limit=limit)), 200
+
+    messages = await AsyncMessageModel.get_messages(author_id, receiver_id, limit=limit, skip=skip)
+    return jsonify(messages), 200
+
+
+@async_bp.route('/get_chats', methods=['POST'])
+async def get_chats():
+    """
+    Endpoint to retrieve all chats for a user (async variant).
+
+    @return: JSON response with the list of chats.
+    """
+    data = request.json
+    user_id = data.get("user_id")
+
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    chat_list = await AsyncMessageModel.get_chats_for_user(user_id)
+    return jsonify(chat_list), 200
@@ -1,11 +1,26 @@
 from flask import Blueprint, request, jsonify
-from firebase_admin import auth as fb_auth, credentials, initialize_app, get_app, firestore
-from .models import UserModel
+import firebase_admin
+from firebase_admin import auth as fb_auth, credentials, initialize_app, get_app
+from .models import UserModel, DuplicateUserError
+from .views import parse_fields, projection_for
+from .ratelimit import auth_limiter
+from . import metrics
+from config import Config
+from collections import OrderedDict
 import os
 import base64
+import hashlib
 import json
+import logging
+import threading
+import time
 import jwt  # PyJWT
 
+logger = logging.getLogger(__name__)
+
+# Google's signing certificates for Firebase ID tokens
+ID_TOKEN_CERT_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -28,6 +43,116 @@ def _ensure_firebase_admin():
             pass
 
 
+class _VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified ID token claims, keyed by a SHA-256 of the token.
+
+    Entries expire at the token's own `exp`, so a token is verified once and its
+    claims are reused until it would be rejected anyway.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.incr('auth.token_cache.hit')
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            metrics.incr('auth.token_cache.miss')
+            return None
+
+    def put(self, token, claims):
+        expires_at = claims.get('exp')
+        if self.max_size <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[self._key(token)] = (expires_at, dict(claims))
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_token_cache = _VerifiedTokenCache(Config.TOKEN_CACHE_SIZE)
+metrics.register_collector('auth.token_cache', _token_cache.stats)
+
+
+def _verify_id_token(token):
+    """
+    Verifies a Firebase ID token, reusing the claims of tokens verified before.
+
+    Raises the same errors as `firebase_admin.auth.verify_id_token` for invalid tokens.
+    """
+    claims = _token_cache.get(token)
+    if claims is not None:
+        return claims
+    claims = fb_auth.verify_id_token(token)
+    _token_cache.put(token, claims)
+    return claims
+
+
+def refresh_signing_keys():
+    """
+    Re-fetches Google's ID token signing certificates into the SDK's HTTP cache.
+
+    The Admin SDK verifies tokens through a cache-control aware session; fetching
+    the certificates with `no-cache` replaces the cached copy, so requests never
+    wait on a certificate download when the old copy expires.
+
+    If the SDK no longer exposes that session, the refresh is skipped with an
+    error log and the `auth.signing_keys.unsupported` metric; tokens are then
+    still verified with the SDK's own certificate caching.
+
+    Returns:
+        bool: True if the certificates were refreshed.
+    """
+    _ensure_firebase_admin()
+    try:
+        # The certificate session is internal to the Admin SDK (checked against firebase_admin 7.x),
+        # so a release that moves it disables the refresh; report that instead of failing quietly
+        cert_request = fb_auth._get_client(None)._token_verifier.request
+        if not callable(cert_request):
+            raise TypeError(f"{type(cert_request).__name__} is not callable")
+    except Exception as e:
+        metrics.incr('auth.signing_keys.unsupported')
+        logger.error(f"Token key refresh is not supported by firebase_admin {firebase_admin.__version__}, "
+                     f"falling back to the SDK's own key caching: {e}")
+        return False
+    try:
+        response = cert_request(ID_TOKEN_CERT_URL, method='GET', headers={'Cache-Control': 'no-cache'})
+        ok = response.status == 200
+    except Exception as e:
+        logger.warning(f"Token key refresh failed: {e}")
+        ok = False
+    metrics.incr('auth.signing_keys.refreshed' if ok else 'auth.signing_keys.refresh_failed')
+    return ok
+
+
 def _verify_id_token_from_auth_header():
     _ensure_firebase_admin()
     auth_header = request.headers.get('Authorization', '')
@@ -41,7 +166,7 @@ def _verify_id_token_from_auth_header():
     if not token:
         return None
     try:
-        return fb_auth.verify_id_token(token)
+        return _verify_id_token(token)
     except Exception:
         # Dev fallback: allow unsigned decode if SKIP_FIREBASE_VERIFY=true
         if os.getenv('SKIP_FIREBASE_VERIFY', '').lower() in ('1', 'true', 'yes'):
@@ -54,6 +179,7 @@ def _verify_id_token_from_auth_header():
 
 
 @auth_bp.route('/firebase-google-login', methods=['POST'])
+@auth_limiter.limit()
 def firebase_google_login():
     _ensure_firebase_admin()
     body = request.get_json(silent=True) or {}
@@ -61,30 +187,24 @@ def firebase_google_login():
     if not id_token:
         return jsonify({'error': 'idToken required'}), 400
     try:
-        decoded = fb_auth.verify_id_token(id_token)
+        decoded = _verify_id_token(id_token)
         uid = decoded.get('uid')
         email = decoded.get('email')
         if not email:
             return jsonify({'error': 'Email not present in token'}), 400
 
-        # Upsert user profile in Firestore by Firebase uid or email
-        profile = UserModel.get_user_by_firebase_uid(uid) or UserModel.get_user_by_email(email)
-        if not profile:
-            # Create new user profile
-            db = firestore.client()
-            user_ref = db.collection('users').document()
-            user_ref.set({
-                'firebase_uid': uid,
-                'email': email,
-                'profile_complete': False,
-            })
-        else:
-            # Ensure uid is saved
-            user_id = profile.get('_id')
-            if user_id:
-                UserModel.update_user(user_id, {'firebase_uid': uid})
-
-        return jsonify({'message': 'Token verified', 'uid': uid, 'email': email}), 200
+        # Upsert user profile in one transaction; returning users cost one read and no writes
+        profile, created = UserModel.upsert_firebase_profile(uid, email)
+
+        return jsonify({
+            'message': 'Token verified',
+            'uid': uid,
+            'email': email,
+            'created': created,
+            'profile': profile,
+        }), 200
+    except DuplicateUserError as e:
+        return jsonify({'error': f'{e.field} already in use'}), 409
     except Exception as e:
         return jsonify({'error': f'Invalid token: {e}'}), 401
 
@@ -97,7 +217,8 @@ def profile():
     uid = decoded.get('uid')
     email = decoded.get('email')
     if request.method == 'GET':
-        profile = UserModel.get_user_by_firebase_uid(uid) or UserModel.get_user_by_email(email)
+        # Optional `fields` selection limits which profile fields are read
+        profile = UserModel.get_user_by_firebase_uid_or_email(uid, email, fields=projection_for(parse_fields()))
         if not profile:
             return jsonify({'email': email, 'profile_complete': False}), 200
         # Remove password from response and ensure _id is string
@@ -119,22 +240,16 @@ def profile():
         'nsu_id': str(nsu_id),
         'phone_number': phone,
         'profile_complete': True,
-        'firebase_uid': uid,
         'email': email,
     }
-    
-    # Find existing user or create new one
-    profile = UserModel.get_user_by_firebase_uid(uid) or UserModel.get_user_by_email(email)
-    if profile and profile.get('_id'):
-        # Update existing user
-        UserModel.update_user(profile['_id'], update)
-    else:
-        # Create new user
-        db = firestore.client()
-        user_ref = db.collection('users').document()
-        user_ref.set(update)
-    
-    return jsonify({'message': 'Profile saved'}), 200
+
+    # Resolve and write the profile in one transaction; unchanged fields are not rewritten
+    try:
+        profile, _ = UserModel.upsert_firebase_profile(uid, email, update)
+    except DuplicateUserError as e:
+        return jsonify({'error': f'{e.field} already in use'}), 409
+
+    return jsonify({'message': 'Profile saved', 'profile': profile}), 200
 
 
 @auth_bp.route('/check-user-exists', methods=['POST'])
@@ -160,11 +275,12 @@ def get_user_by_email(email):
     """
     Get user details by email.
     
-    Returns user profile without password field.
+    Returns user profile without password field; an optional `fields`
+    query parameter limits which fields are read and returned.
     Returns 404 if user doesn't exist.
     """
     _ensure_firebase_admin()
-    profile = UserModel.get_user_by_email(email)
+    profile = UserModel.get_user_by_email(email, fields=projection_for(parse_fields()))
     if not profile:
         return jsonify({'error': 'User not found'}), 404
     
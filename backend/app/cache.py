@@ -0,0 +1,263 @@
+"""
+cache.py
+
+Small in-process caches for hot, slightly stale-tolerant reads such as the
+activity feed, and single-flight coalescing of identical concurrent reads.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from . import metrics
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries expire after a fixed time.
+
+    Cached values are shared between callers, so callers that modify results
+    must copy them first.
+    """
+
+    def __init__(self, name, ttl, max_entries=128):
+        """
+        Args:
+            name (str): The cache name, used in metrics.
+            ttl (float): Seconds an entry stays fresh. 0 disables the cache.
+            max_entries (int): Maximum number of entries kept.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        metrics.register_collector(f"cache.{name}", self.stats)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        """
+        Returns a fresh cached value.
+
+        Args:
+            key (hashable): The cache key.
+
+        Returns:
+            object: The value, or None if it is missing or expired.
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self._entries[key] = (entry[0], entry[1], now)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, touch=True):
+        """
+        Stores a value for `ttl` seconds.
+
+        Args:
+            key (hashable): The cache key.
+            value (object): The value to cache.
+            touch (bool): Count the store as a use of the key; background
+                refreshes pass False so unused keys age out of `hot_keys`.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            previous = self._entries.get(key)
+            last_used = previous[2] if previous and not touch else now
+            self._entries[key] = (now + self.ttl, value, last_used)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hot_keys(self, within):
+        """
+        Returns the keys read (or first stored) in the last `within` seconds.
+
+        Used to refresh popular entries before they expire without refreshing
+        entries nobody asks for anymore.
+
+        Args:
+            within (float): The look-back window in seconds.
+
+        Returns:
+            list: The recently used keys.
+        """
+        cutoff = time.monotonic() - within
+        with self._lock:
+            return [key for key, entry in self._entries.items() if entry[2] >= cutoff]
+
+    def clear(self):
+        """
+        Drops all entries, e.g. after a write that changes the cached reads.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Reports the cache size and hit rate.
+
+        Returns:
+            dict: Entry count, hits, misses and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+class _Flight:
+    """
+    An in-flight fetch whose result is shared by all callers of its key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads into one backend fetch.
+
+    The first caller of a key runs the fetch; callers that arrive while it is
+    in flight wait for it and receive the same result (or exception). Nothing
+    is kept once the fetch completes, so this bounds backend load during
+    thundering herds without serving stale data, even with caching disabled.
+    Results are shared between callers, so callers that modify them must copy
+    them first.
+    """
+
+    def __init__(self, name, max_tracked_keys=256, enabled=True):
+        """
+        Args:
+            name (str): The group name, used in metrics.
+            max_tracked_keys (int): Maximum number of keys with per-key statistics.
+            enabled (bool): Coalesce calls; when False every call fetches.
+        """
+        self.name = name
+        self.max_tracked_keys = max_tracked_keys
+        self.enabled = enabled
+        self._flights = {}
+        self._async_flights = {}
+        self._key_stats = OrderedDict()
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.coalesced = 0
+        metrics.register_collector(f"singleflight.{name}", self.stats)
+
+    def _record(self, key, coalesced):
+        """
+        Counts a call of a key (under the lock).
+        """
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.fetches += 1
+        key_stats = self._key_stats.pop(key, None) or {"fetches": 0, "coalesced": 0}
+        key_stats["coalesced" if coalesced else "fetches"] += 1
+        self._key_stats[key] = key_stats
+        while len(self._key_stats) > self.max_tracked_keys:
+            self._key_stats.popitem(last=False)
+
+    def do(self, key, fetch):
+        """
+        Returns the result of `fetch`, shared with concurrent callers of `key`.
+
+        Args:
+            key (str): Identifies the read; equal keys must mean equal results.
+            fetch (callable): The zero-argument function performing the read.
+
+        Returns:
+            object: The result of the (possibly shared) fetch.
+        """
+        if not self.enabled:
+            return fetch()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._record(key, coalesced=not leader)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fetch()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key, fetch):
+        """
+        Async counterpart of `do` for callers on the shared event loop.
+
+        Args:
+            key (str): Identifies the read; equal keys must mean equal results.
+            fetch (callable): A zero-argument function returning the awaitable read.
+
+        Returns:
+            object: The result of the (possibly shared) fetch.
+        """
+        if not self.enabled:
+            return await fetch()
+        future = self._async_flights.get(key)
+        with self._lock:
+            self._record(key, coalesced=future is not None)
+        if future is not None:
+            # Shielded so a cancelled follower does not cancel the shared fetch
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(fetch())
+        self._async_flights[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._async_flights.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._async_flights.pop(key, None))
+
+    def stats(self):
+        """
+        Reports how many calls were coalesced, overall and for the busiest keys.
+
+        Returns:
+            dict: Fetch and coalesced counts, in-flight keys and the top keys.
+        """
+        with self._lock:
+            calls = self.fetches + self.coalesced
+            top = sorted(self._key_stats.items(), key=lambda entry: entry[1]["coalesced"], reverse=True)[:20]
+            return {
+                "fetches": self.fetches,
+                "coalesced": self.coalesced,
+                "coalesced_rate": round(self.coalesced / calls, 3) if calls else None,
+                "in_flight": len(self._flights) + len(self._async_flights),
+                "keys": {key: dict(key_stats) for key, key_stats in top},
+            }
@@ -0,0 +1,96 @@
+"""
+dedupe.py
+
+MinHash signatures and LSH banding for near-duplicate lost item reports.
+
+A report's description and location are reduced to a set of shingles (words
+and character trigrams), summarized by a MinHash signature whose positions
+agree with another signature's in proportion to the Jaccard similarity of the
+two shingle sets. The signature is cut into bands; reports that share any
+band hash are duplicate candidates. Storing the band hashes in an array field
+lets Firestore find the candidates of a new report with one
+`array_contains_any` query, whose cost depends on the number of similar
+reports rather than on the number of reports.
+"""
+
+import hashlib
+import random
+import re
+
+# Changing these invalidates stored signatures
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x6B6875)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def shingles(description, location):
+    """
+    Returns the shingles of a report: its words and character trigrams.
+
+    Args:
+        description (str): The item description.
+        location (str): The location.
+
+    Returns:
+        set: The shingles.
+    """
+    words = _WORD_RE.findall(f"{description or ''} {location or ''}".lower())
+    text = " ".join(words)
+    result = {f"w:{word}" for word in words}
+    result.update(text[index:index + 3] for index in range(max(1, len(text) - 2)))
+    return result
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+
+
+def minhash(description, location):
+    """
+    Computes the MinHash signature of a report.
+
+    Args:
+        description (str): The item description.
+        location (str): The location.
+
+    Returns:
+        list: `MINHASH_PERMUTATIONS` integers.
+    """
+    hashes = [_hash(shingle) for shingle in shingles(description, location)] or [0]
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_bands(signature):
+    """
+    Returns the band keys of a signature; similar reports share at least one.
+
+    Args:
+        signature (list): A MinHash signature.
+
+    Returns:
+        list: `LSH_BANDS` strings of the form `<band>:<hash>`.
+    """
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(",".join(map(str, rows)).encode(), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def similarity(signature, other):
+    """
+    Estimates the Jaccard similarity of two reports from their signatures.
+
+    Returns:
+        float: The fraction of agreeing signature positions (0 to 1).
+    """
+    if len(signature) != len(other):
+        return 0.0
+    return sum(1 for a, b in zip(signature, other) if a == b) / len(signature)
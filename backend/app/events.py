@@ -0,0 +1,381 @@
+"""
+events.py
+
+In-process publish/subscribe broker for real-time push.
+
+Write paths in the models publish events (new messages, conversation summary
+updates, newly approved items) to topics, and the `/events` server-sent events
+stream (or the optional `/ws` WebSocket) forwards them to subscribed clients,
+so clients no longer have to poll `/get_messages`, `/get_chats` and
+`/activity-feed`.
+
+Topics are `user:<user id>` for a user's messages and chat list, and `feed` for
+the activity feed. The broker only reaches clients connected to the same
+server worker.
+
+Each subscription has a bounded queue. Publishers never block: when a slow
+client's queue is full its pending events are discarded and replaced by a
+single `resync` event, telling the client to refetch over the regular
+endpoints before continuing with the stream.
+"""
+
+import queue
+import threading
+import time
+from flask import Response, current_app, request, stream_with_context
+from config import Config
+from . import metrics
+
+try:
+    from flask_sock import Sock
+except ImportError:  # flask-sock is optional; only the SSE stream is served without it
+    Sock = None
+
+# Topic of the activity feed
+FEED_TOPIC = "feed"
+
+
+def user_topic(user_id):
+    """
+    Returns the topic carrying a user's messages and chat summaries.
+
+    Args:
+        user_id (str): The user ID/email.
+
+    Returns:
+        str: The topic name.
+    """
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """
+    A client's subscription to a set of topics, with a bounded event queue.
+    """
+
+    def __init__(self, topics, max_queue):
+        """
+        Args:
+            topics (set): The topics to receive events from.
+            max_queue (int): Maximum number of undelivered events.
+        """
+        self.topics = set(topics)
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self.dropped = 0
+
+    def offer(self, event):
+        """
+        Queues an event without blocking the publisher.
+
+        When the queue is full, undelivered events are discarded and a single
+        `resync` event is queued instead.
+
+        Args:
+            event (tuple): (event name, data).
+
+        Returns:
+            bool: True if the event was queued, False if the queue overflowed.
+        """
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            pass
+        discarded = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+                discarded += 1
+            except queue.Empty:
+                break
+        self.dropped += discarded + 1
+        try:
+            self._queue.put_nowait(("resync", {"dropped": discarded + 1}))
+        except queue.Full:
+            pass
+        return False
+
+    def get(self, timeout):
+        """
+        Waits for the next event.
+
+        Args:
+            timeout (float): Seconds to wait.
+
+        Returns:
+            tuple: (event name, data), or None if the timeout expired.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """
+    Fans published events out to the subscriptions of each topic.
+    """
+
+    def __init__(self, max_queue=100, max_subscriptions=500):
+        """
+        Args:
+            max_queue (int): Per-subscription queue size.
+            max_subscriptions (int): Maximum number of concurrent subscriptions.
+        """
+        self.max_queue = max_queue
+        self.max_subscriptions = max_subscriptions
+        self._topics = {}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        """
+        Creates a subscription.
+
+        Args:
+            topics (iterable): The topics to subscribe to.
+
+        Returns:
+            Subscription: The subscription, or None if the broker is at capacity.
+        """
+        subscription = Subscription(topics, self.max_queue)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscriptions:
+                metrics.incr("events.rejected")
+                return None
+            self._subscriptions.add(subscription)
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        metrics.incr("events.subscribed")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Removes a subscription from all of its topics.
+
+        Args:
+            subscription (Subscription): The subscription to remove.
+        """
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topics, event, data):
+        """
+        Delivers an event to every subscription of the given topics.
+
+        A subscription that matches several of the topics receives the event once.
+
+        Args:
+            topics (iterable): The topics to publish to.
+            event (str): The event name.
+            data (dict): The JSON-serializable event payload.
+
+        Returns:
+            int: The number of subscriptions the event was delivered to.
+        """
+        with self._lock:
+            targets = set()
+            for topic in topics:
+                targets.update(self._topics.get(topic, ()))
+        if not targets:
+            return 0
+        overflowed = 0
+        for subscription in targets:
+            if not subscription.offer((event, data)):
+                overflowed += 1
+        metrics.incr("events.published")
+        metrics.incr("events.delivered", len(targets) - overflowed)
+        if overflowed:
+            metrics.incr("events.overflowed", overflowed)
+        return len(targets)
+
+    def stats(self):
+        """
+        Reports the number of subscriptions and active topics.
+
+        Returns:
+            dict: Subscription and topic counts.
+        """
+        with self._lock:
+            return {"subscriptions": len(self._subscriptions), "topics": len(self._topics)}
+
+
+broker = EventBroker(max_queue=Config.EVENTS_QUEUE_SIZE, max_subscriptions=Config.EVENTS_MAX_CONNECTIONS)
+metrics.register_collector("events", broker.stats)
+
+
+def _timestamp(value):
+    """
+    Converts a `created_at` value to a Unix timestamp for event payloads.
+
+    Server timestamps are not known until the write is read back, so the
+    publish time is used in their place.
+    """
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return value
+    return time.time()
+
+
+def publish_message(message_id, data):
+    """
+    Publishes a new message and the updated chat summaries of both participants.
+
+    Args:
+        message_id (str): The ID of the stored message.
+        data (dict): The message data as written.
+    """
+    if not Config.EVENTS_ENABLED:
+        return
+    author_id = data.get("author_id")
+    receiver_id = data.get("receiver_id")
+    created_at = _timestamp(data.get("created_at"))
+    message = dict(data, _id=message_id, created_at=created_at)
+    broker.publish([user_topic(user_id) for user_id in (author_id, receiver_id) if user_id], "message", message)
+    for user_id, counterpart in ((author_id, receiver_id), (receiver_id, author_id)):
+        if user_id and counterpart:
+            broker.publish([user_topic(user_id)], "chat", {
+                "chat_id": counterpart,
+                "latest_message": data.get("text", ""),
+                "latest_message_time": created_at,
+            })
+
+
+def publish_message_change(message_id, message, change, fields=None):
+    """
+    Publishes the deletion or edit of a message to both participants.
+
+    Args:
+        message_id (str): The ID of the changed message.
+        message (dict): The message's `author_id` and `receiver_id`.
+        change (str): `deleted` or `updated`.
+        fields (dict): The updated fields, for edits.
+    """
+    if not Config.EVENTS_ENABLED:
+        return
+    data = {"_id": message_id, "change": change, "changed_at": time.time()}
+    if fields:
+        data["fields"] = fields
+    participants = (message.get("author_id"), message.get("receiver_id"))
+    broker.publish([user_topic(user_id) for user_id in participants if user_id], "message_changed", data)
+
+
+def publish_item_approved(item_id, data):
+    """
+    Publishes a lost item that just became visible in the activity feed.
+
+    Args:
+        item_id (str): The ID of the approved item.
+        data (dict): The item data.
+    """
+    if not Config.EVENTS_ENABLED:
+        return
+    item = dict(data, _id=item_id, is_approved=True)
+    item["image"] = item.get("image_path") or None
+    if "created_at" in item:
+        item["created_at"] = _timestamp(item["created_at"])
+    broker.publish([FEED_TOPIC], "item_approved", item)
+
+
+def topics_for(user_id, channels):
+    """
+    Maps the `user_id` and `topics` parameters of a stream request to topics.
+
+    Args:
+        user_id (str): The current user's ID/email, if any.
+        channels (str): Comma-separated channels (`chats`, `feed`); all by default.
+
+    Returns:
+        set: The topics to subscribe to.
+    """
+    wanted = {name.strip() for name in (channels or "chats,feed").split(",") if name.strip()}
+    topics = set()
+    if "chats" in wanted and user_id:
+        topics.add(user_topic(user_id))
+    if "feed" in wanted:
+        topics.add(FEED_TOPIC)
+    return topics
+
+
+def stream_events(subscription):
+    """
+    Streams a subscription's events in server-sent events format.
+
+    Idle streams get a comment every `EVENTS_HEARTBEAT` seconds so proxies keep
+    the connection open; the subscription is removed when the client disconnects.
+
+    Args:
+        subscription (Subscription): The subscription to stream.
+
+    Returns:
+        Response: A streamed `text/event-stream` response.
+    """
+    dumps = current_app.json.dumps
+    heartbeat = Config.EVENTS_HEARTBEAT
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                name, data = event
+                yield f"event: {name}\ndata: {dumps(data)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def init_websocket(app):
+    """
+    Serves the event stream over a WebSocket at `/ws` when flask-sock is installed.
+
+    Each frame is a JSON object `{"event": <name>, "data": <payload>}`; the
+    query parameters are the same as for `/events`.
+
+    Args:
+        app (Flask): The application to configure.
+
+    Returns:
+        bool: True if the WebSocket route was registered.
+    """
+    if Sock is None or not Config.EVENTS_ENABLED:
+        return False
+    sock = Sock(app)
+
+    @sock.route("/ws")
+    def websocket_events(ws):
+        topics = topics_for(request.args.get("user_id"), request.args.get("topics"))
+        subscription = broker.subscribe(topics) if topics else None
+        if subscription is None:
+            ws.close(reason=1013, message="Too many connections")
+            return
+        dumps = current_app.json.dumps
+        try:
+            while True:
+                event = subscription.get(timeout=Config.EVENTS_HEARTBEAT)
+                if event is None:
+                    ws.send(dumps({"event": "heartbeat"}))
+                    continue
+                name, data = event
+                ws.send(dumps({"event": name, "data": data}))
+        finally:
+            broker.unsubscribe(subscription)
+
+    return True
@@ -0,0 +1,161 @@
+"""
+geo.py
+
+Geohash encoding and distance helpers for the nearby items query.
+
+Items reported with coordinates store `lat`, `lng` and a `geohash`. Points
+that are close together share geohash prefixes, so the items around a point
+are found with a few range queries on `geohash` (the cells around the point,
+at a cell size matching the search radius) and an exact distance check on
+the results. The query cost is bounded by the number
+of items in those cells, not by the size of the collection.
+"""
+
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Precision of stored geohashes (cells of about 1.2 m x 0.6 m)
+GEOHASH_PRECISION = 10
+
+EARTH_RADIUS_M = 6_371_000
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """
+    Encodes a point as a geohash.
+
+    Args:
+        lat (float): Latitude in degrees.
+        lng (float): Longitude in degrees.
+        precision (int): Number of characters.
+
+    Returns:
+        str: The geohash.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        bounds, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """
+    Returns the great-circle distance between two points in meters.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell_size(precision):
+    """
+    Returns the (latitude, longitude) size in degrees of geohash cells at a precision.
+    """
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _steps(low, high, step):
+    """
+    Returns points from `low` to `high` at most `step` apart, both included.
+    """
+    count = math.floor((high - low) / step) + 1
+    return [low + index * step for index in range(count)] + [high]
+
+
+def geohash_ranges(lat, lng, radius_m, max_ranges=24):
+    """
+    Returns the geohash ranges covering a circle.
+
+    Picks the finest precision at which the cells overlapping the circle's
+    bounding box number at most `max_ranges`, so few items outside the circle
+    are read. The cells are found by encoding a grid of points over the box,
+    spaced no more than one cell apart, and each distinct cell becomes one
+    range of stored geohashes.
+
+    Args:
+        lat (float): Latitude of the center in degrees.
+        lng (float): Longitude of the center in degrees.
+        radius_m (float): The radius in meters.
+        max_ranges (int): Maximum number of ranges (queries) returned.
+
+    Returns:
+        list: Sorted (start, end) string pairs, for `>= start` and `<= end` filters.
+    """
+    d_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    d_lng = min(180.0, d_lat / cos_lat)
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = _cell_size(candidate)
+        if (2 * d_lat // cell_lat + 2) * (2 * d_lng // cell_lng + 2) <= max_ranges:
+            precision = candidate
+            break
+    cell_lat, cell_lng = _cell_size(precision)
+    cells = set()
+    for point_lat in _steps(lat - d_lat, lat + d_lat, cell_lat):
+        for point_lng in _steps(lng - d_lng, lng + d_lng, cell_lng):
+            point_lat = max(-90.0, min(90.0, point_lat))
+            point_lng = (point_lng + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(point_lat, point_lng, precision))
+    return [(cell, cell + "~") for cell in sorted(cells)]
+
+
+def parse_coordinates(lat, lng):
+    """
+    Validates optional latitude and longitude request values.
+
+    Args:
+        lat (str|float): The latitude, or None/empty.
+        lng (str|float): The longitude, or None/empty.
+
+    Returns:
+        tuple: (lat, lng) as floats, or None if neither is given.
+
+    Raises:
+        ValueError: If only one is given, or a value is not a valid coordinate.
+    """
+    if lat in (None, "") and lng in (None, ""):
+        return None
+    if lat in (None, "") or lng in (None, ""):
+        raise ValueError("Both lat and lng are required")
+    lat, lng = float(lat), float(lng)
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0) or math.isnan(lat) or math.isnan(lng):
+        raise ValueError("Coordinates out of range")
+    return lat, lng
+
+
+def geo_fields(coordinates):
+    """
+    Returns the fields stored for an item's coordinates.
+
+    Args:
+        coordinates (tuple): (lat, lng), or None.
+
+    Returns:
+        dict: `lat`, `lng` and `geohash`, or an empty dict.
+    """
+    if coordinates is None:
+        return {}
+    lat, lng = coordinates
+    return {"lat": lat, "lng": lng, "geohash": encode_geohash(lat, lng)}
@@ -0,0 +1,133 @@
+"""
+http_cache.py
+
+HTTP caching helpers for the polled list endpoints: weak ETags with
+conditional GET support, `Cache-Control` headers for public feeds, and
+gzip/brotli response compression.
+"""
+
+import gzip
+import hashlib
+from flask import request, jsonify, current_app
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Response types worth compressing
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/csv'}
+
+
+def compute_etag(items):
+    """
+    Computes a weak validator for a list of items.
+
+    The validator is derived from the newest `created_at` and the item IDs, so it
+    changes whenever an item is added, removed or reordered in the page.
+
+    Args:
+        items (list): The item dicts, each with an `_id` and optionally `created_at`.
+
+    Returns:
+        str: The opaque ETag value (without quotes or the weak prefix).
+    """
+    newest = max((item.get('created_at') for item in items
+                  if isinstance(item.get('created_at'), (int, float))), default=0)
+    digest = hashlib.sha1(repr(newest).encode('utf-8'))
+    for item in items:
+        digest.update(b'\0')
+        digest.update(str(item.get('_id', '')).encode('utf-8'))
+    return f"{len(items)}-{digest.hexdigest()}"
+
+
+def conditional_json(items, max_age=None, public=True):
+    """
+    Builds a JSON list response that honors `If-None-Match`.
+
+    When the client already holds the current version, a bodyless 304 is returned
+    and the items are never serialized.
+
+    Args:
+        items (list): The items to return.
+        max_age (int): Seconds clients and proxies may reuse the response.
+            Defaults to `FEED_MAX_AGE` from the app config.
+        public (bool): Whether shared caches may store the response.
+
+    Returns:
+        Response: A 200 JSON response or a 304 Not Modified response.
+    """
+    etag = compute_etag(items)
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(items)
+    response.set_etag(etag, weak=True)
+
+    if max_age is None:
+        max_age = current_app.config.get('FEED_MAX_AGE', 0)
+    response.cache_control.public = public
+    response.cache_control.private = not public
+    response.cache_control.max_age = max_age
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _choose_encoding():
+    """
+    Picks the best supported content coding from `Accept-Encoding`.
+
+    Returns:
+        str: 'br', 'gzip', or None if the client accepts neither.
+    """
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_response(response):
+    """
+    Compresses large, buffered text responses when the client supports it.
+
+    Registered as an `after_request` hook by `init_compression`. Streaming
+    responses, already-encoded bodies and payloads below `COMPRESS_MIN_SIZE`
+    are passed through unchanged.
+
+    Args:
+        response (Response): The outgoing response.
+
+    Returns:
+        Response: The (possibly compressed) response.
+    """
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding == 'br':
+        body = brotli.compress(body, quality=current_app.config.get('COMPRESS_LEVEL', 5))
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=current_app.config.get('COMPRESS_LEVEL', 5))
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """
+    Enables response compression for the application.
+
+    Args:
+        app (Flask): The application to configure.
+    """
+    app.after_request(compress_response)
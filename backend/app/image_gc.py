@@ -0,0 +1,189 @@
+"""
+image_gc.py
+
+Garbage collection of orphaned images in AppWrite Storage.
+
+Images are uploaded before their report is written, so a report that fails
+afterwards, or an item that is deleted or moved, leaves its image in the
+bucket. The collector reconciles the bucket with the `image_path` references
+of the item collections:
+
+1. The references are streamed (only `image_path` is read) into a fixed-size
+   Bloom filter, so memory does not grow with the number of items.
+2. The bucket listing is streamed page by page. Files younger than the grace
+   period (uploads whose report may still be in flight) are skipped, and a
+   file whose ID is definitely not in the filter is an orphan candidate.
+3. Candidates are re-checked with exact `in` queries right before deletion,
+   which also covers references written during the run. A false positive of
+   the filter only means an orphan survives until the next run.
+4. Orphans are deleted on a small thread pool, rate limited by a token bucket.
+"""
+
+import hashlib
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from config import Config
+from . import metrics, storage
+from .ratelimit import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+# Collections whose documents reference images through `image_path`
+IMAGE_COLLECTIONS = ('lost_items', 'found_items', 'archived_lost_items')
+
+# Firestore allows at most 30 values in an `in` filter
+_IN_LIMIT = 30
+
+
+class BloomFilter:
+    """
+    A fixed-size set membership filter without false negatives.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        """
+        Args:
+            capacity (int): The expected number of entries.
+            error_rate (float): The false positive rate at `capacity` entries.
+        """
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def _referenced_ids(db, file_ids):
+    """
+    Returns which of the given file IDs are referenced by an item, using exact queries.
+
+    Args:
+        db (Client): The Firestore client.
+        file_ids (list): The candidate file IDs.
+
+    Returns:
+        set: The referenced file IDs.
+    """
+    urls = {storage_url(file_id): file_id for file_id in file_ids}
+    url_list = list(urls)
+    referenced = set()
+    for collection in IMAGE_COLLECTIONS:
+        for start in range(0, len(url_list), _IN_LIMIT):
+            query = db.collection(collection).where('image_path', 'in', url_list[start:start + _IN_LIMIT])
+            for doc in query.select(['image_path']).stream():
+                referenced.add(urls[doc.to_dict().get('image_path')])
+    return referenced
+
+
+def storage_url(file_id):
+    """
+    Returns the view URL stored in `image_path` for a file ID.
+    """
+    return f"{storage.APPWRITE_ENDPOINT}/storage/buckets/{storage.APPWRITE_STORAGE_BUCKET_ID}/files/{file_id}/view"
+
+
+def _parse_created_at(value):
+    try:
+        created_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)
+
+
+def collect_orphaned_images(dry_run=True, grace_hours=None, concurrency=None, delete_rate=None,
+                            expected_references=None, page_size=100):
+    """
+    Finds, and unless `dry_run` is set deletes, bucket files no item references.
+
+    Args:
+        dry_run (bool): Only report the orphans.
+        grace_hours (float): Skip files uploaded in the last hours. Defaults to `IMAGE_GC_GRACE_HOURS`.
+        concurrency (int): Parallel deletions. Defaults to `IMAGE_GC_CONCURRENCY`.
+        delete_rate (float): Maximum deletions per second. Defaults to `IMAGE_GC_DELETE_RATE`.
+        expected_references (int): Sizes the reference filter. Defaults to the
+            number of items, counted with aggregation queries.
+        page_size (int): Bucket files listed per request.
+
+    Returns:
+        dict: Counts of `references`, `files` scanned, `recent` files skipped,
+        `orphans` found, orphans `deleted` and deletions `failed`, plus `dry_run`.
+    """
+    from .models import db
+    grace_hours = Config.IMAGE_GC_GRACE_HOURS if grace_hours is None else grace_hours
+    concurrency = concurrency or Config.IMAGE_GC_CONCURRENCY
+    delete_rate = delete_rate or Config.IMAGE_GC_DELETE_RATE
+    stats = {'dry_run': dry_run, 'references': 0, 'files': 0, 'recent': 0, 'orphans': 0, 'deleted': 0, 'failed': 0}
+
+    if expected_references is None:
+        expected_references = sum(db.collection(collection).count().get()[0][0].value
+                                  for collection in IMAGE_COLLECTIONS)
+    references = BloomFilter(expected_references)
+    for collection in IMAGE_COLLECTIONS:
+        for doc in db.collection(collection).select(['image_path']).stream():
+            file_id = storage.file_id_from_url(doc.to_dict().get('image_path'))
+            if file_id:
+                references.add(file_id)
+                stats['references'] += 1
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    limiter = TokenBucketLimiter(rate=delete_rate, burst=max(1.0, delete_rate))
+
+    def delete(file_id):
+        while True:
+            allowed, retry_after = limiter.acquire('delete')
+            if allowed:
+                break
+            time.sleep(retry_after)
+        try:
+            return storage.delete_storage_file(file_id)
+        except Exception as e:
+            logger.warning(f"Deleting orphaned image {file_id} failed: {e}")
+            return False
+
+    def flush(candidates, pool):
+        if not candidates:
+            return
+        referenced = _referenced_ids(db, candidates)
+        orphans = [file_id for file_id in candidates if file_id not in referenced]
+        stats['orphans'] += len(orphans)
+        if dry_run:
+            return
+        for deleted in pool.map(delete, orphans):
+            stats['deleted' if deleted else 'failed'] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="image-gc") as pool:
+        candidates = []
+        for file in storage.list_storage_files(page_size=page_size):
+            stats['files'] += 1
+            created_at = _parse_created_at(file.get('$createdAt'))
+            if created_at is None or created_at > cutoff:
+                stats['recent'] += 1
+                continue
+            if file['$id'] not in references:
+                candidates.append(file['$id'])
+            if len(candidates) >= _IN_LIMIT:
+                flush(candidates, pool)
+                candidates = []
+        flush(candidates, pool)
+
+    for key in ('files', 'orphans', 'deleted', 'failed'):
+        metrics.incr(f"image_gc.{key}", stats[key])
+    logger.info(f"Image GC finished: {stats}")
+    return stats
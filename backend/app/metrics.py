@@ -0,0 +1,58 @@
+"""
+metrics.py
+
+In-process metrics registry.
+
+Components record counters with `incr` and can register collectors that report
+their current state (cache sizes, hit rates, queue depths) when a snapshot is
+taken. The snapshot is served as JSON by the `/metrics` endpoint (with `METRICS_TOKEN`).
+"""
+
+import threading
+from collections import defaultdict
+
+_counters = defaultdict(int)
+_collectors = {}
+_lock = threading.Lock()
+
+
+def incr(name, value=1):
+    """
+    Increments a counter.
+
+    Args:
+        name (str): The counter name, dot-separated by component (e.g. `ratelimit.auth.allowed`).
+        value (int): The amount to add.
+    """
+    with _lock:
+        _counters[name] += value
+
+
+def register_collector(name, collector):
+    """
+    Registers a callable that reports a component's current state.
+
+    Args:
+        name (str): The key under which the collector's output appears.
+        collector (callable): A zero-argument function returning a JSON-serializable dict.
+    """
+    with _lock:
+        _collectors[name] = collector
+
+
+def snapshot():
+    """
+    Returns the current value of all counters and collectors.
+
+    Returns:
+        dict: `{"counters": {...}, <collector name>: {...}, ...}`.
+    """
+    with _lock:
+        data = {"counters": dict(_counters)}
+        collectors = list(_collectors.items())
+    for name, collector in collectors:
+        try:
+            data[name] = collector()
+        except Exception as e:
+            data[name] = {"error": str(e)}
+    return data
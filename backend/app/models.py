@@ -5,16 +5,233 @@ This module defines the models for interacting with the Firestore database.
 It replaces the MongoDB models with Firestore equivalents.
 """
 
-from datetime import datetime
+import contextvars
+import hashlib
+import json
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 from firebase_admin import firestore
+from config import Config
+from . import events, metrics
+from .cache import SingleFlight, TTLCache
+from .geo import geo_fields, geohash_ranges, haversine_m
+from .dedupe import lsh_bands, minhash, similarity
+
+logger = logging.getLogger(__name__)
 
 # Initialize Firestore client
 db = firestore.client()
 
+# Recent feed pages, keyed by (limit, projected fields)
+feed_cache = TTLCache("feed", Config.FEED_CACHE_TTL, max_entries=64)
+
+# Coalesces identical concurrent item list and search reads
+item_reads = SingleFlight("item_reads", enabled=Config.SINGLE_FLIGHT_ENABLED)
+
+
+def lost_items_key(limit, skip, fields):
+    """
+    Returns the single-flight key of a page of open lost items.
+    """
+    return f"lost_items:{limit}:{skip}:{','.join(fields) if fields else '*'}"
+
+
+# Shared, bounded pool for running independent Firestore queries in parallel
+_query_pool = ThreadPoolExecutor(max_workers=Config.QUERY_POOL_SIZE, thread_name_prefix="firestore-query")
+
+
+def run_concurrently(*calls):
+    """
+    Runs independent zero-argument callables on the shared query pool.
+
+    The calling thread waits for all of them, so the total latency is that of
+    the slowest call rather than the sum. Calls must not themselves use the
+    pool, otherwise they can deadlock when it is saturated. Each call runs in a
+    copy of the caller's context, so the request log sees its queries.
+
+    Args:
+        *calls (callable): The callables to run.
+
+    Returns:
+        list: The results, in the same order as `calls`.
+    """
+    futures = [_query_pool.submit(contextvars.copy_context().run, call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def _iter_page(query, limit, skip=0, fields=None):
+    """
+    Streams one page of a query ordered by `created_at` as item dicts.
+
+    Documents are yielded as they arrive from Firestore, with `_id` set and
+    `created_at` converted to a Unix timestamp.
+
+    Args:
+        query (Query): The query, ordered by `created_at`.
+        limit (int): The maximum number of documents to return.
+        skip (int): The number of documents to skip.
+        fields (list): Optional field paths to project; only these fields are read.
+
+    Yields:
+        dict: The item data for each document.
+    """
+    # Note: Firestore doesn't support skip efficiently, so we walk past the first
+    # `skip` documents (reading only the ordering field) and start after the last one
+    if skip > 0:
+        last_doc = None
+        for doc in query.select(['created_at']).limit(skip).stream():
+            last_doc = doc
+        if last_doc:
+            query = query.start_after(last_doc)
+
+    if fields:
+        query = query.select(fields)
+
+    for doc in query.limit(limit).stream():
+        item_data = doc.to_dict()
+        item_data['_id'] = doc.id
+        # Convert Firestore Timestamp to a Unix timestamp
+        if 'created_at' in item_data and hasattr(item_data['created_at'], 'timestamp'):
+            item_data['created_at'] = item_data['created_at'].timestamp()
+        yield item_data
+
+
+# User fields kept unique through index documents in `user_lookups`
+USER_LOOKUP_FIELDS = ('email', 'nsu_id', 'firebase_uid')
+
+
+class DuplicateUserError(ValueError):
+    """
+    Raised when a user write would reuse another user's email, NSU ID or Firebase UID.
+
+    Attributes:
+        field (str): The field whose value is already taken.
+    """
+
+    def __init__(self, field):
+        super().__init__(f"{field} already exists")
+        self.field = field
+
+
+def _normalize_lookup_value(field, value):
+    """
+    Normalizes a unique user field for use in a lookup key.
+
+    Args:
+        field (str): One of `USER_LOOKUP_FIELDS`.
+        value (str): The raw value.
+
+    Returns:
+        str: The normalized value (emails are case-insensitive).
+    """
+    value = str(value).strip()
+    return value.lower() if field == 'email' else value
+
+
+def _lookup_ref(field, value):
+    """
+    Returns the index document that maps a unique user field value to its user.
+
+    Lookup documents live in `user_lookups` under `<field>:<normalized value>`
+    and hold the owning `user_id`.
+
+    Args:
+        field (str): One of `USER_LOOKUP_FIELDS`.
+        value (str): The field value.
+
+    Returns:
+        DocumentReference: The lookup document reference.
+    """
+    key = quote(_normalize_lookup_value(field, value), safe='')
+    return db.collection('user_lookups').document(f"{field}:{key}")
+
+
+def _lookup_moves(current, changes):
+    """
+    Finds the unique fields whose lookup documents must move for an update.
+
+    Args:
+        current (dict): The user's current fields.
+        changes (dict): The fields being written.
+
+    Returns:
+        dict: Field -> lookup reference for the new value, for changed unique fields.
+    """
+    moves = {}
+    for field in USER_LOOKUP_FIELDS:
+        new_value = changes.get(field)
+        old_value = current.get(field)
+        if new_value and (not old_value or _normalize_lookup_value(field, old_value) != _normalize_lookup_value(field, new_value)):
+            moves[field] = _lookup_ref(field, new_value)
+    return moves
+
+
+def _apply_lookup_moves(transaction, user_id, current, moves):
+    """
+    Claims the new lookup documents for a user inside a transaction.
+
+    Reads the new lookups first (Firestore requires reads before writes), then
+    releases the old values and claims the new ones.
+
+    Args:
+        transaction (Transaction): The running transaction.
+        user_id (str): The user document ID.
+        current (dict): The user's current fields.
+        moves (dict): The result of `_lookup_moves`.
+
+    Raises:
+        DuplicateUserError: If a new value already belongs to another user.
+    """
+    if not moves:
+        return
+    for snap in transaction.get_all(list(moves.values())):
+        if snap.exists and snap.get('user_id') != user_id:
+            field = next(f for f, ref in moves.items() if ref.path == snap.reference.path)
+            raise DuplicateUserError(field)
+    for field, ref in moves.items():
+        if current.get(field):
+            transaction.delete(_lookup_ref(field, current[field]))
+        transaction.set(ref, {'user_id': user_id})
+
+
+def _missing_lookups(transaction, user_id, current, skip=()):
+    """
+    Finds the lookup documents missing for a user that predates them, inside a transaction.
+
+    Args:
+        transaction (Transaction): The running transaction.
+        user_id (str): The user document ID.
+        current (dict): The user's current fields.
+        skip (iterable): Fields whose lookups are being moved instead.
+
+    Returns:
+        list: The lookup references to create with the user's ID.
+    """
+    refs = {field: _lookup_ref(field, current[field]) for field in USER_LOOKUP_FIELDS
+            if current.get(field) and field not in skip}
+    if not refs:
+        return []
+    existing = {snap.reference.path: snap for snap in transaction.get_all(list(refs.values())) if snap.exists}
+    missing = []
+    for field, ref in refs.items():
+        snap = existing.get(ref.path)
+        if snap is None:
+            missing.append(ref)
+        elif snap.get('user_id') != user_id:
+            logger.warning(f"Duplicate {field} for users {snap.get('user_id')} and {user_id}")
+    return missing
+
 
 class UserModel:
     """
     Handles database operations related to users using Firestore.
+
+    Emails, NSU IDs and Firebase UIDs are unique across users. Each one has a
+    lookup document written in the same transaction as the user, so lookups are
+    single-key reads and concurrent signups cannot create duplicates.
     """
 
     @staticmethod
@@ -31,96 +248,381 @@ class UserModel:
 
         Raises:
             ValueError: If any required field is missing.
+            DuplicateUserError: If the email or NSU ID is already taken.
         """
         required_fields = ["name", "email", "phone_number", "password", "nsu_id"]
         for field in required_fields:
             if field not in data or not data[field]:
                 raise ValueError(f"Missing required field: {field}")
 
-        # Add timestamp
+        return UserModel.create_profile(data)
+
+    @staticmethod
+    def create_profile(data):
+        """
+        Creates a user document together with its lookup documents.
+
+        Unlike `create_user`, no fields are required; this is used for profiles
+        created from Firebase sign-in.
+
+        Args:
+            data (dict): The user fields.
+
+        Returns:
+            str: The unique ID of the created user.
+
+        Raises:
+            DuplicateUserError: If a unique field value is already taken.
+        """
         data["created_at"] = firestore.SERVER_TIMESTAMP
-        
-        # Create document reference and set data
         user_ref = db.collection('users').document()
-        user_ref.set(data)
+        lookups = {field: _lookup_ref(field, data[field]) for field in USER_LOOKUP_FIELDS if data.get(field)}
+
+        @firestore.transactional
+        def _create(transaction):
+            taken = set()
+            if lookups:
+                taken = {snap.reference.path for snap in transaction.get_all(list(lookups.values())) if snap.exists}
+            for field, ref in lookups.items():
+                if ref.path in taken:
+                    raise DuplicateUserError(field)
+            transaction.set(user_ref, data)
+            for ref in lookups.values():
+                transaction.set(ref, {'user_id': user_ref.id})
+
+        _create(db.transaction())
         return user_ref.id
 
     @staticmethod
-    def get_user_by_email(email):
+    def find_taken_field(values):
         """
-        Retrieves a user by their email address.
+        Checks which, if any, of the given unique field values is already taken.
+
+        All lookup documents are fetched in a single batched read.
 
         Args:
-            email (str): The email of the user to find.
+            values (dict): Field name -> value, for fields in `USER_LOOKUP_FIELDS`.
+
+        Returns:
+            str: The first taken field (in `values` order), or None.
+        """
+        refs = {field: _lookup_ref(field, value) for field, value in values.items() if value}
+        taken = set()
+        if refs:
+            taken = {snap.reference.path for snap in db.get_all(list(refs.values())) if snap.exists}
+        for field, ref in refs.items():
+            if ref.path in taken:
+                return field
+            if Config.USER_LOOKUP_FALLBACK and UserModel._find_user(field, values[field], ['__name__']):
+                return field
+        return None
+
+    @staticmethod
+    def _find_user(field, value, fields=None, transaction=None):
+        """
+        Retrieves the first user whose `field` equals `value` with a collection query.
+
+        Only used for users that predate the lookup documents
+        (see `USER_LOOKUP_FALLBACK` and `backfill_lookups`).
+
+        Args:
+            field (str): The field to match.
+            value (str): The value to match.
+            fields (list): Optional field paths to project; only these fields are read.
+            transaction (Transaction): Optional transaction to read in.
 
         Returns:
             dict: The user's details if found, otherwise None.
         """
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', email).limit(1).stream()
-        for doc in query:
+        query = db.collection('users').where(field, '==', value)
+        if fields:
+            query = query.select(fields)
+        for doc in query.limit(1).stream(transaction=transaction):
             user_data = doc.to_dict()
             user_data['_id'] = doc.id
             return user_data
         return None
 
     @staticmethod
-    def get_user_by_nsu_id(nsu_id):
+    def _get_by_lookup(field, value, fields=None):
+        """
+        Retrieves a user through the lookup document for a unique field.
+
+        Args:
+            field (str): One of `USER_LOOKUP_FIELDS`.
+            value (str): The value to match.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            dict: The user's details if found, otherwise None.
+        """
+        if not value:
+            return None
+        lookup = _lookup_ref(field, value).get()
+        if lookup.exists:
+            user_doc = db.collection('users').document(lookup.get('user_id')).get(field_paths=fields)
+            if user_doc.exists:
+                user_data = user_doc.to_dict()
+                user_data['_id'] = user_doc.id
+                return user_data
+        if Config.USER_LOOKUP_FALLBACK:
+            return UserModel._find_user(field, value, fields)
+        return None
+
+    @staticmethod
+    def get_user_by_email(email, fields=None):
+        """
+        Retrieves a user by their email address.
+
+        Args:
+            email (str): The email of the user to find.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            dict: The user's details if found, otherwise None.
+        """
+        return UserModel._get_by_lookup('email', email, fields)
+
+    @staticmethod
+    def get_user_by_nsu_id(nsu_id, fields=None):
         """
         Retrieves a user by their NSU ID.
 
         Args:
             nsu_id (str): The NSU ID of the user to find.
+            fields (list): Optional field paths to project.
 
         Returns:
             dict: The user's details if found, otherwise None.
         """
-        users_ref = db.collection('users')
-        query = users_ref.where('nsu_id', '==', str(nsu_id)).limit(1).stream()
-        for doc in query:
-            user_data = doc.to_dict()
-            user_data['_id'] = doc.id
-            return user_data
-        return None
+        return UserModel._get_by_lookup('nsu_id', str(nsu_id), fields)
 
     @staticmethod
-    def get_user_by_firebase_uid(firebase_uid):
+    def get_user_by_firebase_uid(firebase_uid, fields=None):
         """
         Retrieves a user by their Firebase UID.
 
         Args:
             firebase_uid (str): The Firebase UID of the user to find.
+            fields (list): Optional field paths to project.
 
         Returns:
             dict: The user's details if found, otherwise None.
         """
+        # Profiles created from Firebase sign-in are stored under their UID
+        if firebase_uid:
+            user_doc = db.collection('users').document(firebase_uid).get(field_paths=fields)
+            if user_doc.exists:
+                user_data = user_doc.to_dict()
+                user_data['_id'] = user_doc.id
+                return user_data
+        return UserModel._get_by_lookup('firebase_uid', firebase_uid, fields)
+
+    @staticmethod
+    def upsert_firebase_profile(firebase_uid, email, updates=None):
+        """
+        Resolves, creates or updates the profile of a Firebase user in one transaction.
+
+        The user document keyed by the UID and the UID and email lookups are read
+        in one batched get; only profiles that predate UID-keyed documents need a
+        second read. While `USER_LOOKUP_FALLBACK` is on, a profile without lookup
+        documents is found by a UID or email query, and its lookups are created
+        in the same transaction. Fields that already hold the requested values
+        are not rewritten, so a returning user costs no writes. New profiles are
+        stored under the Firebase UID.
+
+        Args:
+            firebase_uid (str): The verified Firebase UID.
+            email (str): The verified email from the ID token.
+            updates (dict): Fields to set on the profile (e.g. name, nsu_id).
+
+        Returns:
+            tuple: (profile dict without the password, bool whether it was created).
+
+        Raises:
+            DuplicateUserError: If an updated unique field belongs to another user.
+        """
         users_ref = db.collection('users')
-        query = users_ref.where('firebase_uid', '==', firebase_uid).limit(1).stream()
-        for doc in query:
-            user_data = doc.to_dict()
-            user_data['_id'] = doc.id
-            return user_data
-        return None
+        uid_user_ref = users_ref.document(firebase_uid)
+        refs = [uid_user_ref, _lookup_ref('firebase_uid', firebase_uid)]
+        if email:
+            refs.append(_lookup_ref('email', email))
+        changes = dict(updates or {})
+        changes['firebase_uid'] = firebase_uid
+
+        @firestore.transactional
+        def _upsert(transaction):
+            snaps = {snap.reference.path: snap for snap in transaction.get_all(refs)}
+            user_snap = snaps.get(uid_user_ref.path)
+            current = None
+            if user_snap is not None and user_snap.exists:
+                current = user_snap.to_dict()
+                current['_id'] = user_snap.id
+            else:
+                # Fall back to a legacy profile found through its uid or email lookup
+                owners = [snaps[ref.path].get('user_id') for ref in refs[1:]
+                          if ref.path in snaps and snaps[ref.path].exists]
+                if owners:
+                    legacy_snap = users_ref.document(owners[0]).get(transaction=transaction)
+                    if legacy_snap.exists:
+                        current = legacy_snap.to_dict()
+                        current['_id'] = legacy_snap.id
+
+            unindexed = False
+            if current is None and Config.USER_LOOKUP_FALLBACK:
+                # Profiles whose lookups have not been backfilled yet are found by query
+                current = UserModel._find_user('firebase_uid', firebase_uid, transaction=transaction)
+                if current is None and email:
+                    current = UserModel._find_user('email', email, transaction=transaction)
+                unindexed = current is not None
+
+            if current is not None:
+                user_id = current.pop('_id')
+                delta = {k: v for k, v in changes.items() if current.get(k) != v}
+                moves = _lookup_moves(current, delta)
+                missing = _missing_lookups(transaction, user_id, current, moves) if unindexed else []
+                if delta:
+                    _apply_lookup_moves(transaction, user_id, current, moves)
+                    transaction.update(users_ref.document(user_id), delta)
+                for ref in missing:
+                    transaction.set(ref, {'user_id': user_id})
+                current.update(delta)
+                current['_id'] = user_id
+                return current, False
+
+            profile = {'email': email, 'profile_complete': False}
+            profile.update(changes)
+            _apply_lookup_moves(transaction, firebase_uid, {}, _lookup_moves({}, profile))
+            transaction.set(uid_user_ref, dict(profile, created_at=firestore.SERVER_TIMESTAMP))
+            profile['_id'] = firebase_uid
+            return profile, True
+
+        profile, created = _upsert(db.transaction())
+        profile.pop('password', None)
+        return profile, created
+
+    @staticmethod
+    def get_user_by_firebase_uid_or_email(firebase_uid, email, fields=None):
+        """
+        Retrieves a user by Firebase UID, falling back to email.
+
+        Both lookups run concurrently; the UID match wins when both exist.
+
+        Args:
+            firebase_uid (str): The Firebase UID of the user to find.
+            email (str): The email of the user to find.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            dict: The user's details if found, otherwise None.
+        """
+        by_uid, by_email = run_concurrently(
+            lambda: UserModel.get_user_by_firebase_uid(firebase_uid, fields) if firebase_uid else None,
+            lambda: UserModel.get_user_by_email(email, fields) if email else None,
+        )
+        return by_uid or by_email
 
     @staticmethod
     def update_user(user_id, data):
         """
         Updates a user document in Firestore.
 
+        When a unique field (email, NSU ID, Firebase UID) changes, its lookup
+        documents are moved in the same transaction.
+
         Args:
             user_id (str): The document ID of the user.
             data (dict): The fields to update.
 
         Returns:
             bool: True if successful, False otherwise.
+
+        Raises:
+            DuplicateUserError: If a new unique field value belongs to another user.
         """
         try:
             user_ref = db.collection('users').document(user_id)
-            user_ref.update(data)
+            if not any(data.get(field) for field in USER_LOOKUP_FIELDS):
+                user_ref.update(data)
+                return True
+
+            @firestore.transactional
+            def _update(transaction):
+                current = user_ref.get(transaction=transaction).to_dict() or {}
+                moves = _lookup_moves(current, data)
+                # Lookups are claimed (and checked) before the user write is queued
+                _apply_lookup_moves(transaction, user_id, current, moves)
+                transaction.update(user_ref, data)
+
+            _update(db.transaction())
             return True
+        except DuplicateUserError:
+            raise
         except Exception:
             return False
 
+    @staticmethod
+    def backfill_lookups(batch_size=100):
+        """
+        Creates missing lookup documents for existing users.
+
+        Users are scanned in document ID order, one batch at a time, and only
+        missing lookups are written, so the backfill can be stopped and re-run
+        safely. Values already claimed by another user are reported, not overwritten.
+
+        Args:
+            batch_size (int): The number of users processed per batch (at most 160,
+                so a batch stays within Firestore's 500-write limit).
+
+        Returns:
+            dict: Counts of `users` scanned, lookups `created`, and `conflicts`.
+        """
+        stats = {'users': 0, 'created': 0, 'conflicts': 0}
+        # Up to three lookups per user must fit in one 500-write batch
+        batch_size = max(1, min(batch_size, 160))
+        last_doc = None
+        while True:
+            query = db.collection('users').order_by('__name__').limit(batch_size)
+            if last_doc is not None:
+                query = query.start_after(last_doc)
+            docs = list(query.stream())
+            if not docs:
+                break
+
+            wanted = {}
+            for doc in docs:
+                user_data = doc.to_dict()
+                for field in USER_LOOKUP_FIELDS:
+                    if not user_data.get(field):
+                        continue
+                    ref = _lookup_ref(field, user_data[field])
+                    if ref.path in wanted and wanted[ref.path][1] != doc.id:
+                        stats['conflicts'] += 1
+                        logger.warning(f"Duplicate {field} for users {wanted[ref.path][1]} and {doc.id}")
+                        continue
+                    wanted[ref.path] = (ref, doc.id)
+
+            owners = {}
+            if wanted:
+                owners = {snap.reference.path: snap.get('user_id')
+                          for snap in db.get_all([ref for ref, _ in wanted.values()]) if snap.exists}
+            batch = db.batch()
+            writes = 0
+            for path, (ref, owner_id) in wanted.items():
+                if path not in owners:
+                    batch.set(ref, {'user_id': owner_id})
+                    writes += 1
+                elif owners[path] != owner_id:
+                    stats['conflicts'] += 1
+                    logger.warning(f"Lookup {ref.id} already belongs to user {owners[path]}, not {owner_id}")
+            if writes:
+                batch.commit()
+            stats['created'] += writes
+
+            stats['users'] += len(docs)
+            last_doc = docs[-1]
+        return stats
+
 
 class FoundItemModel:
     """
@@ -128,7 +630,7 @@ class FoundItemModel:
     """
 
     @staticmethod
-    def report_found_item(description, location, image_path):
+    def report_found_item(description, location, image_path, coordinates=None):
         """
         Reports a found item.
 
@@ -136,6 +638,7 @@ class FoundItemModel:
             description (str): A description of the found item.
             location (str): The location where the item was found.
             image_path (str): Path to the image of the found item.
+            coordinates (tuple): Optional (lat, lng), stored with a geohash.
 
         Returns:
             str: The unique ID of the reported item.
@@ -144,47 +647,46 @@ class FoundItemModel:
             "description": description,
             "location": location,
             "image_path": image_path,
-            "created_at": firestore.SERVER_TIMESTAMP
+            "created_at": firestore.SERVER_TIMESTAMP,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+            **geo_fields(coordinates),
         }
         item_ref = db.collection('found_items').document()
         item_ref.set(data)
+        ItemStatsModel.record('found', location)
         return item_ref.id
 
     @staticmethod
-    def get_found_items(limit=10, skip=0):
+    def iter_found_items(limit=10, skip=0, fields=None):
+        """
+        Streams a page of found items, newest first.
+
+        Args:
+            limit (int): The maximum number of items to retrieve.
+            skip (int): The number of items to skip.
+            fields (list): Optional field paths to project; only these fields are read.
+
+        Yields:
+            dict: Each found item with its details.
+        """
+        items_ref = db.collection('found_items')
+        query = items_ref.order_by('created_at', direction=firestore.Query.DESCENDING)
+        return _iter_page(query, limit, skip, fields)
+
+    @staticmethod
+    def get_found_items(limit=10, skip=0, fields=None):
         """
         Retrieves a list of found items.
 
         Args:
             limit (int): The maximum number of items to retrieve.
             skip (int): The number of items to skip.
+            fields (list): Optional field paths to project.
 
         Returns:
             list: A list of found items with their details.
         """
-        items_ref = db.collection('found_items')
-        query = items_ref.order_by('created_at', direction=firestore.Query.DESCENDING)
-        
-        # Note: Firestore doesn't support skip efficiently, so we fetch skip+limit and slice
-        if skip > 0:
-            # Get skip items to determine offset
-            offset_query = query.limit(skip).stream()
-            last_doc = None
-            for doc in offset_query:
-                last_doc = doc
-            if last_doc:
-                query = query.start_after(last_doc)
-        
-        query = query.limit(limit)
-        items = []
-        for doc in query.stream():
-            item_data = doc.to_dict()
-            item_data['_id'] = doc.id
-            # Convert Firestore Timestamp to datetime if needed
-            if 'created_at' in item_data and hasattr(item_data['created_at'], 'timestamp'):
-                item_data['created_at'] = item_data['created_at'].timestamp()
-            items.append(item_data)
-        return items
+        return list(FoundItemModel.iter_found_items(limit=limit, skip=skip, fields=fields))
 
 
 class LostItemModel:
@@ -193,31 +695,37 @@ class LostItemModel:
     """
 
     @staticmethod
-    def report_lost_item(description, location, image_path, reported_by):
+    def report_lost_item(description, location, image_path, reported_by, coordinates=None):
         """
         Reports a lost item.
 
+        The report is first checked against recent open reports (see
+        `DuplicateReportModel`). A near-duplicate of an open report by the same
+        user is merged into it instead of being stored again; one that matches
+        another user's report is stored with `possible_duplicate_of` set for
+        the moderators.
+
         Args:
             description (str): A description of the lost item.
             location (str): The location where the item was lost.
             image_path (str): Path to the image of the lost item.
             reported_by (str): The user who reported the lost item.
+            coordinates (tuple): Optional (lat, lng), stored with a geohash.
 
         Returns:
-            str: The unique ID of the reported lost item.
+            tuple: (ID of the reported lost item, True if the report was merged
+            into an existing one, whose ID is returned).
         """
-        data = {
-            "description": description,
-            "location": location,
-            "image_path": image_path,
-            "reported_by": reported_by,
-            "is_found": False,
-            "is_approved": False,
-            "created_at": firestore.SERVER_TIMESTAMP,
-        }
-        item_ref = db.collection('lost_items').document()
-        item_ref.set(data)
-        return item_ref.id
+        signature, duplicate = DuplicateReportModel.check(description, location)
+        if duplicate and duplicate['reported_by'] == reported_by and Config.DEDUPE_MERGE:
+            if DuplicateReportModel.merge(duplicate['item_id'], image_path):
+                return duplicate['item_id'], True
+
+        data = lost_item_data(description, location, image_path, reported_by, coordinates, duplicate)
+        item_ref, batch = lost_item_batch(db, data, signature)
+        batch.commit()
+        ItemStatsModel.record('lost', location)
+        return item_ref.id, False
 
     @staticmethod
     def mark_item_as_found(item_id):
@@ -247,97 +755,189 @@ class LostItemModel:
             "image_path": item_data.get("image_path"),
             "reported_by": item_data.get("reported_by"),
             "found_at": firestore.SERVER_TIMESTAMP,
+            "updated_at": firestore.SERVER_TIMESTAMP,
         }
+        for name in ('lat', 'lng', 'geohash'):
+            if name in item_data:
+                found_item_data[name] = item_data[name]
         found_item_ref = db.collection('found_items').document()
-        found_item_ref.set(found_item_data)
 
-        # Delete from lost_items
-        item_ref.delete()
+        # Move the item atomically and leave a tombstone for clients syncing changes
+        batch = db.batch()
+        batch.set(found_item_ref, found_item_data)
+        batch.delete(item_ref)
+        ItemSyncModel.add_tombstone(batch, 'lost_items', item_id, 'found', moved_to=found_item_ref.id)
+        DuplicateReportModel.remove_signature(batch, item_id)
+        batch.commit()
+        ItemStatsModel.record('marked_found', item_data.get("location"))
+        feed_cache.clear()
 
         return item_id
 
     @staticmethod
-    def get_lost_items(limit=10, skip=0):
+    def iter_lost_items(limit=10, skip=0, fields=None):
         """
-        Retrieves a list of lost items (approved and not found).
+        Streams a page of lost items (approved and not found), newest first.
 
         Args:
             limit (int): The maximum number of items to retrieve.
             skip (int): The number of items to skip.
+            fields (list): Optional field paths to project; only these fields are read.
 
-        Returns:
-            list: A list of lost items with their details.
+        Yields:
+            dict: Each lost item with its details.
         """
         items_ref = db.collection('lost_items')
         query = items_ref.where('is_found', '==', False).where('is_approved', '==', True)
         query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
-        
-        # Handle skip
-        if skip > 0:
-            offset_query = query.limit(skip).stream()
-            last_doc = None
-            for doc in offset_query:
-                last_doc = doc
-            if last_doc:
-                query = query.start_after(last_doc)
-        
-        query = query.limit(limit)
-        items = []
-        for doc in query.stream():
-            item_data = doc.to_dict()
-            item_data['_id'] = doc.id
-            if 'created_at' in item_data and hasattr(item_data['created_at'], 'timestamp'):
-                item_data['created_at'] = item_data['created_at'].timestamp()
-            items.append(item_data)
-        return items
+        return _iter_page(query, limit, skip, fields)
 
     @staticmethod
-    def get_lost_items_admin(limit=10, skip=0):
+    def get_lost_items(limit=10, skip=0, fields=None):
         """
-        Retrieves a list of lost items pending approval.
+        Retrieves a list of lost items (approved and not found).
 
         Args:
             limit (int): The maximum number of items to retrieve.
             skip (int): The number of items to skip.
+            fields (list): Optional field paths to project.
 
         Returns:
             list: A list of lost items with their details.
         """
+        items = item_reads.do(lost_items_key(limit, skip, fields), lambda: list(LostItemModel.iter_lost_items(limit=limit, skip=skip, fields=fields)))
+        # Concurrent callers share the fetched list, and callers add response fields in place
+        return [dict(item) for item in items]
+
+    @staticmethod
+    def iter_lost_items_admin(limit=10, skip=0, fields=None):
+        """
+        Streams a page of lost items pending approval, newest first.
+
+        Args:
+            limit (int): The maximum number of items to retrieve.
+            skip (int): The number of items to skip.
+            fields (list): Optional field paths to project; only these fields are read.
+
+        Yields:
+            dict: Each pending lost item with its details.
+        """
         items_ref = db.collection('lost_items')
         query = items_ref.where('is_approved', '==', False)
         query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
-        
-        # Handle skip
-        if skip > 0:
-            offset_query = query.limit(skip).stream()
-            last_doc = None
-            for doc in offset_query:
-                last_doc = doc
-            if last_doc:
-                query = query.start_after(last_doc)
-        
-        query = query.limit(limit)
-        items = []
-        for doc in query.stream():
-            item_data = doc.to_dict()
-            item_data['_id'] = doc.id
-            if 'created_at' in item_data and hasattr(item_data['created_at'], 'timestamp'):
-                item_data['created_at'] = item_data['created_at'].timestamp()
-            items.append(item_data)
-        return items
+        return _iter_page(query, limit, skip, fields)
 
     @staticmethod
-    def get_recent_feed(limit=10):
+    def get_lost_items_admin(limit=10, skip=0, fields=None):
+        """
+        Retrieves a list of lost items pending approval.
+
+        Args:
+            limit (int): The maximum number of items to retrieve.
+            skip (int): The number of items to skip.
+            fields (list): Optional field paths to project.
+
+        Returns:
+            list: A list of lost items with their details.
+        """
+        return list(LostItemModel.iter_lost_items_admin(limit=limit, skip=skip, fields=fields))
+
+    @staticmethod
+    def get_recent_feed(limit=10, fields=None, refresh=False):
         """
         Retrieves a feed of recent lost items (approved and not found).
 
+        Pages are cached for `FEED_CACHE_TTL` seconds and kept warm by the
+        scheduler's `prewarm_feed` job; approving or resolving an item clears the cache.
+        Concurrent misses share one read through `get_lost_items`.
+
         Args:
             limit (int): The maximum number of items to retrieve.
+            fields (list): Optional field paths to project.
+            refresh (bool): Bypass the cache and store a fresh page (used by the prewarm job).
 
         Returns:
             list: A list of recent lost items.
         """
-        return LostItemModel.get_lost_items(limit=limit, skip=0)
+        key = (limit, tuple(fields) if fields else None)
+        items = None if refresh else feed_cache.get(key)
+        if items is None:
+            items = LostItemModel.get_lost_items(limit=limit, skip=0, fields=fields)
+            feed_cache.set(key, items, touch=not refresh)
+        # Callers add response fields in place, so each gets its own copies
+        return [dict(item) for item in items]
+
+    @staticmethod
+    def search(query, limit=20, scan_limit=100):
+        """
+        Searches open lost items whose description contains a text, case-insensitively.
+
+        Firestore has no full-text search, so up to `scan_limit` approved, not
+        found items are read and filtered here. Concurrent identical searches
+        share one read.
+
+        Args:
+            query (str): The text to look for.
+            limit (int): The maximum number of matches to return.
+            scan_limit (int): The maximum number of items scanned.
+
+        Returns:
+            list: The matching items (`_id`, `description`, `location`, `image`, `reported_by`).
+        """
+        query_lower = query.lower()
+
+        def _search():
+            items_ref = db.collection('lost_items')
+            docs = items_ref.where('is_approved', '==', True).where('is_found', '==', False).limit(scan_limit)
+            docs = docs.select(['description', 'location', 'image_path', 'reported_by']).stream()
+            result = []
+            for doc in docs:
+                item = doc.to_dict()
+                if query_lower in (item.get("description") or "").lower():
+                    result.append({
+                        "_id": doc.id,
+                        "description": item.get("description"),
+                        "location": item.get("location"),
+                        "image": item.get("image_path") or None,
+                        "reported_by": item.get("reported_by"),
+                    })
+                    if len(result) >= limit:
+                        break
+            return result
+
+        # Keys are published on /metrics, so the search text is hashed
+        digest = hashlib.blake2b(query_lower.encode(), digest_size=12).hexdigest()
+        results = item_reads.do(f"search:{limit}:{scan_limit}:{digest}", _search)
+        return [dict(item) for item in results]
+
+    @staticmethod
+    def archive_stale_reports(older_than_days=30, limit=200):
+        """
+        Moves lost item reports that were never approved to `archived_lost_items`.
+
+        Keeps the moderation queue in `/lost-items-admin` (and its queries) small.
+        Reports are processed oldest first, at most `limit` per call.
+
+        Args:
+            older_than_days (float): Archive reports pending for longer than this.
+            limit (int): The maximum number of reports archived per call (at most 166).
+
+        Returns:
+            dict: The number of reports `archived`.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        query = db.collection('lost_items').where('is_approved', '==', False).where('created_at', '<', cutoff)
+        docs = list(query.order_by('created_at').limit(min(limit, 166)).stream())
+        if not docs:
+            return {'archived': 0}
+        batch = db.batch()
+        archive_ref = db.collection('archived_lost_items')
+        for doc in docs:
+            batch.set(archive_ref.document(doc.id), dict(doc.to_dict(), archived_at=firestore.SERVER_TIMESTAMP))
+            batch.delete(doc.reference)
+            DuplicateReportModel.remove_signature(batch, doc.id)
+        batch.commit()
+        return {'archived': len(docs)}
 
     @staticmethod
     def approve_item(item_id):
@@ -355,42 +955,1526 @@ class LostItemModel:
             item_doc = item_ref.get()
             if not item_doc.exists:
                 return False
-            item_ref.update({'is_approved': True})
+            item_data = item_doc.to_dict()
+            if item_data.get('is_approved'):
+                return True  # Already approved; do not count it twice
+            item_ref.update({
+                'is_approved': True,
+                'approved_at': firestore.SERVER_TIMESTAMP,
+                'updated_at': firestore.SERVER_TIMESTAMP,
+            })
+            ItemStatsModel.record('approved', item_data.get('location'))
+            feed_cache.clear()
+            events.publish_item_approved(item_id, item_data)
             return True
         except Exception:
             return False
 
 
-class MessageModel:
+# Collections mirrored by the item change feed
+ITEM_SYNC_COLLECTIONS = ('lost_items', 'found_items')
+
+# Fields the change feed needs to classify a change, read in addition to the requested ones
+ITEM_SYNC_FIELDS = ['created_at', 'updated_at', 'approved_at', 'found_at', 'is_found']
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_sync_cursor(value):
     """
-    Handles database operations related to user messages using Firestore.
+    Converts a timestamp to a change feed cursor (integer microseconds since the epoch).
+
+    Integers are used so cursors round-trip exactly; Unix timestamps as floats
+    lose the last microsecond.
     """
+    return (value - _EPOCH) // timedelta(microseconds=1)
 
-    @staticmethod
-    def send_message(data):
-        """
-        Sends a new message.
 
-        Args:
-            data (dict): The message data.
+def from_sync_cursor(cursor):
+    """
+    Parses a change feed cursor into a UTC datetime.
 
-        Returns:
-            str: The unique ID of the sent message.
-        """
-        # Ensure created_at is a Firestore timestamp if not already set
-        if 'created_at' not in data:
+    Raises:
+        ValueError: If the cursor is not a non-negative integer.
+    """
+    micros = int(cursor)
+    if micros < 0:
+        raise ValueError("cursor must not be negative")
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+# Sources of the change feed, in tiebreak order for changes with the same timestamp
+ITEM_SYNC_SOURCES = ITEM_SYNC_COLLECTIONS + ('item_tombstones',)
+
+
+def parse_sync_cursor(cursor):
+    """
+    Parses an item change feed cursor.
+
+    The cursor is `"<micros>:<source>:<document ID>"`, the position of the last
+    change returned, or a bare `"<micros>"` (e.g. `0` for a full sync), meaning
+    every change at that time has been seen.
+
+    Returns:
+        tuple: (UTC datetime, source or None, document ID or None).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    micros, _, position = str(cursor).partition(":")
+    source, _, doc_id = position.partition(":")
+    if position and (source not in ITEM_SYNC_SOURCES or not doc_id):
+        raise ValueError("invalid cursor position")
+    return from_sync_cursor(micros), source or None, doc_id or None
+
+
+def _sync_cursor(updated_at, source, doc_id):
+    """
+    Formats the change feed cursor of a change (see `parse_sync_cursor`).
+    """
+    return f"{to_sync_cursor(updated_at)}:{source}:{doc_id}"
+
+
+class ItemSyncModel:
+    """
+    Change feed over lost and found items, for clients keeping a local mirror.
+
+    Every write to `lost_items` and `found_items` sets `updated_at`, and moves and
+    deletes leave a document in `item_tombstones`, so the changes after a cursor
+    can be read with one range query per collection.
+    """
+
+    @staticmethod
+    def add_tombstone(batch, collection, item_id, reason, moved_to=None):
+        """
+        Adds a tombstone for a removed item to a batch.
+
+        Args:
+            batch (WriteBatch): The batch that also removes the item.
+            collection (str): The collection the item was removed from.
+            item_id (str): The ID of the removed item.
+            reason (str): Why the item was removed (e.g. `found`, `deleted`).
+            moved_to (str): The ID of the item's new document, for moves.
+        """
+        tombstone = {
+            "collection": collection,
+            "item_id": item_id,
+            "reason": reason,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }
+        if moved_to:
+            tombstone["moved_to"] = moved_to
+        batch.set(db.collection('item_tombstones').document(), tombstone)
+
+    @staticmethod
+    def _delta(collection, doc, since, fields):
+        """
+        Classifies a changed item as an `add`, `update` or `remove` delta.
+
+        Args:
+            collection (str): The item's collection.
+            doc (DocumentSnapshot): The changed item.
+            since (datetime): The cursor the client synced from.
+            fields (list): The requested field paths, or None for whole items.
+
+        Returns:
+            tuple: (updated_at, delta dict).
+        """
+        data = doc.to_dict()
+        updated_at = data.get('updated_at')
+        delta = {"op": "update", "collection": collection, "_id": doc.id}
+        if data.get('is_found'):
+            delta["op"] = "remove"
+            return updated_at, delta
+        # The item became visible after the cursor: approval for lost items, creation for found ones
+        appeared_at = data.get('approved_at') if collection == 'lost_items' else data.get('created_at') or data.get('found_at')
+        if appeared_at is not None and appeared_at > since:
+            delta["op"] = "add"
+        if fields is not None:
+            data = {name: data[name] for name in fields if name in data}
+        data['_id'] = doc.id
+        for name in ('created_at', 'updated_at', 'approved_at', 'found_at'):
+            if hasattr(data.get(name), 'timestamp'):
+                data[name] = data[name].timestamp()
+        delta["item"] = data
+        return updated_at, delta
+
+    @staticmethod
+    def get_changes(since, limit=100, fields=None):
+        """
+        Retrieves the item changes after a cursor, oldest first.
+
+        Lost items are only included once approved, since pending reports are
+        never shown to clients. Each collection and the tombstones are read with
+        one bounded range query on `updated_at`, run in parallel. Changes are
+        ordered by (`updated_at`, source, document ID), and the cursor records
+        that position, so changes sharing a timestamp are never skipped or
+        repeated across pages. Changes are only returned up to a point every
+        query has fully covered.
+
+        Args:
+            since (tuple): The parsed cursor (see `parse_sync_cursor`).
+            limit (int): The maximum number of changes to return.
+            fields (list): Optional item field paths to read and return.
+
+        Returns:
+            dict: `changes` (each with `op`, `collection`, `_id` and, except for
+            removals, `item`), the `cursor` to send next time, and `has_more`.
+        """
+        updated_since, cursor_source, cursor_id = since
+        cursor_rank = ITEM_SYNC_SOURCES.index(cursor_source) if cursor_source else len(ITEM_SYNC_SOURCES)
+        projection = None
+        if fields is not None:
+            projection = list(dict.fromkeys(fields + ITEM_SYNC_FIELDS))
+
+        def _after_cursor(query, source):
+            # Sources ranked before the cursor's have been read through its timestamp,
+            # the cursor's own up to its document, and later ones not at all at that time
+            rank = ITEM_SYNC_SOURCES.index(source)
+            if rank < cursor_rank:
+                query = query.where('updated_at', '>', updated_since)
+            else:
+                query = query.where('updated_at', '>=', updated_since)
+            query = query.order_by('updated_at').order_by('__name__')
+            if rank == cursor_rank:
+                query = query.start_after([updated_since, cursor_id])
+            return query.limit(limit)
+
+        def _items(collection):
+            query = db.collection(collection)
+            if collection == 'lost_items':
+                query = query.where('is_approved', '==', True)
+            if projection:
+                query = query.select(projection)
+            rank = ITEM_SYNC_SOURCES.index(collection)
+            changes = []
+            for doc in _after_cursor(query, collection).stream():
+                updated_at, delta = ItemSyncModel._delta(collection, doc, updated_since, fields)
+                changes.append(((updated_at, rank, doc.id), delta))
+            return changes
+
+        def _tombstones():
+            rank = ITEM_SYNC_SOURCES.index('item_tombstones')
+            changes = []
+            for doc in _after_cursor(db.collection('item_tombstones'), 'item_tombstones').stream():
+                tombstone = doc.to_dict()
+                changes.append(((tombstone.get('updated_at'), rank, doc.id), {
+                    "op": "remove",
+                    "collection": tombstone.get('collection'),
+                    "_id": tombstone.get('item_id'),
+                }))
+            return changes
+
+        pages = run_concurrently(*[lambda c=c: _items(c) for c in ITEM_SYNC_COLLECTIONS], _tombstones)
+
+        # A full page may have more changes after its last one, so nothing past
+        # the earliest such position is known to be complete yet
+        has_more = False
+        horizon = None
+        for page in pages:
+            if len(page) >= limit:
+                has_more = True
+                if horizon is None or page[-1][0] < horizon:
+                    horizon = page[-1][0]
+        changes = sorted((change for page in pages for change in page if change[0][0] is not None),
+                         key=lambda c: c[0])
+        if horizon is not None:
+            changes = [c for c in changes if c[0] <= horizon]
+        if len(changes) > limit:
+            has_more = True
+            changes = changes[:limit]
+
+        if changes:
+            updated_at, rank, doc_id = changes[-1][0]
+            cursor = _sync_cursor(updated_at, ITEM_SYNC_SOURCES[rank], doc_id)
+        elif cursor_source:
+            cursor = _sync_cursor(updated_since, cursor_source, cursor_id)
+        else:
+            cursor = str(to_sync_cursor(updated_since))
+        return {"changes": [delta for _, delta in changes], "cursor": cursor, "has_more": has_more}
+
+    @staticmethod
+    def backfill_updated_at(batch_size=200):
+        """
+        Sets `updated_at` on items written before the change feed existed.
+
+        `updated_at` is copied from `created_at` (or `found_at`), so the items
+        appear in a full sync from cursor 0. Items are scanned in document ID
+        order and only those missing the field are written, so the backfill can
+        be stopped and re-run safely.
+
+        Args:
+            batch_size (int): The number of items processed per batch (at most 500).
+
+        Returns:
+            dict: Counts of `items` scanned and items `updated`.
+        """
+        stats = {'items': 0, 'updated': 0}
+        for collection in ITEM_SYNC_COLLECTIONS:
+            last_doc = None
+            while True:
+                query = db.collection(collection).order_by('__name__')
+                query = query.select(['created_at', 'found_at', 'updated_at']).limit(batch_size)
+                if last_doc is not None:
+                    query = query.start_after(last_doc)
+                docs = list(query.stream())
+                if not docs:
+                    break
+
+                batch = db.batch()
+                writes = 0
+                for doc in docs:
+                    data = doc.to_dict()
+                    if data.get('updated_at') is None:
+                        batch.update(doc.reference, {
+                            'updated_at': data.get('created_at') or data.get('found_at') or firestore.SERVER_TIMESTAMP,
+                        })
+                        writes += 1
+                if writes:
+                    batch.commit()
+                stats['updated'] += writes
+                stats['items'] += len(docs)
+                last_doc = docs[-1]
+        return stats
+
+
+def duplicate_fields(duplicate):
+    """
+    Returns the fields flagging a report as a likely duplicate of another user's report.
+
+    Args:
+        duplicate (dict): The match found by `DuplicateReportModel.check`, or None.
+
+    Returns:
+        dict: `possible_duplicate_of` and `duplicate_similarity`, or an empty dict.
+    """
+    if not duplicate:
+        return {}
+    return {
+        "possible_duplicate_of": duplicate['item_id'],
+        "duplicate_similarity": round(duplicate['similarity'], 3),
+    }
+
+
+def lost_item_data(description, location, image_path, reported_by, coordinates=None, duplicate=None):
+    """
+    Builds the document of a new lost item report.
+
+    Args:
+        description (str): A description of the lost item.
+        location (str): The location where the item was lost.
+        image_path (str): Path to the image of the lost item.
+        reported_by (str): The user who reported the lost item.
+        coordinates (tuple): Optional (lat, lng), stored with a geohash.
+        duplicate (dict): The match found by `DuplicateReportModel.check`, or None.
+
+    Returns:
+        dict: The item data.
+    """
+    return {
+        "description": description,
+        "location": location,
+        "image_path": image_path,
+        "reported_by": reported_by,
+        "is_found": False,
+        "is_approved": False,
+        "created_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+        **geo_fields(coordinates),
+        **duplicate_fields(duplicate),
+    }
+
+
+def lost_item_batch(client, data, signature=None):
+    """
+    Builds the batch storing a new lost item report and its duplicate signature.
+
+    Args:
+        client (Client or AsyncClient): The Firestore client to write with.
+        data (dict): The item data (see `lost_item_data`).
+        signature (list): The report's MinHash signature, or None.
+
+    Returns:
+        tuple: (the new item's reference, the uncommitted batch).
+    """
+    item_ref = client.collection('lost_items').document()
+    batch = client.batch()
+    batch.set(item_ref, data)
+    if signature is not None:
+        batch.set(client.collection('lost_item_signatures').document(item_ref.id), {
+            'minhash': signature,
+            'bands': lsh_bands(signature),
+            'reported_by': data.get('reported_by'),
+            'created_at': firestore.SERVER_TIMESTAMP,
+        })
+    return item_ref, batch
+
+
+def duplicate_candidates_query(client, signature):
+    """
+    Returns the query for the signatures sharing an LSH band with a report.
+    """
+    query = client.collection('lost_item_signatures').where('bands', 'array_contains_any', lsh_bands(signature))
+    return query.limit(Config.DEDUPE_MAX_CANDIDATES)
+
+
+def stale_signatures_batch(client, stale):
+    """
+    Builds the batch deleting expired signature documents.
+    """
+    batch = client.batch()
+    for doc_id in stale:
+        batch.delete(client.collection('lost_item_signatures').document(doc_id))
+    return batch
+
+
+def duplicate_merge_update(item_data, image_path=None):
+    """
+    Builds the update folding a repeated report into the open report it duplicates.
+
+    Args:
+        item_data (dict): The original report, or None if it no longer exists.
+        image_path (str): The image of the repeated report, if any.
+
+    Returns:
+        dict: The update, or None if the original is no longer open.
+    """
+    if item_data is None or item_data.get('is_found'):
+        return None
+    update = {
+        'duplicate_reports': firestore.Increment(1),
+        'updated_at': firestore.SERVER_TIMESTAMP,
+    }
+    if image_path and not item_data.get('image_path'):
+        update['image_path'] = image_path
+    return update
+
+
+def record_duplicate_merge(update):
+    """
+    Refreshes the feed cache after a merge that changed the image, and counts the merge.
+    """
+    if 'image_path' in update:
+        feed_cache.clear()
+    metrics.incr("dedupe.merged")
+
+
+def pick_duplicate(signature, candidates, cutoff=None):
+    """
+    Picks the most similar recent candidate of a report.
+
+    Args:
+        signature (list): The report's MinHash signature.
+        candidates (iterable): Snapshots from `lost_item_signatures`.
+        cutoff (datetime): Candidates created before this are too old.
+            Defaults to `DEDUPE_WINDOW_DAYS` ago.
+
+    Returns:
+        tuple: (the best match above `DEDUPE_THRESHOLD` as a dict with
+        `item_id`, `reported_by` and `similarity`, or None; IDs of stale
+        signature documents).
+    """
+    if cutoff is None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=Config.DEDUPE_WINDOW_DAYS)
+    best = None
+    stale = []
+    for doc in candidates:
+        data = doc.to_dict()
+        created_at = data.get('created_at')
+        if created_at is not None and created_at < cutoff:
+            stale.append(doc.id)
+            continue
+        score = similarity(signature, data.get('minhash') or [])
+        if score >= Config.DEDUPE_THRESHOLD and (best is None or score > best['similarity']):
+            best = {'item_id': doc.id, 'reported_by': data.get('reported_by'), 'similarity': score}
+    return best, stale
+
+
+class DuplicateReportModel:
+    """
+    Near-duplicate detection for lost item reports.
+
+    The MinHash signature and LSH band keys (see `dedupe.py`) of each open
+    report are kept in `lost_item_signatures`, under the report's ID, until the
+    item is found or archived; signatures older than `DEDUPE_WINDOW_DAYS` are
+    dropped when a probe comes across them.
+    """
+
+    @staticmethod
+    def check(description, location):
+        """
+        Computes a report's signature and looks for a recent near-duplicate.
+
+        Detection failures are logged and never block the report.
+
+        Args:
+            description (str): The item description.
+            location (str): The location.
+
+        Returns:
+            tuple: (signature, match dict or None); the signature is None when
+            detection is disabled.
+        """
+        if not Config.DEDUPE_ENABLED:
+            return None, None
+        signature = minhash(description, location)
+        try:
+            duplicate, stale = pick_duplicate(signature, duplicate_candidates_query(db, signature).stream())
+            if stale:
+                stale_signatures_batch(db, stale).commit()
+        except Exception as e:
+            logger.warning(f"Duplicate report check failed: {e}")
+            return signature, None
+        metrics.incr("dedupe.duplicates" if duplicate else "dedupe.unique")
+        return signature, duplicate
+
+    @staticmethod
+    def remove_signature(batch, item_id):
+        """
+        Adds the deletion of a report's signature document to a batch.
+        """
+        batch.delete(db.collection('lost_item_signatures').document(item_id))
+
+    @staticmethod
+    def merge(item_id, image_path=None):
+        """
+        Folds a repeated report into the open report it duplicates.
+
+        Counts the repeat in `duplicate_reports`, and adopts the new image if
+        the original report has none.
+
+        Args:
+            item_id (str): The ID of the original report.
+            image_path (str): The image of the repeated report, if any.
+
+        Returns:
+            bool: True if merged, False if the original is no longer open.
+        """
+        item_ref = db.collection('lost_items').document(item_id)
+        update = duplicate_merge_update(item_ref.get().to_dict(), image_path)
+        if update is None:
+            return False
+        item_ref.update(update)
+        record_duplicate_merge(update)
+        return True
+
+
+# Fields read for nearby items
+NEARBY_FIELDS = ['description', 'location', 'image_path', 'reported_by', 'created_at',
+                 'lat', 'lng', 'is_approved', 'is_found']
+
+
+class ItemGeoModel:
+    """
+    Finds items reported with coordinates near a point.
+    """
+
+    @staticmethod
+    def _visible(collection, data):
+        """
+        Whether an item is listed publicly (approved, open lost items; all found items).
+        """
+        if collection == 'lost_items':
+            return data.get('is_approved') is True and not data.get('is_found')
+        return True
+
+    @staticmethod
+    def find_within(collection, lat, lng, radius_m, limit=20):
+        """
+        Returns the items of a collection within `radius_m` of a point, nearest first.
+
+        Runs one `geohash` range query per cell covering the circle (at most
+        `GEO_MAX_RANGES`, in parallel), then drops the items outside the circle
+        by exact distance. Each range query reads at most `GEO_SCAN_LIMIT` items.
+
+        Args:
+            collection (str): `lost_items` or `found_items`.
+            lat (float): Latitude of the point.
+            lng (float): Longitude of the point.
+            radius_m (float): The search radius in meters.
+            limit (int): The maximum number of items returned.
+
+        Returns:
+            tuple: (items with `distance_m`, whether a range query hit the scan limit).
+        """
+        items_ref = db.collection(collection)
+        scan_limit = Config.GEO_SCAN_LIMIT
+
+        def _range(start, end):
+            query = items_ref.where('geohash', '>=', start).where('geohash', '<=', end).order_by('geohash')
+            return list(query.select(NEARBY_FIELDS).limit(scan_limit).stream())
+
+        results = run_concurrently(*[lambda start=start, end=end: _range(start, end)
+                                     for start, end in geohash_ranges(lat, lng, radius_m, Config.GEO_MAX_RANGES)])
+        truncated = any(len(docs) >= scan_limit for docs in results)
+        items = {}
+        for docs in results:
+            for doc in docs:
+                data = doc.to_dict()
+                if doc.id in items or not ItemGeoModel._visible(collection, data):
+                    continue
+                distance = haversine_m(lat, lng, data.get('lat', 0.0), data.get('lng', 0.0))
+                if distance > radius_m:
+                    continue
+                for name in ('is_approved', 'is_found'):
+                    data.pop(name, None)
+                data['_id'] = doc.id
+                if hasattr(data.get('created_at'), 'timestamp'):
+                    data['created_at'] = data['created_at'].timestamp()
+                data['distance_m'] = round(distance, 1)
+                items[doc.id] = data
+        nearest = sorted(items.values(), key=lambda item: item['distance_m'])[:limit]
+        return nearest, truncated
+
+    @staticmethod
+    def find_nearest(collection, lat, lng, limit=20, radius_m=None):
+        """
+        Returns the items nearest to a point, optionally within a radius.
+
+        Without a radius, the search starts at `GEO_NEAREST_START_RADIUS` and
+        doubles until `limit` items are found or `GEO_MAX_RADIUS` is reached, so
+        dense areas are answered from small cells.
+
+        Args:
+            collection (str): `lost_items` or `found_items`.
+            lat (float): Latitude of the point.
+            lng (float): Longitude of the point.
+            limit (int): The maximum number of items returned.
+            radius_m (float): Search only this radius, in meters.
+
+        Returns:
+            dict: `items` (nearest first, with `distance_m`), the `radius_m`
+            searched and `truncated` if dense cells were not read completely.
+        """
+        if radius_m is not None:
+            items, truncated = ItemGeoModel.find_within(collection, lat, lng, radius_m, limit)
+            return {'items': items, 'radius_m': radius_m, 'truncated': truncated}
+        radius_m = min(Config.GEO_NEAREST_START_RADIUS, Config.GEO_MAX_RADIUS)
+        while True:
+            items, truncated = ItemGeoModel.find_within(collection, lat, lng, radius_m, limit)
+            if len(items) >= limit or truncated or radius_m >= Config.GEO_MAX_RADIUS:
+                return {'items': items, 'radius_m': radius_m, 'truncated': truncated}
+            radius_m = min(radius_m * 2, Config.GEO_MAX_RADIUS)
+
+
+ITEM_STATS_COUNTERS = ('lost', 'approved', 'marked_found', 'found')
+
+
+def _stats_location(location):
+    """
+    Normalizes a location into a statistics key.
+    """
+    location = " ".join(str(location or "").lower().split())[:100]
+    return location or "unknown"
+
+
+def _stats_location_id(period, location, shard):
+    """
+    Returns the ID of a per-location statistics shard in `item_stats_locations`.
+    """
+    return f"{period}|{quote(location, safe='')}|{shard}"
+
+
+def item_stats_increments(counter, location, at=None):
+    """
+    Picks random shards of the day's and the all-time statistics and builds their increments.
+
+    Each event updates one shard of `item_stats/<day>|<shard>` and one of
+    `item_stats/total|<shard>`, so busy days stay under Firestore's per-document
+    write rate. Per-location counters live in their own documents
+    (`item_stats_locations/<day or total>|<location>|<shard>`), so the number of
+    distinct locations never grows a single document. The data is meant to be
+    merged (`set(..., merge=True)`).
+
+    Args:
+        counter (str): One of `ITEM_STATS_COUNTERS`.
+        location (str): The item's location.
+        at (datetime): The event time. Defaults to now.
+
+    Returns:
+        list: (collection, document ID, data to merge) triples.
+    """
+    day = (at or datetime.now(timezone.utc)).strftime('%Y-%m-%d')
+    shard = random.randrange(max(1, Config.ITEM_STATS_SHARDS))
+    location = _stats_location(location)
+    increments = []
+    for period in (day, "total"):
+        increments.append(('item_stats', f"{period}|{shard}", {counter: firestore.Increment(1), "day": period}))
+        increments.append(('item_stats_locations', _stats_location_id(period, location, shard),
+                           {counter: firestore.Increment(1), "day": period, "location": location}))
+    return increments
+
+
+def _add_stats(target, shard):
+    """
+    Adds the counters of a statistics shard to `target`.
+    """
+    for counter in ITEM_STATS_COUNTERS:
+        target[counter] += shard.get(counter, 0)
+
+
+def item_stats_batch(client, counter, location):
+    """
+    Builds the batch recording an item event in the statistics (see `item_stats_increments`).
+
+    Args:
+        client (Client or AsyncClient): The Firestore client to write with.
+        counter (str): One of `ITEM_STATS_COUNTERS`.
+        location (str): The item's location.
+
+    Returns:
+        WriteBatch: The uncommitted batch.
+    """
+    batch = client.batch()
+    for collection, doc_id, data in item_stats_increments(counter, location):
+        batch.set(client.collection(collection).document(doc_id), data, merge=True)
+    return batch
+
+
+class ItemStatsModel:
+    """
+    Daily and all-time item counters, kept in sharded `item_stats` documents.
+
+    Counters: `lost` (reports), `approved`, `marked_found` (lost items resolved)
+    and `found` (found item reports), each also kept per location in
+    `item_stats_locations`.
+    """
+
+    @staticmethod
+    def record(counter, location):
+        """
+        Updates the statistics for an item event, after the item write.
+
+        Best-effort: statistics are written in their own batch and a failure is
+        logged and counted, never raised, so it cannot block an item write.
+
+        Args:
+            counter (str): One of `ITEM_STATS_COUNTERS`.
+            location (str): The item's location.
+        """
+        try:
+            item_stats_batch(db, counter, location).commit()
+        except Exception as e:
+            metrics.incr("item_stats.failed")
+            logger.warning(f"Updating item statistics failed: {e}")
+
+    @staticmethod
+    def get_statistics(days=30, location=None):
+        """
+        Reads the daily series of the last `days` days and the all-time totals.
+
+        All shards are fetched in one batched read of (days + 1) x shards
+        documents (twice that with a `location`), independent of the number of
+        items and locations.
+
+        Args:
+            days (int): The number of days in the series, including today.
+            location (str): Restrict the daily series to one location.
+
+        Returns:
+            dict: `daily` (one entry per day, oldest first, with every counter),
+            `window` (the series' totals), `totals` (all time) and, with a
+            `location`, `location_totals` (that location's all-time counters).
+        """
+        shards = range(max(1, Config.ITEM_STATS_SHARDS))
+        today = datetime.now(timezone.utc).date()
+        day_keys = [(today - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days - 1, -1, -1)]
+        periods = day_keys + ['total']
+        wanted = _stats_location(location) if location else None
+        refs = [db.collection('item_stats').document(f"{period}|{shard}") for period in periods for shard in shards]
+        if wanted is not None:
+            location_ref = db.collection('item_stats_locations')
+            refs += [location_ref.document(_stats_location_id(period, wanted, shard))
+                     for period in periods for shard in shards]
+
+        per_day = {period: dict.fromkeys(ITEM_STATS_COUNTERS, 0) for period in periods}
+        per_location = {period: dict.fromkeys(ITEM_STATS_COUNTERS, 0) for period in periods}
+        for doc in db.get_all(refs):
+            if doc.exists:
+                shard = doc.to_dict()
+                target = per_location if doc.reference.parent.id == 'item_stats_locations' else per_day
+                if shard.get('day') in target:
+                    _add_stats(target[shard['day']], shard)
+
+        series = per_location if wanted is not None else per_day
+        daily = []
+        window = dict.fromkeys(ITEM_STATS_COUNTERS, 0)
+        for day in day_keys:
+            daily.append(dict(series[day], day=day))
+            _add_stats(window, series[day])
+        stats = {
+            'location': wanted,
+            'daily': daily,
+            'window': window,
+            'totals': per_day['total'],
+        }
+        if wanted is not None:
+            stats['location_totals'] = per_location['total']
+        return stats
+
+
+def conversation_key(user_a, user_b):
+    """
+    Returns the canonical key of the conversation between two users.
+
+    The key is the sorted pair of (URL-quoted) user IDs, so both directions of a
+    conversation map to the same key.
+
+    Args:
+        user_a (str): One participant's ID/email.
+        user_b (str): The other participant's ID/email.
+
+    Returns:
+        str: The conversation key.
+    """
+    return "|".join(sorted(quote(str(user), safe="@") for user in (user_a, user_b)))
+
+
+def conversation_fields(author_id, receiver_id):
+    """
+    Returns the fields that index a message by conversation.
+
+    `conversation` lets one ordered query serve a thread, and `participants`
+    lets one `array_contains` query find all of a user's messages.
+
+    Args:
+        author_id (str): The author of the message.
+        receiver_id (str): The receiver of the message.
+
+    Returns:
+        dict: The `conversation` and `participants` fields.
+    """
+    return {
+        "conversation": conversation_key(author_id, receiver_id),
+        "participants": [author_id, receiver_id],
+    }
+
+
+def conversation_queries(messages_ref, author_id, receiver_id):
+    """
+    Returns the queries that together cover a conversation under `MESSAGE_READ_MODE`.
+
+    In `conversation` mode a single query on the conversation key is used. In
+    `legacy` mode both directions are queried on `author_id`/`receiver_id`. In
+    `dual` mode (during the backfill) all three run and their results are merged.
+
+    Args:
+        messages_ref (CollectionReference): The `messages` collection (sync or async client).
+        author_id (str): One participant.
+        receiver_id (str): The other participant.
+
+    Returns:
+        list: The unordered queries; in `dual` mode the conversation query comes first.
+    """
+    mode = Config.MESSAGE_READ_MODE
+    queries = []
+    if mode in ('dual', 'conversation'):
+        queries.append(messages_ref.where('conversation', '==', conversation_key(author_id, receiver_id)))
+    if mode != 'conversation':
+        queries.append(messages_ref.where('author_id', '==', author_id).where('receiver_id', '==', receiver_id))
+        queries.append(messages_ref.where('author_id', '==', receiver_id).where('receiver_id', '==', author_id))
+    return queries
+
+
+def merge_conversation_results(results):
+    """
+    Flattens the per-query results of `conversation_queries`, dropping duplicates.
+
+    In `dual` mode, messages that only the legacy queries found (i.e. not yet
+    backfilled) are counted in the `messages.dual_read.legacy_only` metric; the
+    conversation-only mode is safe to enable once it stays at 0.
+
+    Args:
+        results (list): Lists of message dicts, one per query.
+
+    Returns:
+        list: The unique messages, in no particular order.
+    """
+    seen = set()
+    messages = []
+    for result in results:
+        for message in result:
+            if message['_id'] not in seen:
+                seen.add(message['_id'])
+                messages.append(message)
+    if len(results) == 3:
+        legacy_only = len(messages) - len(results[0])
+        metrics.incr('messages.dual_read.reads')
+        if legacy_only:
+            metrics.incr('messages.dual_read.legacy_only', legacy_only)
+    return messages
+
+
+def _from_cursor_time(value):
+    """
+    Converts a time from a client cursor to a UTC datetime.
+
+    Cursor times are integer microseconds since the epoch (see `to_sync_cursor`).
+    Cursors issued before that format, in float (or small integer) Unix seconds,
+    are still accepted.
+    """
+    if isinstance(value, float) or (isinstance(value, str) and not value.strip().isdigit()):
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    micros = int(value)
+    if micros < 10 ** 11:
+        # Unix seconds; microsecond cursors for any date after 1970-01-02 are larger
+        return datetime.fromtimestamp(micros, tz=timezone.utc)
+    return from_sync_cursor(micros)
+
+
+def _exact_time(data, field):
+    """
+    Converts a timestamp field of a response dict to Unix seconds, and adds the
+    exact integer microseconds as `<field>_us` for use in cursors.
+    """
+    value = data.get(field)
+    if hasattr(value, 'timestamp'):
+        data[f"{field}_us"] = to_sync_cursor(value)
+        data[field] = value.timestamp()
+    return data
+
+
+def parse_message_cursor(since):
+    """
+    Parses a message sync cursor.
+
+    The cursor is either the `cursor` object returned by a previous sync,
+    `{"created_at": <us>, "_id": <message id>, "changed_at": <us>, "change_id": <change id>}`
+    with times in integer microseconds, or the string form `"<created_at>:<message id>"`.
+    `_id` may be omitted when the client has no messages yet, `changed_at`
+    defaults to `created_at`, and without `change_id` every change at `changed_at`
+    counts as already read.
+
+    Args:
+        since (dict or str): The cursor sent by the client.
+
+    Returns:
+        tuple: (created_at datetime, message ID or None, changed_at datetime,
+        change ID or None).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if isinstance(since, str):
+        created_at, _, message_id = since.partition(":")
+        since = {"created_at": created_at, "_id": message_id}
+    if not isinstance(since, dict) or since.get("created_at") in (None, ""):
+        raise ValueError("since must contain created_at")
+    try:
+        created_at = _from_cursor_time(since["created_at"])
+        changed_at = _from_cursor_time(since.get("changed_at") or since["created_at"])
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("since timestamps must be numbers")
+    return created_at, since.get("_id") or None, changed_at, since.get("change_id") or None
+
+
+def _message_item(doc):
+    """
+    Converts a message snapshot into a response dict with `_id`, a Unix `created_at`
+    and the exact `created_at_us`.
+    """
+    msg_data = doc.to_dict()
+    msg_data['_id'] = doc.id
+    return _exact_time(msg_data, 'created_at')
+
+
+def _change_item(doc):
+    """
+    Converts a `message_changes` snapshot into a tombstone / update record.
+    """
+    change = doc.to_dict()
+    item = {"_id": change.get("message_id"), "change": change.get("change"), "change_id": doc.id}
+    if change.get("changed_at") is not None:
+        item["changed_at"] = change["changed_at"]
+        _exact_time(item, "changed_at")
+    if change.get("fields"):
+        item["fields"] = change["fields"]
+    return item
+
+
+def unread_shard_id(user_id, counterpart, shard):
+    """
+    Returns the document ID of one shard of a user's unread counter for a conversation.
+
+    Args:
+        user_id (str): The user whose unread messages are counted.
+        counterpart (str): The other participant.
+        shard (int): The shard number.
+
+    Returns:
+        str: The document ID in `unread_counters`.
+    """
+    return f"{quote(str(user_id), safe='@')}|{quote(str(counterpart), safe='@')}|{shard}"
+
+
+def unread_increment(author_id, receiver_id):
+    """
+    Picks a random shard of the receiver's unread counter and builds its increment.
+
+    Spreading increments over `UNREAD_COUNTER_SHARDS` documents keeps busy
+    conversations under Firestore's per-document write rate.
+
+    Args:
+        author_id (str): The author of the new message.
+        receiver_id (str): The receiver, whose counter is incremented.
+
+    Returns:
+        tuple: (shard document ID, data to merge into it).
+    """
+    shard = random.randrange(max(1, Config.UNREAD_COUNTER_SHARDS))
+    data = {
+        "user_id": receiver_id,
+        "counterpart": author_id,
+        "count": firestore.Increment(1),
+    }
+    return unread_shard_id(receiver_id, author_id, shard), data
+
+
+def sum_unread(shards):
+    """
+    Adds up unread counter shards per counterpart.
+
+    Args:
+        shards (iterable): The shard snapshots of one user.
+
+    Returns:
+        dict: counterpart -> unread count (only counterparts with unread messages).
+    """
+    counts = {}
+    for doc in shards:
+        shard = doc.to_dict()
+        counterpart = shard.get('counterpart')
+        if counterpart:
+            counts[counterpart] = counts.get(counterpart, 0) + max(0, shard.get('count', 0))
+    return {counterpart: count for counterpart, count in counts.items() if count > 0}
+
+
+# Firestore documents are limited to 1 MiB; chunks stop growing well before that
+MESSAGE_CHUNK_MAX_BYTES = 900_000
+
+
+def _message_size(message):
+    """
+    Estimates the stored size of a message in bytes.
+    """
+    return len(json.dumps(message, default=str))
+
+
+def chunk_messages(chunk):
+    """
+    Returns the messages of an archive chunk as response dicts, oldest first.
+
+    Args:
+        chunk (dict): The chunk document data.
+
+    Returns:
+        list: The messages, with `created_at` as a Unix timestamp and `created_at_us`.
+    """
+    return [_exact_time(dict(message), 'created_at') for message in chunk.get('messages', [])]
+
+
+def archived_page(chunks, skip, limit):
+    """
+    Takes a newest-first page of messages from chunks ordered newest first.
+
+    Args:
+        chunks (iterable): Chunk document data, newest chunk first.
+        skip (int): The number of archived messages to skip.
+        limit (int): The maximum number of messages to return.
+
+    Returns:
+        list: The messages, newest first.
+    """
+    page = []
+    for chunk in chunks:
+        for message in reversed(chunk_messages(chunk)):
+            if skip > 0:
+                skip -= 1
+                continue
+            page.append(message)
+            if len(page) >= limit:
+                return page
+    return page
+
+
+def archived_after(chunks, created_at, message_id, limit):
+    """
+    Takes the archived messages after a sync cursor from chunks ordered oldest first.
+
+    Args:
+        chunks (iterable): Chunk document data, oldest chunk first.
+        created_at (datetime): The cursor's message time.
+        message_id (str): The cursor's message ID, or None.
+        limit (int): The maximum number of messages to return.
+
+    Returns:
+        list: The messages after the cursor, oldest first.
+    """
+    cursor = (to_sync_cursor(created_at), message_id or '')
+    newer = []
+    for chunk in chunks:
+        for message in chunk_messages(chunk):
+            if (message.get('created_at_us', 0), message['_id']) > cursor:
+                newer.append(message)
+                if len(newer) >= limit:
+                    return newer
+    return newer
+
+
+def chunk_counts_query(client, key):
+    """
+    Returns the query for a conversation's chunk sizes, newest chunk first.
+    """
+    query = client.collection('message_chunks').where('conversation', '==', key)
+    return query.order_by('last_at', direction=firestore.Query.DESCENDING).select(['count'])
+
+
+def pick_chunks(count_docs, skip, limit):
+    """
+    Picks the chunks holding a newest-first page from their sizes.
+
+    Args:
+        count_docs (iterable): Snapshots from `chunk_counts_query`, newest first.
+        skip (int): The number of archived messages to skip.
+        limit (int): The maximum number of messages to return.
+
+    Returns:
+        tuple: (chunk references to download, messages to skip in the first of them).
+    """
+    refs = []
+    wanted = skip + limit
+    for doc in count_docs:
+        count = doc.get('count') or 0
+        if wanted <= 0:
+            break
+        if skip >= count:
+            skip -= count
+        else:
+            refs.append(doc.reference)
+        wanted -= count
+    return refs, skip
+
+
+def chunks_after_query(client, key, created_at):
+    """
+    Returns the query for a conversation's chunks that may hold messages after a time, oldest first.
+    """
+    query = client.collection('message_chunks').where('conversation', '==', key)
+    return query.where('last_at', '>=', created_at).order_by('last_at')
+
+
+def chunk_summaries_query(client, user_id):
+    """
+    Returns the query for the `last_message` summaries of a user's chunks.
+    """
+    query = client.collection('message_chunks').where('participants', 'array_contains', user_id)
+    return query.select(['last_message'])
+
+
+class MessageChunkModel:
+    """
+    Archive of old messages packed into per-conversation chunk documents.
+
+    The compactor moves messages older than `MESSAGE_ARCHIVE_AFTER_DAYS` from
+    `messages` into `message_chunks`, up to `MESSAGE_CHUNK_SIZE` messages per
+    chunk in `created_at` order, so reading deep history costs one read per chunk
+    instead of one per message. Only messages with a conversation key (see
+    `MessageModel.backfill_conversation_keys`) are compacted.
+    """
+
+    @staticmethod
+    def get_page(key, skip, limit):
+        """
+        Retrieves a newest-first page of a conversation's archived messages.
+
+        Chunk sizes are read first (a projection), so only the chunks that hold
+        the page are downloaded.
+
+        Args:
+            key (str): The conversation key.
+            skip (int): The number of archived messages to skip.
+            limit (int): The maximum number of messages to return.
+
+        Returns:
+            list: The messages, newest first.
+        """
+        refs, skip = pick_chunks(chunk_counts_query(db, key).stream(), skip, limit)
+        if not refs:
+            return []
+        chunks = {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+        return archived_page([chunks[ref.id] for ref in refs if ref.id in chunks], skip, limit)
+
+    @staticmethod
+    def get_after(key, created_at, message_id, limit):
+        """
+        Retrieves a conversation's archived messages after a sync cursor, oldest first.
+
+        Args:
+            key (str): The conversation key.
+            created_at (datetime): The cursor's message time.
+            message_id (str): The cursor's message ID, or None.
+            limit (int): The maximum number of messages to return.
+
+        Returns:
+            list: The messages after the cursor.
+        """
+        chunks = (doc.to_dict() for doc in chunks_after_query(db, key, created_at).stream())
+        return archived_after(chunks, created_at, message_id, limit)
+
+    @staticmethod
+    def get_chat_summaries(user_id):
+        """
+        Retrieves the last archived message of each of a user's conversations.
+
+        Only the `last_message` summary of each chunk is read.
+
+        Args:
+            user_id (str): The user ID/email.
+
+        Returns:
+            list: Message dicts (`author_id`, `receiver_id`, `text`, `created_at`).
+        """
+        return [doc.get('last_message') for doc in chunk_summaries_query(db, user_id).stream()
+                if doc.get('last_message')]
+
+    @staticmethod
+    def compact_conversation(key, cutoff, chunk_size):
+        """
+        Moves a conversation's messages older than `cutoff` into chunks.
+
+        The newest chunk is topped up before a new one is started, so chunks stay
+        full even when the compactor runs often. Each chunk write and the deletion
+        of the messages it absorbs happen in one batch.
+
+        Args:
+            key (str): The conversation key.
+            cutoff (datetime): Messages created before this time are archived.
+            chunk_size (int): The maximum number of messages per chunk.
+
+        Returns:
+            dict: Counts of messages `archived` and chunks `written`.
+        """
+        stats = {'archived': 0, 'written': 0}
+        chunks_ref = db.collection('message_chunks')
+        latest = list(chunks_ref.where('conversation', '==', key)
+                      .order_by('last_at', direction=firestore.Query.DESCENDING).limit(1).stream())
+        chunk_ref, chunk = (latest[0].reference, latest[0].to_dict()) if latest else (None, None)
+
+        while True:
+            if chunk is not None and chunk.get('count', 0) >= chunk_size:
+                chunk_ref, chunk = None, None
+            room = chunk_size - (chunk.get('count', 0) if chunk else 0)
+            query = db.collection('messages').where('conversation', '==', key).where('created_at', '<', cutoff)
+            docs = list(query.order_by('created_at').order_by('__name__').limit(room).stream())
+            if not docs:
+                break
+
+            messages = list(chunk['messages']) if chunk else []
+            size = chunk.get('bytes', 0) if chunk else 0
+            taken = []
+            participants = None
+            for doc in docs:
+                message = dict(doc.to_dict())
+                participants = participants or message.get('participants')
+                for field in ('conversation', 'participants'):
+                    message.pop(field, None)
+                message['_id'] = doc.id
+                message_size = _message_size(message)
+                if messages and size + message_size > MESSAGE_CHUNK_MAX_BYTES:
+                    break
+                messages.append(message)
+                size += message_size
+                taken.append(doc)
+            if not taken:
+                # The newest chunk is full by size
+                chunk_ref, chunk = None, None
+                continue
+
+            if chunk_ref is None:
+                chunk_ref = chunks_ref.document(f"{key}|{messages[0]['_id']}")
+            last = messages[-1]
+            participants = participants or [last.get('author_id'), last.get('receiver_id')]
+            chunk = {
+                'conversation': key,
+                'participants': participants,
+                'messages': messages,
+                'count': len(messages),
+                'bytes': size,
+                'first_at': messages[0].get('created_at'),
+                'last_at': last.get('created_at'),
+                'last_message': {name: last.get(name) for name in ('author_id', 'receiver_id', 'text', 'created_at')},
+            }
+            batch = db.batch()
+            batch.set(chunk_ref, chunk)
+            for doc in taken:
+                batch.delete(doc.reference)
+            batch.commit()
+            stats['archived'] += len(taken)
+            stats['written'] += 1
+            if len(taken) < len(docs):
+                # The chunk is full by size; continue in a new one
+                chunk_ref, chunk = None, None
+            elif len(docs) < room:
+                break
+        return stats
+
+    @staticmethod
+    def compact(older_than_days=None, chunk_size=None, max_conversations=100, scan_limit=5000):
+        """
+        Runs one compaction pass over conversations with old live messages.
+
+        Conversations are discovered from the oldest live messages (reading only
+        their `conversation` field), then compacted one at a time.
+
+        Args:
+            older_than_days (float): Archive messages older than this. Defaults to
+                `MESSAGE_ARCHIVE_AFTER_DAYS`.
+            chunk_size (int): Messages per chunk (at most 499, so a chunk and its
+                deletions fit in one batch). Defaults to `MESSAGE_CHUNK_SIZE`.
+            max_conversations (int): The maximum number of conversations compacted per pass.
+            scan_limit (int): The maximum number of old messages scanned to find conversations.
+
+        Returns:
+            dict: Counts of `conversations` compacted, messages `archived` and chunks `written`.
+        """
+        older_than_days = Config.MESSAGE_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        chunk_size = max(1, min(chunk_size or Config.MESSAGE_CHUNK_SIZE, 499))
+        stats = {'conversations': 0, 'archived': 0, 'written': 0}
+        if older_than_days <= 0:
+            return stats
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+        keys = []
+        query = db.collection('messages').where('created_at', '<', cutoff).order_by('created_at')
+        for doc in query.select(['conversation']).limit(scan_limit).stream():
+            key = (doc.to_dict() or {}).get('conversation')
+            if key and key not in keys:
+                keys.append(key)
+                if len(keys) >= max_conversations:
+                    break
+
+        for key in keys:
+            result = MessageChunkModel.compact_conversation(key, cutoff, chunk_size)
+            stats['conversations'] += 1
+            stats['archived'] += result['archived']
+            stats['written'] += result['written']
+        return stats
+
+
+def archive_may_hold(created_at):
+    """
+    Tells whether archive chunks can hold messages newer than `created_at`.
+
+    The compactor only archives messages older than `MESSAGE_ARCHIVE_AFTER_DAYS`,
+    so cursors more recent than that never need to look at the archive.
+
+    Args:
+        created_at (datetime): The sync cursor's message time.
+
+    Returns:
+        bool: True if the archive has to be read.
+    """
+    if Config.MESSAGE_ARCHIVE_AFTER_DAYS <= 0:
+        return True
+    return created_at < datetime.now(timezone.utc) - timedelta(days=Config.MESSAGE_ARCHIVE_AFTER_DAYS)
+
+
+def changes_after_query(client, key, changed_at, change_id=None):
+    """
+    Returns the query for a conversation's change records after a sync cursor, oldest first.
+
+    Changes are ordered by `changed_at`, then document ID, so records sharing a
+    timestamp with the cursor are not skipped when a page ends between them.
+
+    Args:
+        client (Client or AsyncClient): The Firestore client to read with.
+        key (str): The conversation key.
+        changed_at (datetime): The cursor's change time.
+        change_id (str): The cursor's change record ID, or None.
+
+    Returns:
+        Query: The ordered query, without a limit.
+    """
+    query = client.collection('message_changes').where('conversation', '==', key)
+    if change_id is None:
+        query = query.where('changed_at', '>', changed_at)
+        return query.order_by('changed_at').order_by('__name__')
+    query = query.where('changed_at', '>=', changed_at).order_by('changed_at').order_by('__name__')
+    return query.start_after([changed_at, change_id])
+
+
+def merge_message_sync(directions, changes, since, limit, archived=()):
+    """
+    Combines the per-direction results of a message sync into one response.
+
+    Args:
+        directions (list): Lists of newer messages for each query, ascending.
+        changes (list): Change records newer than the cursor, ascending.
+        since (tuple): The parsed cursor (see `parse_message_cursor`).
+        limit (int): The page size each query was bounded by.
+        archived (list): Archived messages newer than the cursor, ascending.
+
+    Returns:
+        dict: `messages` (ascending), `changes`, the `cursor` to send next time
+        and `has_more` when another call is needed to catch up.
+    """
+    created_at, message_id, changed_at, change_id = since
+    messages = merge_conversation_results(directions) + list(archived)
+    messages.sort(key=lambda message: (message.get('created_at_us', 0), message['_id']))
+    has_more = len(messages) > limit or any(len(direction) >= limit for direction in directions) \
+        or len(archived) >= limit or len(changes) >= limit
+    messages = messages[:limit]
+
+    cursor = {
+        "created_at": to_sync_cursor(created_at),
+        "_id": message_id,
+        "changed_at": to_sync_cursor(changed_at),
+        "change_id": change_id,
+    }
+    if messages:
+        cursor["created_at"] = messages[-1].get('created_at_us', cursor["created_at"])
+        cursor["_id"] = messages[-1]['_id']
+    if changes and "changed_at_us" in changes[-1]:
+        cursor["changed_at"] = changes[-1]["changed_at_us"]
+        cursor["change_id"] = changes[-1]["change_id"]
+    return {"messages": messages, "changes": changes, "cursor": cursor, "has_more": has_more}
+
+
+def prepare_message(data):
+    """
+    Fills in the `created_at` and conversation fields of a new message in place.
+
+    Args:
+        data (dict): The message data.
+
+    Returns:
+        dict: The same data.
+    """
+    # Ensure created_at is a Firestore timestamp if not already set
+    if 'created_at' not in data:
+        data['created_at'] = firestore.SERVER_TIMESTAMP
+    elif isinstance(data.get('created_at'), str):
+        # Convert string datetime to Firestore timestamp if needed
+        try:
+            data['created_at'] = datetime.fromisoformat(data['created_at'].replace('Z', '+00:00'))
+        except ValueError:
             data['created_at'] = firestore.SERVER_TIMESTAMP
-        elif isinstance(data.get('created_at'), str):
-            # Convert string datetime to Firestore timestamp if needed
-            try:
-                from datetime import datetime
-                dt = datetime.fromisoformat(data['created_at'].replace('Z', '+00:00'))
-                data['created_at'] = dt
-            except:
-                data['created_at'] = firestore.SERVER_TIMESTAMP
-
-        message_ref = db.collection('messages').document()
-        message_ref.set(data)
+
+    if data.get('author_id') and data.get('receiver_id'):
+        data.update(conversation_fields(data['author_id'], data['receiver_id']))
+    return data
+
+
+def message_batch(client, data):
+    """
+    Builds the batch storing a new message and counting it as unread for the receiver.
+
+    Args:
+        client (Client or AsyncClient): The Firestore client to write with.
+        data (dict): The prepared message data (see `prepare_message`).
+
+    Returns:
+        tuple: (the new message's reference, the uncommitted batch).
+    """
+    message_ref = client.collection('messages').document()
+    batch = client.batch()
+    batch.set(message_ref, data)
+    if data.get('receiver_id') and data.get('author_id'):
+        shard_id, increment = unread_increment(data['author_id'], data['receiver_id'])
+        batch.set(client.collection('unread_counters').document(shard_id), increment, merge=True)
+    return message_ref, batch
+
+
+def live_message_count(counts):
+    """
+    Combines the aggregation counts of `conversation_queries` into the live message count.
+
+    With three queries the conversation-key query overlaps the two legacy directions.
+    """
+    if len(counts) == 3:
+        return max(counts[0], counts[1] + counts[2])
+    return sum(counts)
+
+
+def unread_counters_query(client, user_id):
+    """
+    Returns the query for a user's unread counter shards.
+    """
+    return client.collection('unread_counters').where('user_id', '==', user_id)
+
+
+def user_messages_query(messages_ref, field, op, user_id):
+    """
+    Returns the newest-first query for a user's messages by `author_id`, `receiver_id` or `participants`.
+    """
+    return messages_ref.where(field, op, user_id).order_by('created_at', direction=firestore.Query.DESCENDING)
+
+
+def build_chat_list(user_id, sent, received, archived, unread):
+    """
+    Builds a user's chat list from their messages.
+
+    Args:
+        user_id (str): The user ID/email.
+        sent (list): Messages the user sent.
+        received (list): Messages the user received.
+        archived (list): The last archived message of each conversation.
+        unread (dict): counterpart -> unread count.
+
+    Returns:
+        list: Chats with latest message info and unread counts, newest first.
+    """
+    # Conversations whose latest messages were archived are summarized by their last chunk
+    sent = sent + [msg for msg in archived if msg.get('author_id') == user_id]
+    received = received + [msg for msg in archived if msg.get('author_id') != user_id]
+
+    # Build a dict of chat_id -> latest message
+    chats_dict = {}
+    for counterpart_field, messages in (('receiver_id', sent), ('author_id', received)):
+        for msg_data in messages:
+            counterpart = msg_data.get(counterpart_field)
+            if not counterpart:
+                continue
+            current = chats_dict.get(counterpart)
+            if current is None or current['latest_message_time'] < msg_data.get('created_at'):
+                chats_dict[counterpart] = {
+                    'chat_id': counterpart,
+                    'latest_message': msg_data.get('text', ''),
+                    'latest_message_time': msg_data.get('created_at')
+                }
+
+    # Convert to list and sort by latest_message_time
+    chat_list = list(chats_dict.values())
+    chat_list.sort(key=lambda x: x.get('latest_message_time', datetime.min), reverse=True)
+
+    # Convert Firestore timestamps to timestamps for JSON serialization
+    for chat in chat_list:
+        if hasattr(chat.get('latest_message_time'), 'timestamp'):
+            chat['latest_message_time'] = chat['latest_message_time'].timestamp()
+        chat['unread_count'] = unread.get(chat['chat_id'], 0)
+    return chat_list
+
+
+class MessageModel:
+    """
+    Handles database operations related to user messages using Firestore.
+    """
+
+    @staticmethod
+    def send_message(data):
+        """
+        Sends a new message.
+
+        Args:
+            data (dict): The message data.
+
+        Returns:
+            str: The unique ID of the sent message.
+        """
+        # Count the message as unread for the receiver in the same write
+        message_ref, batch = message_batch(db, prepare_message(data))
+        batch.commit()
+        events.publish_message(message_ref.id, data)
         return message_ref.id
 
     @staticmethod
@@ -398,6 +2482,9 @@ class MessageModel:
         """
         Retrieves messages between two users.
 
+        The live messages are read first; when they run out, the page continues
+        into the conversation's archive chunks.
+
         Args:
             author_id (str): The ID of the author.
             receiver_id (str): The ID of the receiver.
@@ -408,36 +2495,142 @@ class MessageModel:
             list: A list of messages.
         """
         messages_ref = db.collection('messages')
-        
-        # Firestore doesn't support OR queries directly, so we need two queries
-        query1 = messages_ref.where('author_id', '==', author_id).where('receiver_id', '==', receiver_id)
-        query2 = messages_ref.where('author_id', '==', receiver_id).where('receiver_id', '==', author_id)
-        
-        # Combine results
-        messages = []
-        for query in [query1, query2]:
-            q = query.order_by('created_at', direction=firestore.Query.DESCENDING)
-            
-            # Handle skip (simplified - might not be perfectly accurate for combined queries)
-            if skip > 0:
-                offset_query = q.limit(skip).stream()
-                last_doc = None
-                for doc in offset_query:
-                    last_doc = doc
-                if last_doc:
-                    q = q.start_after(last_doc)
-            
-            q = q.limit(limit)
-            for doc in q.stream():
-                msg_data = doc.to_dict()
-                msg_data['_id'] = doc.id
-                if 'created_at' in msg_data and hasattr(msg_data['created_at'], 'timestamp'):
-                    msg_data['created_at'] = msg_data['created_at'].timestamp()
-                messages.append(msg_data)
-        
+
+        def _fetch(query):
+            query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+            return list(_iter_page(query, limit, skip))
+
+        # One query per conversation key, or one per direction for legacy messages, in parallel
+        queries = conversation_queries(messages_ref, author_id, receiver_id)
+        results = run_concurrently(*[lambda q=q: _fetch(q) for q in queries])
+        messages = merge_conversation_results(results)
+
         # Sort combined results by created_at descending and limit
         messages.sort(key=lambda x: x.get('created_at', 0), reverse=True)
-        return messages[:limit]
+        messages = messages[:limit]
+
+        # Continue into the archive once the live tail is exhausted
+        if len(messages) < limit:
+            archived_skip = 0
+            if skip > 0 and not messages:
+                archived_skip = max(0, skip - MessageModel._count_live(queries))
+            messages += MessageChunkModel.get_page(conversation_key(author_id, receiver_id), archived_skip, limit - len(messages))
+        return messages
+
+    @staticmethod
+    def _count_live(queries):
+        """
+        Counts the live messages covered by `conversation_queries` with aggregation queries.
+        """
+        return live_message_count(run_concurrently(*[lambda q=q: q.count().get()[0][0].value for q in queries]))
+
+    @staticmethod
+    def get_messages_since(author_id, receiver_id, since, limit=50):
+        """
+        Retrieves what changed in a conversation after a sync cursor.
+
+        Returns the messages newer than the cursor (by `created_at`, then message
+        ID) in ascending order, and the deletions and edits recorded since the
+        cursor's `changed_at`, so a poll reads only what changed.
+
+        Args:
+            author_id (str): The ID of one participant.
+            receiver_id (str): The ID of the other participant.
+            since (tuple): The parsed cursor (see `parse_message_cursor`).
+            limit (int): The maximum number of messages and of changes to return.
+
+        Returns:
+            dict: The sync result (see `merge_message_sync`).
+        """
+        created_at, message_id, changed_at, change_id = since
+        cursor = [created_at, message_id] if message_id else [created_at]
+        messages_ref = db.collection('messages')
+
+        def _newer(query):
+            query = query.order_by('created_at').order_by('__name__').start_after(cursor)
+            return [_message_item(doc) for doc in query.limit(limit).stream()]
+
+        def _changes():
+            query = changes_after_query(db, conversation_key(author_id, receiver_id), changed_at, change_id)
+            return [_change_item(doc) for doc in query.limit(limit).stream()]
+
+        def _archived():
+            if not archive_may_hold(created_at):
+                return []
+            return MessageChunkModel.get_after(conversation_key(author_id, receiver_id), created_at, message_id, limit)
+
+        *results, changes, archived = run_concurrently(
+            *[lambda q=q: _newer(q) for q in conversation_queries(messages_ref, author_id, receiver_id)],
+            _changes,
+            _archived,
+        )
+        return merge_message_sync(results, changes, since, limit, archived)
+
+    @staticmethod
+    def _record_change(batch, message_id, message, change, fields=None):
+        """
+        Adds a `message_changes` record for a deleted or edited message to a batch.
+
+        Args:
+            batch (WriteBatch): The batch that also applies the change.
+            message_id (str): The ID of the changed message.
+            message (dict): The message's `author_id` and `receiver_id`.
+            change (str): `deleted` or `updated`.
+            fields (dict): The updated fields, for edits.
+        """
+        record = {
+            "conversation": conversation_key(message.get('author_id'), message.get('receiver_id')),
+            "message_id": message_id,
+            "change": change,
+            "changed_at": firestore.SERVER_TIMESTAMP,
+        }
+        if fields:
+            record["fields"] = fields
+        batch.set(db.collection('message_changes').document(), record)
+
+    @staticmethod
+    def backfill_conversation_keys(batch_size=200, start_after=None, progress=None):
+        """
+        Adds the `conversation` and `participants` fields to existing messages.
+
+        Messages are scanned in document ID order, one batch at a time, and only
+        those missing the fields are written. The backfill can be re-run safely,
+        or resumed from the last reported message ID with `start_after`.
+
+        Args:
+            batch_size (int): The number of messages processed per batch (at most 500).
+            start_after (str): Resume after this message ID.
+            progress (callable): Optional callback receiving the stats after each batch.
+
+        Returns:
+            dict: Counts of `messages` scanned and `updated`, and the `last_id` processed.
+        """
+        stats = {'messages': 0, 'updated': 0, 'last_id': start_after}
+        messages_ref = db.collection('messages')
+        while True:
+            query = messages_ref.order_by('__name__').select(['author_id', 'receiver_id', 'conversation'])
+            if stats['last_id']:
+                query = query.start_after([stats['last_id']])
+            docs = list(query.limit(batch_size).stream())
+            if not docs:
+                break
+
+            batch = db.batch()
+            writes = 0
+            for doc in docs:
+                message = doc.to_dict()
+                if message.get('conversation') or not message.get('author_id') or not message.get('receiver_id'):
+                    continue
+                batch.update(doc.reference, conversation_fields(message['author_id'], message['receiver_id']))
+                writes += 1
+            if writes:
+                batch.commit()
+            stats['updated'] += writes
+            stats['messages'] += len(docs)
+            stats['last_id'] = docs[-1].id
+            if progress is not None:
+                progress(stats)
+        return stats
 
     @staticmethod
     def get_message_by_id(message_id):
@@ -463,6 +2656,9 @@ class MessageModel:
         """
         Deletes a message by its ID.
 
+        A tombstone is recorded in `message_changes` in the same batch, so clients
+        syncing with a cursor (see `get_messages_since`) learn about the deletion.
+
         Args:
             message_id (str): The unique ID of the message.
 
@@ -471,7 +2667,16 @@ class MessageModel:
         """
         try:
             message_ref = db.collection('messages').document(message_id)
-            message_ref.delete()
+            message_doc = message_ref.get(field_paths=['author_id', 'receiver_id'])
+            if not message_doc.exists:
+                return True
+            message = message_doc.to_dict()
+            # Leave a tombstone so clients syncing with a cursor drop the message
+            batch = db.batch()
+            batch.delete(message_ref)
+            MessageModel._record_change(batch, message_id, message, 'deleted')
+            batch.commit()
+            events.publish_message_change(message_id, message, 'deleted')
             return True
         except Exception:
             return False
@@ -481,6 +2686,9 @@ class MessageModel:
         """
         Updates a message by its ID.
 
+        The edit is recorded in `message_changes` in the same batch, so clients
+        syncing with a cursor receive the updated fields.
+
         Args:
             message_id (str): The unique ID of the message.
             updated_data (dict): The fields to update.
@@ -490,74 +2698,98 @@ class MessageModel:
         """
         try:
             message_ref = db.collection('messages').document(message_id)
-            message_ref.update(updated_data)
+            message_doc = message_ref.get(field_paths=['author_id', 'receiver_id'])
+            if not message_doc.exists:
+                return False
+            message = message_doc.to_dict()
+            batch = db.batch()
+            batch.update(message_ref, updated_data)
+            MessageModel._record_change(batch, message_id, message, 'updated', updated_data)
+            batch.commit()
+            events.publish_message_change(message_id, message, 'updated', updated_data)
             return True
         except Exception:
             return False
 
+    @staticmethod
+    def mark_read(user_id, counterpart):
+        """
+        Resets a user's unread count for a conversation.
+
+        The shards are read and cleared in one transaction, so a message counted
+        concurrently makes the transaction retry instead of being lost, and two
+        concurrent calls cannot both subtract the same count. Shards left
+        negative by earlier races are reset to 0.
+
+        Args:
+            user_id (str): The user who read the conversation.
+            counterpart (str): The other participant.
+
+        Returns:
+            int: The number of messages marked as read.
+        """
+        query = db.collection('unread_counters').where('user_id', '==', user_id).where('counterpart', '==', counterpart)
+
+        @firestore.transactional
+        def _clear(transaction):
+            cleared = 0
+            for doc in query.select(['count']).stream(transaction=transaction):
+                count = doc.get('count') or 0
+                if count:
+                    transaction.update(doc.reference, {'count': 0})
+                    cleared += max(count, 0)
+            return cleared
+
+        return _clear(db.transaction())
+
+    @staticmethod
+    def get_unread_counts(user_id):
+        """
+        Retrieves a user's unread counts from the counter shards, without reading messages.
+
+        Args:
+            user_id (str): The user ID/email.
+
+        Returns:
+            dict: counterpart -> unread count.
+        """
+        return sum_unread(unread_counters_query(db, user_id).stream())
+
     @staticmethod
     def get_chats_for_user(user_id):
         """
         Retrieves all chats for a user.
 
+        Each chat includes its `unread_count`, read from the counter shards.
+
         Args:
             user_id (str): The user ID/email.
 
         Returns:
-            list: A list of chats with latest message info.
+            list: A list of chats with latest message info and unread counts.
         """
         messages_ref = db.collection('messages')
-        
-        # Get messages where user is author
-        author_query = messages_ref.where('author_id', '==', user_id).order_by('created_at', direction=firestore.Query.DESCENDING).stream()
-        
-        # Get messages where user is receiver
-        receiver_query = messages_ref.where('receiver_id', '==', user_id).order_by('created_at', direction=firestore.Query.DESCENDING).stream()
-        
-        # Build a dict of chat_id -> latest message
-        chats_dict = {}
-        
-        for doc in author_query:
-            msg_data = doc.to_dict()
-            receiver_id = msg_data.get('receiver_id')
-            if receiver_id:
-                if receiver_id not in chats_dict:
-                    chats_dict[receiver_id] = {
-                        'chat_id': receiver_id,
-                        'latest_message': msg_data.get('text', ''),
-                        'latest_message_time': msg_data.get('created_at')
-                    }
-                elif chats_dict[receiver_id]['latest_message_time'] < msg_data.get('created_at'):
-                    chats_dict[receiver_id] = {
-                        'chat_id': receiver_id,
-                        'latest_message': msg_data.get('text', ''),
-                        'latest_message_time': msg_data.get('created_at')
-                    }
-        
-        for doc in receiver_query:
-            msg_data = doc.to_dict()
-            author_id = msg_data.get('author_id')
-            if author_id:
-                if author_id not in chats_dict:
-                    chats_dict[author_id] = {
-                        'chat_id': author_id,
-                        'latest_message': msg_data.get('text', ''),
-                        'latest_message_time': msg_data.get('created_at')
-                    }
-                elif chats_dict[author_id]['latest_message_time'] < msg_data.get('created_at'):
-                    chats_dict[author_id] = {
-                        'chat_id': author_id,
-                        'latest_message': msg_data.get('text', ''),
-                        'latest_message_time': msg_data.get('created_at')
-                    }
-        
-        # Convert to list and sort by latest_message_time
-        chat_list = list(chats_dict.values())
-        chat_list.sort(key=lambda x: x.get('latest_message_time', datetime.min), reverse=True)
-        
-        # Convert Firestore timestamps to timestamps for JSON serialization
-        for chat in chat_list:
-            if hasattr(chat.get('latest_message_time'), 'timestamp'):
-                chat['latest_message_time'] = chat['latest_message_time'].timestamp()
-        
-        return chat_list
+
+        def _collect(field, op='=='):
+            return [doc.to_dict() for doc in user_messages_query(messages_ref, field, op, user_id).stream()]
+
+        if Config.MESSAGE_READ_MODE == 'conversation':
+            # One query over the participants, split into sent and received messages,
+            # plus the unread counters and archived conversations, in parallel
+            messages, unread, archived = run_concurrently(
+                lambda: _collect('participants', 'array_contains'),
+                lambda: MessageModel.get_unread_counts(user_id),
+                lambda: MessageChunkModel.get_chat_summaries(user_id),
+            )
+            sent = [msg for msg in messages if msg.get('author_id') == user_id]
+            received = [msg for msg in messages if msg.get('author_id') != user_id]
+        else:
+            # Get messages where user is author and where user is receiver, the
+            # unread counters and archived conversations, in parallel
+            sent, received, unread, archived = run_concurrently(
+                lambda: _collect('author_id'),
+                lambda: _collect('receiver_id'),
+                lambda: MessageModel.get_unread_counts(user_id),
+                lambda: MessageChunkModel.get_chat_summaries(user_id),
+            )
+        return build_chat_list(user_id, sent, received, archived, unread)
@@ -0,0 +1,229 @@
+"""
+passwords.py
+
+Password hashing off the request thread.
+
+bcrypt is deliberately CPU-heavy, so when `BCRYPT_POOL_SIZE` is set, hashing
+and verification are dispatched to a dedicated process pool with a bounded
+number of pending jobs. Workers are started with `forkserver` (or `spawn`),
+never forked from the threaded server process. Where a pool cannot be created
+(e.g. no `/dev/shm` on AWS Lambda) or a worker dies, hashing falls back to
+the request thread. The bcrypt
+work factor is configurable, hashes made with a different cost can be
+detected for transparent rehashing, and `calibrate_rounds` picks a cost for a
+target latency on the current CPU:
+
+    python -m app.passwords --target-ms 250
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when the hashing queue is full and a job could not be admitted in time.
+    """
+
+
+_pool = None
+_pool_pid = None
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(1, Config.BCRYPT_MAX_PENDING))
+
+
+def _hashpw(password, rounds):
+    """
+    Hashes a password in a pool worker.
+    """
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password, hashed_password):
+    """
+    Verifies a password in a pool worker.
+    """
+    return bcrypt.checkpw(password, hashed_password)
+
+
+def _get_pool():
+    """
+    Returns the hashing pool of the current process, creating it on first use.
+
+    The pool is re-created after a fork so each server worker gets its own.
+    If the platform cannot create one, hashing runs inline from then on.
+
+    Returns:
+        ProcessPoolExecutor: The pool, or None if hashing runs inline.
+    """
+    global _pool, _pool_pid, _pool_unavailable
+    if Config.BCRYPT_POOL_SIZE <= 0 or _pool_unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            try:
+                _pool = ProcessPoolExecutor(max_workers=Config.BCRYPT_POOL_SIZE, mp_context=context)
+            except OSError as e:
+                logger.warning(f"Password hashing pool unavailable, hashing inline: {e}")
+                _pool, _pool_unavailable = None, True
+                return None
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _drop_pool(pool):
+    """
+    Discards a broken pool so the next job starts a new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(func, *args):
+    """
+    Runs a hashing function on the pool, honoring the pending-job bound.
+
+    Args:
+        func (callable): `_hashpw` or `_checkpw`.
+        *args: Arguments for `func`.
+
+    Returns:
+        object: The function's result.
+
+    Raises:
+        PasswordHashingBusy: If no slot frees up within `BCRYPT_QUEUE_TIMEOUT`.
+    """
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    if not _pending.acquire(timeout=Config.BCRYPT_QUEUE_TIMEOUT):
+        raise PasswordHashingBusy("Password hashing queue is full")
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool as e:
+        logger.warning(f"Password hashing pool failed, hashing inline: {e}")
+        _drop_pool(pool)
+        return func(*args)
+    finally:
+        _pending.release()
+
+
+def hash_password(password, rounds=None):
+    """
+    Hashes a plaintext password using bcrypt.
+
+    Args:
+        password (str): The plaintext password to hash.
+        rounds (int): The bcrypt work factor. Defaults to `BCRYPT_ROUNDS`.
+
+    Returns:
+        str: The hashed password as a string.
+    """
+    rounds = rounds or Config.BCRYPT_ROUNDS
+    return _submit(_hashpw, password.encode("utf-8"), rounds).decode("utf-8")
+
+
+def check_password(password, hashed_password):
+    """
+    Verifies if a plaintext password matches a given hashed password.
+
+    Args:
+        password (str): The plaintext password.
+        hashed_password (str): The hashed password to compare against.
+
+    Returns:
+        bool: True if the passwords match, False otherwise.
+    """
+    return _submit(_checkpw, password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def get_rounds(hashed_password):
+    """
+    Reads the work factor from a bcrypt hash (`$2b$<cost>$...`).
+
+    Args:
+        hashed_password (str): The bcrypt hash.
+
+    Returns:
+        int: The cost, or None if the hash is not in bcrypt format.
+    """
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed_password):
+    """
+    Checks whether a hash was made with a different cost than `BCRYPT_ROUNDS`.
+
+    Args:
+        hashed_password (str): The bcrypt hash.
+
+    Returns:
+        bool: True if the password should be rehashed at the next login.
+    """
+    return get_rounds(hashed_password) != Config.BCRYPT_ROUNDS
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=16, samples=3):
+    """
+    Picks the highest bcrypt cost whose hash time stays within a target latency.
+
+    Each cost is timed inline (not on the pool) using the median of `samples`
+    runs; since every extra round doubles the cost, timing stops at the first
+    cost that exceeds the target.
+
+    Args:
+        target_ms (float): The target hashing latency in milliseconds.
+        min_rounds (int): The lowest cost to consider.
+        max_rounds (int): The highest cost to consider.
+        samples (int): Timed runs per cost.
+
+    Returns:
+        tuple: (chosen cost, dict of cost -> median milliseconds).
+    """
+    password = b"calibration-password"
+    timings = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        runs = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+            runs.append((time.perf_counter() - start) * 1000)
+        timings[rounds] = sorted(runs)[len(runs) // 2]
+        if timings[rounds] > target_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick a bcrypt cost for a target hashing latency.")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="target latency per hash in milliseconds")
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    chosen, timings = calibrate_rounds(args.target_ms, args.min_rounds, args.max_rounds, args.samples)
+    for rounds, ms in timings.items():
+        print(f"cost {rounds:2d}: {ms:8.1f} ms")
+    print(f"BCRYPT_ROUNDS={chosen}")
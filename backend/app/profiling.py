@@ -0,0 +1,233 @@
+"""
+profiling.py
+
+Opt-in profiling of single requests and of application startup.
+
+A request is profiled with cProfile when it carries the `X-Profile` header
+set to `PROFILER_TOKEN`, or when it is picked at `PROFILER_SAMPLE_RATE`. The
+profile is saved to `PROFILER_DIR` (the newest `PROFILER_MAX_FILES` are kept),
+its name is returned in the `X-Profile-Id` response header, and it can be
+listed at `/profiles` and downloaded from `/profiles/<name>` with the same
+header, for `python -m pstats` or snakeviz. When neither trigger is
+configured no hooks are installed, so there is no per-request cost.
+
+Only one request per process is profiled at a time (cProfile instances do not
+nest well), and a profile covers the request thread: in async mode the
+handlers run on the shared event loop thread and show up as waiting.
+
+`startup_report` profiles module imports (`python -X importtime`) and
+`create_app`; it is run by `python manage.py profile-startup`.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from flask import abort, g, jsonify, request, send_from_directory
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Serializes profiled requests within the process
+_active = threading.Lock()
+
+_PROFILE_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+\.prof$")
+
+
+def _authorized():
+    """
+    Whether the request carries the profiler token.
+    """
+    token = Config.PROFILER_TOKEN
+    supplied = request.headers.get("X-Profile", "")
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def _start_profile():
+    """
+    `before_request` hook: starts profiling the request if it was asked for or sampled.
+    """
+    if request.path.startswith("/profiles"):
+        return
+    sampled = Config.PROFILER_SAMPLE_RATE > 0 and random.random() < Config.PROFILER_SAMPLE_RATE
+    if not (sampled or (request.headers.get("X-Profile") and _authorized())):
+        return
+    if not _active.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    g.profiler = (profiler, time.perf_counter())
+    profiler.enable()
+
+
+def _stop_profile():
+    """
+    Stops the request's profiler, if any.
+
+    Returns:
+        tuple: (profiler, elapsed seconds), or None.
+    """
+    active = g.pop("profiler", None)
+    if active is None:
+        return None
+    profiler, started = active
+    profiler.disable()
+    _active.release()
+    return profiler, time.perf_counter() - started
+
+
+def _save_profile(profiler, elapsed):
+    """
+    Writes a profile to `PROFILER_DIR` and prunes the oldest ones.
+
+    Returns:
+        str: The profile's file name.
+    """
+    os.makedirs(Config.PROFILER_DIR, exist_ok=True)
+    endpoint = re.sub(r"[^A-Za-z0-9_]+", "_", request.endpoint or "unknown")
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}_{endpoint}_{int(elapsed * 1000)}ms_{uuid.uuid4().hex[:6]}.prof"
+    profiler.dump_stats(os.path.join(Config.PROFILER_DIR, name))
+    profiles = sorted(entry for entry in os.listdir(Config.PROFILER_DIR) if _PROFILE_NAME_RE.match(entry))
+    for stale in profiles[:-Config.PROFILER_MAX_FILES] if Config.PROFILER_MAX_FILES > 0 else []:
+        try:
+            os.remove(os.path.join(Config.PROFILER_DIR, stale))
+        except OSError:
+            pass
+    return name
+
+
+def _finish_profile(response):
+    """
+    `after_request` hook: saves the request's profile and names it in `X-Profile-Id`.
+    """
+    stopped = _stop_profile()
+    if stopped is not None:
+        try:
+            response.headers["X-Profile-Id"] = _save_profile(*stopped)
+        except OSError as e:
+            logger.warning(f"Saving request profile failed: {e}")
+    return response
+
+
+def _discard_profile(exc=None):
+    """
+    `teardown_request` hook: stops a profiler left running by a failed request.
+    """
+    _stop_profile()
+
+
+def list_profiles():
+    """
+    Endpoint listing the saved request profiles, newest first.
+    """
+    if not _authorized():
+        abort(404)
+    if not os.path.isdir(Config.PROFILER_DIR):
+        return jsonify([]), 200
+    profiles = sorted((entry for entry in os.listdir(Config.PROFILER_DIR) if _PROFILE_NAME_RE.match(entry)),
+                      reverse=True)
+    return jsonify(profiles), 200
+
+
+def download_profile(name):
+    """
+    Endpoint returning a saved request profile (pstats format).
+    """
+    if not _authorized() or not _PROFILE_NAME_RE.match(name):
+        abort(404)
+    return send_from_directory(os.path.abspath(Config.PROFILER_DIR), name, as_attachment=True)
+
+
+def init_profiler(app):
+    """
+    Installs the request profiler if a trigger (token or sampling) is configured.
+
+    Args:
+        app (Flask): The application to configure.
+
+    Returns:
+        bool: True if the profiler is installed.
+    """
+    if not Config.PROFILER_TOKEN and Config.PROFILER_SAMPLE_RATE <= 0:
+        return False
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
+    app.add_url_rule("/profiles", "list_profiles", list_profiles, methods=["GET"])
+    app.add_url_rule("/profiles/<name>", "download_profile", download_profile, methods=["GET"])
+    return True
+
+
+def import_times(module="app", top=30):
+    """
+    Measures the import time of a module and its dependencies in a fresh interpreter.
+
+    Args:
+        module (str): The module to import.
+        top (int): The number of slowest modules returned.
+
+    Returns:
+        list: Dicts with `module`, `self_ms` and `cumulative_ms`, slowest first.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not self_us.isdigit():
+            continue
+        modules.append({
+            "module": name,
+            "self_ms": round(int(self_us) / 1000, 1),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+        })
+    return sorted(modules, key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+
+
+def startup_report(create_app, top=30):
+    """
+    Profiles application startup: module imports and `create_app`.
+
+    Args:
+        create_app (callable): The application factory.
+        top (int): The number of entries per section.
+
+    Returns:
+        dict: `imports` (slowest module imports), `create_app_ms`, `init`
+        (time spent in each source file during `create_app`) and the `profile`
+        file saved to `PROFILER_DIR`.
+    """
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        create_app()
+    finally:
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    per_file = {}
+    for (filename, _, _), (_, _, tottime, _, _) in pstats.Stats(profiler).stats.items():
+        filename = "<built-in>" if filename == "~" else filename
+        per_file[filename] = per_file.get(filename, 0.0) + tottime
+    init = sorted(({"file": filename, "ms": round(seconds * 1000, 1)} for filename, seconds in per_file.items()),
+                  key=lambda entry: entry["ms"], reverse=True)[:top]
+
+    os.makedirs(Config.PROFILER_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}_startup_{int(elapsed * 1000)}ms.prof"
+    profiler.dump_stats(os.path.join(Config.PROFILER_DIR, name))
+    return {
+        "imports": import_times(top=top),
+        "create_app_ms": round(elapsed * 1000, 1),
+        "init": init,
+        "profile": os.path.join(Config.PROFILER_DIR, name),
+    }
@@ -0,0 +1,202 @@
+"""
+ratelimit.py
+
+In-process token-bucket rate limiting for the CPU- and RPC-heavy auth routes.
+
+Each limiter keeps one bucket per active key in insertion/access order, so
+expired buckets are evicted from the front in O(1) and memory stays
+proportional to the number of recently active clients.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+from config import Config
+from . import metrics
+
+
+class TokenBucketLimiter:
+    """
+    A set of token buckets keyed by client (IP address, account, ...).
+
+    Buckets hold up to `burst` tokens and refill at `rate` tokens per second. A
+    bucket idle long enough to be full again is indistinguishable from a new one,
+    so it is dropped; `max_keys` additionally bounds memory under key floods.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            burst (float): Bucket capacity.
+            max_keys (int): Maximum number of buckets kept.
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self.ttl = self.burst / self.rate if self.rate > 0 else float("inf")
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        """
+        Drops buckets that refilled completely, oldest first, and enforces `max_keys`.
+        """
+        while self._buckets:
+            key, (tokens, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.ttl and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+    def acquire(self, key, cost=1.0):
+        """
+        Takes `cost` tokens from the bucket for `key` if available.
+
+        Args:
+            key (str): The client key.
+            cost (float): The number of tokens the request consumes.
+
+        Returns:
+            tuple: (allowed, retry_after), where `retry_after` is the number of
+            seconds until enough tokens are available (0 when allowed).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            if self.rate <= 0:
+                return False, float("inf")
+            return False, (cost - tokens) / self.rate
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class RouteLimiter:
+    """
+    Per-IP and per-account token buckets shared by a group of routes.
+    """
+
+    def __init__(self, name, ip_rate, ip_burst, account_rate, account_burst, max_keys=10000):
+        """
+        Args:
+            name (str): The route group name, used in metric names.
+            ip_rate (float): Per-IP refill rate in requests per second.
+            ip_burst (float): Per-IP burst size.
+            account_rate (float): Per-account refill rate in requests per second.
+            account_burst (float): Per-account burst size.
+            max_keys (int): Maximum number of buckets per limiter.
+        """
+        self.name = name
+        self.by_ip = TokenBucketLimiter(ip_rate, ip_burst, max_keys)
+        self.by_account = TokenBucketLimiter(account_rate, account_burst, max_keys)
+        metrics.register_collector(f"ratelimit.{name}", self.stats)
+
+    def stats(self):
+        """
+        Reports the number of active buckets.
+
+        Returns:
+            dict: Active IP and account bucket counts.
+        """
+        return {"active_ips": len(self.by_ip), "active_accounts": len(self.by_account)}
+
+    def check(self, account=None):
+        """
+        Charges the current request against the IP and account buckets.
+
+        Args:
+            account (str): The account key (e.g. normalized email), if known.
+
+        Returns:
+            float: 0 if the request is admitted, otherwise seconds to wait.
+        """
+        allowed, retry_after = self.by_ip.acquire(client_ip())
+        if not allowed:
+            metrics.incr(f"ratelimit.{self.name}.limited_ip")
+            return retry_after
+        if account:
+            allowed, retry_after = self.by_account.acquire(account)
+            if not allowed:
+                metrics.incr(f"ratelimit.{self.name}.limited_account")
+                return retry_after
+        metrics.incr(f"ratelimit.{self.name}.allowed")
+        return 0.0
+
+    def limit(self, account_field=None):
+        """
+        Decorator that rate limits a view.
+
+        Args:
+            account_field (str): JSON body field identifying the account (e.g. `email`).
+
+        Returns:
+            callable: The decorator.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not Config.RATE_LIMIT_ENABLED:
+                    return view(*args, **kwargs)
+                account = None
+                if account_field:
+                    body = request.get_json(silent=True) or {}
+                    value = body.get(account_field)
+                    if isinstance(value, str) and value.strip():
+                        account = value.strip().lower()
+                retry_after = self.check(account)
+                if retry_after > 0:
+                    return too_many_requests(retry_after)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def client_ip():
+    """
+    Returns the client address used for per-IP limits.
+
+    Behind proxies (`TRUSTED_PROXY_HOPS`), `create_app` installs werkzeug's
+    `ProxyFix`, which sets the remote address from the rightmost untrusted
+    `X-Forwarded-For` entry.
+
+    Returns:
+        str: The client IP address.
+    """
+    return request.remote_addr or "unknown"
+
+
+def too_many_requests(retry_after):
+    """
+    Builds a 429 response.
+
+    Args:
+        retry_after (float): Seconds until the client may retry.
+
+    Returns:
+        Response: The 429 JSON response with a `Retry-After` header.
+    """
+    response = jsonify({"error": "Too many requests, please retry later"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(min(retry_after, 3600))))
+    return response
+
+
+# Shared limiter for bcrypt- and token-verification-heavy auth routes
+auth_limiter = RouteLimiter(
+    "auth",
+    ip_rate=Config.RATE_LIMIT_IP_RATE,
+    ip_burst=Config.RATE_LIMIT_IP_BURST,
+    account_rate=Config.RATE_LIMIT_ACCOUNT_RATE,
+    account_burst=Config.RATE_LIMIT_ACCOUNT_BURST,
+    max_keys=Config.RATE_LIMIT_MAX_KEYS,
+)
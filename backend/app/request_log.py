@@ -0,0 +1,431 @@
+"""
+request_log.py
+
+Structured log of slow (and randomly sampled) requests.
+
+While a request runs, every Firestore call it makes (queries with their
+filters, order, limit and projection, document reads and writes, batch
+commits, aggregations) and every AppWrite call is recorded on a per-request
+timeline with its start offset, duration and the number of documents
+returned. When the request finishes, it is logged as one JSON line if it took
+at least `REQUEST_LOG_SLOW_MS` or was picked at `REQUEST_LOG_SAMPLE_RATE`.
+
+The timeline lives in a context variable, so it follows the request into the
+shared query pool (`models.run_concurrently`) and onto the async event loop.
+Log records are handed to a background `QueueListener` that writes them to a
+rotating file; the request thread never waits for disk I/O, and records are
+dropped (and counted) if the queue is full.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from flask import g, request
+from config import Config
+from . import metrics
+
+# The timeline of the request being served, if it is recorded
+_timeline = contextvars.ContextVar("request_timeline", default=None)
+
+# Streams and monitoring are not logged
+EXEMPT_RULES = {"/events", "/ws", "/metrics"}
+
+# Query parameters whose values are logged; the values of all others (emails,
+# user IDs, search text, coordinates, ...) and of path parameters are redacted
+LOGGED_PARAMS = {"limit", "skip", "fields", "stream", "days", "radius", "since", "updated_since",
+                 "topics", "type", "jobs"}
+
+slow_logger = logging.getLogger("app.slow_requests")
+_listener = None
+_instrumented = False
+_listener_lock = threading.Lock()
+
+
+class Timeline:
+    """
+    The backend calls of one request.
+    """
+
+    def __init__(self, max_entries=200):
+        self.started = time.perf_counter()
+        self.entries = []
+        self.dropped = 0
+        self.max_entries = max_entries
+
+    def add(self, kind, started, details):
+        """
+        Records a finished call.
+
+        Args:
+            kind (str): The call type, e.g. `firestore.query` or `appwrite.upload`.
+            started (float): The call's `time.perf_counter()` start.
+            details (dict): Call details (collection, filters, docs, status, ...).
+        """
+        if len(self.entries) >= self.max_entries:
+            self.dropped += 1
+            return
+        entry = {
+            "kind": kind,
+            "at_ms": round((started - self.started) * 1000, 1),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        entry.update(details)
+        self.entries.append(entry)
+
+
+@contextmanager
+def span(kind, **details):
+    """
+    Records a backend call made inside the block on the current request's timeline.
+
+    The yielded dict can be updated with details known after the call
+    (e.g. the response `status`).
+
+    Args:
+        kind (str): The call type.
+        **details: Call details.
+    """
+    timeline = _timeline.get()
+    if timeline is None:
+        yield details
+        return
+    started = time.perf_counter()
+    try:
+        yield details
+    except Exception as e:
+        details["error"] = str(e)[:200]
+        raise
+    finally:
+        timeline.add(kind, started, details)
+
+
+def _short(value):
+    """
+    Shortens a filter value for the log; strings (emails, IDs, text) are redacted.
+    """
+    if isinstance(value, (list, tuple)):
+        shown = [_short(item) for item in value[:5]]
+        return shown + [f"... (+{len(value) - 5})"] if len(value) > 5 else shown
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "[redacted]"
+
+
+def describe_query(query):
+    """
+    Summarizes a Firestore query: collection, filters, order, limit and projection.
+
+    Args:
+        query (BaseQuery): The query.
+
+    Returns:
+        dict: The query details.
+    """
+    from google.cloud.firestore_v1 import _helpers
+    try:
+        details = {"collection": query._parent.id}
+        filters = []
+        for field_filter in query._field_filters:
+            try:
+                value = _helpers.decode_value(field_filter.value, query._parent._client)
+                filters.append([field_filter.field.field_path, field_filter.op.name, _short(value)])
+            except Exception:
+                filters.append(str(field_filter)[:200])
+        if filters:
+            details["filters"] = filters
+        if query._orders:
+            details["order_by"] = [[order.field.field_path, order.direction.name] for order in query._orders]
+        if query._limit is not None:
+            details["limit"] = query._limit
+        if query._projection is not None:
+            details["select"] = [field.field_path for field in query._projection.fields]
+        if query._start_at is not None or query._end_at is not None:
+            details["cursor"] = True
+        return details
+    except Exception:
+        return {"query": type(query).__name__}
+
+
+def _record_iter(timeline, kind, details, results):
+    started = time.perf_counter()
+    docs = 0
+    try:
+        for result in results:
+            docs += 1
+            yield result
+    except Exception as e:
+        details["error"] = str(e)[:200]
+        raise
+    finally:
+        details["docs"] = docs
+        timeline.add(kind, started, details)
+
+
+async def _record_aiter(timeline, kind, details, results):
+    started = time.perf_counter()
+    docs = 0
+    try:
+        async for result in results:
+            docs += 1
+            yield result
+    except Exception as e:
+        details["error"] = str(e)[:200]
+        raise
+    finally:
+        details["docs"] = docs
+        timeline.add(kind, started, details)
+        await results.aclose()
+
+
+def _traced_stream(original, kind, describe, is_async=False):
+    """
+    Wraps a `stream` method so the documents it yields are recorded.
+    """
+    @wraps(original)
+    def stream(self, *args, **kwargs):
+        timeline = _timeline.get()
+        if timeline is None or kwargs.get("explain_options") is not None:
+            return original(self, *args, **kwargs)
+        record = _record_aiter if is_async else _record_iter
+        return record(timeline, kind, describe(self), original(self, *args, **kwargs))
+    return stream
+
+
+def _traced_call(original, kind, describe, outcome=None, is_async=False):
+    """
+    Wraps a method returning a single result (document read, write, commit).
+    """
+    if is_async:
+        @wraps(original)
+        async def call(self, *args, **kwargs):
+            timeline = _timeline.get()
+            if timeline is None:
+                return await original(self, *args, **kwargs)
+            with span(kind, **describe(self)) as details:
+                result = await original(self, *args, **kwargs)
+                if outcome is not None:
+                    details.update(outcome(result))
+                return result
+        return call
+
+    @wraps(original)
+    def call(self, *args, **kwargs):
+        timeline = _timeline.get()
+        if timeline is None:
+            return original(self, *args, **kwargs)
+        with span(kind, **describe(self)) as details:
+            result = original(self, *args, **kwargs)
+            if outcome is not None:
+                details.update(outcome(result))
+            return result
+    return call
+
+
+def _instrument_firestore():
+    """
+    Patches the Firestore client classes to record calls on the request timeline.
+
+    Calls made outside a recorded request only pay a context variable lookup.
+    """
+    from google.cloud.firestore_v1 import (aggregation, async_aggregation, async_batch, async_client,
+                                           async_document, async_query, batch, client, document, query)
+
+    def describe_document(ref):
+        # Document IDs can be emails or lookup keys, so only the collection is logged
+        return {"collection": ref.parent.id}
+
+    def describe_batch(write_batch):
+        return {"writes": len(write_batch._write_pbs)}
+
+    def describe_aggregation(aggregation_query):
+        return describe_query(aggregation_query._nested_query)
+
+    def describe_get_all(_client):
+        return {}
+
+    def found(snapshot):
+        return {"found": snapshot.exists}
+
+    for query_class, is_async in ((query.Query, False), (async_query.AsyncQuery, True)):
+        query_class.stream = _traced_stream(query_class.stream, "firestore.query", describe_query, is_async)
+    for aggregation_class, is_async in ((aggregation.AggregationQuery, False),
+                                        (async_aggregation.AsyncAggregationQuery, True)):
+        aggregation_class.stream = _traced_stream(aggregation_class.stream, "firestore.aggregate",
+                                                  describe_aggregation, is_async)
+    for client_class, is_async in ((client.Client, False), (async_client.AsyncClient, True)):
+        client_class.get_all = _traced_stream(client_class.get_all, "firestore.get_all", describe_get_all, is_async)
+    for document_class, is_async in ((document.DocumentReference, False),
+                                     (async_document.AsyncDocumentReference, True)):
+        document_class.get = _traced_call(document_class.get, "firestore.get", describe_document, found, is_async)
+        for method in ("set", "update", "delete"):
+            setattr(document_class, method, _traced_call(getattr(document_class, method), f"firestore.{method}",
+                                                         describe_document, is_async=is_async))
+    for batch_class, is_async in ((batch.WriteBatch, False), (async_batch.AsyncWriteBatch, True)):
+        batch_class.commit = _traced_call(batch_class.commit, "firestore.commit", describe_batch, is_async=is_async)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records without formatting them, dropping them when the queue is full.
+    """
+
+    def prepare(self, record):
+        # Records stay in-process; the file handler serializes them on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("request_log.dropped")
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, default=str, separators=(",", ":"))
+
+
+def _start_writer():
+    """
+    Attaches the queue handler to the slow request logger and starts the file writer (once).
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        directory = os.path.dirname(Config.REQUEST_LOG_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            Config.REQUEST_LOG_PATH,
+            maxBytes=Config.REQUEST_LOG_MAX_BYTES,
+            backupCount=Config.REQUEST_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(_JSONFormatter())
+        records = queue.Queue(maxsize=Config.REQUEST_LOG_QUEUE_SIZE)
+        slow_logger.addHandler(_NonBlockingQueueHandler(records))
+        slow_logger.setLevel(logging.INFO)
+        slow_logger.propagate = False
+        _listener = logging.handlers.QueueListener(records, file_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def _parameters():
+    """
+    Returns the request's query and path parameters, and the names of its body fields.
+
+    Only the values of `LOGGED_PARAMS` are kept; other values are redacted, so
+    the log holds no user identifiers.
+    """
+    args = {name: (values[0] if len(values) == 1 else values) if name in LOGGED_PARAMS else "[redacted]"
+            for name, values in request.args.lists()}
+    view_args = dict.fromkeys(request.view_args or {}, "[redacted]")
+    body = request.get_json(silent=True) if request.is_json else None
+    if isinstance(body, dict):
+        body_fields = sorted(body)
+    else:
+        body_fields = sorted(request.form) if request.form else []
+    return {"args": args, "view_args": view_args, "body_fields": body_fields}
+
+
+def _start_request():
+    """
+    `before_request` hook: starts the request's timeline.
+    """
+    if request.url_rule is None or request.url_rule.rule in EXEMPT_RULES:
+        return
+    timeline = Timeline()
+    g.request_log = (timeline, _timeline.set(timeline))
+
+
+def _record_status(response):
+    """
+    `after_request` hook: remembers the response status for the log entry.
+    """
+    g.request_log_status = response.status_code
+    return response
+
+
+def _finish_request(exc=None):
+    """
+    `teardown_request` hook: logs the request if it was slow or sampled.
+    """
+    active = g.pop("request_log", None)
+    if active is None:
+        return
+    timeline, token = active
+    try:
+        _timeline.reset(token)
+    except ValueError:
+        _timeline.set(None)
+    total_ms = (time.perf_counter() - timeline.started) * 1000
+    slow = total_ms >= Config.REQUEST_LOG_SLOW_MS
+    sampled = not slow and random.random() < Config.REQUEST_LOG_SAMPLE_RATE
+    if not (slow or sampled):
+        return
+    summary = {}
+    for entry in timeline.entries:
+        backend = entry["kind"].split(".", 1)[0]
+        totals = summary.setdefault(backend, {"calls": 0, "ms": 0.0, "docs": 0})
+        totals["calls"] += 1
+        totals["ms"] = round(totals["ms"] + entry["ms"], 1)
+        totals["docs"] += entry.get("docs", 0)
+    slow_logger.info({
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "method": request.method,
+        "route": request.url_rule.rule,
+        "endpoint": request.endpoint,
+        "status": g.pop("request_log_status", 500),
+        "error": str(exc)[:200] if exc is not None else None,
+        "total_ms": round(total_ms, 1),
+        "slow": slow,
+        "sampled": sampled,
+        **_parameters(),
+        "backends": summary,
+        "timeline": timeline.entries,
+        "dropped_calls": timeline.dropped,
+    })
+    metrics.incr("request_log.slow" if slow else "request_log.sampled")
+
+
+def init_request_log(app):
+    """
+    Enables the slow request log for the application, if `REQUEST_LOG_ENABLED` is set.
+
+    Args:
+        app (Flask): The application to configure.
+
+    Returns:
+        bool: True if the log is enabled.
+    """
+    if not Config.REQUEST_LOG_ENABLED:
+        return False
+    try:
+        _start_writer()
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Slow request log disabled: {e}")
+        return False
+    global _instrumented
+    with _listener_lock:
+        if not _instrumented:
+            _instrument_firestore()
+            _instrumented = True
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    return True
+
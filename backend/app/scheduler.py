@@ -0,0 +1,367 @@
+"""
+scheduler.py
+
+In-process scheduler for periodic maintenance jobs.
+
+Every server worker runs the scheduler, started from `create_app` (unless
+`SCHEDULER_ENABLED` is off, the default on Vercel, where functions are frozen
+between invocations: there the leader jobs run from `/cron/maintenance` or
+`python manage.py run-maintenance` instead). Jobs that
+act on shared data (archiving stale reports, compacting messages, deleting
+orphaned images) take a Firestore lease first, so only one worker runs them
+per interval; jobs that maintain per-process state (feed cache, token signing
+keys) run in every worker. Run times are jittered so workers do not fire in lockstep, a job is
+never started while its previous run is still going, and per-job run counts,
+durations and failures are exposed on `/metrics`.
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from config import Config
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FirestoreLease:
+    """
+    Time-limited leader leases stored in the `scheduler_leases` collection.
+
+    A worker holds the lease of a job until it expires; the holder renews it on
+    each run, and any worker may take it over once it has expired.
+    """
+
+    def __init__(self, holder=None):
+        """
+        Args:
+            holder (str): This worker's identity. Defaults to host, PID and a random suffix.
+        """
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, name, ttl):
+        """
+        Takes or renews the lease of a job.
+
+        Args:
+            name (str): The job name.
+            ttl (float): Seconds the lease is held.
+
+        Returns:
+            bool: True if this worker holds the lease.
+        """
+        from firebase_admin import firestore
+        db = firestore.client()
+        lease_ref = db.collection('scheduler_leases').document(name)
+        holder = self.holder
+
+        @firestore.transactional
+        def _acquire(transaction):
+            now = datetime.now(timezone.utc)
+            snapshot = lease_ref.get(transaction=transaction)
+            if snapshot.exists:
+                lease = snapshot.to_dict()
+                expires_at = lease.get('expires_at')
+                if lease.get('holder') != holder and expires_at is not None and expires_at > now:
+                    return False
+            transaction.set(lease_ref, {'holder': holder, 'expires_at': now + timedelta(seconds=ttl)})
+            return True
+
+        return _acquire(db.transaction())
+
+
+class Job:
+    """
+    A periodic job and its run statistics.
+    """
+
+    def __init__(self, name, func, interval, leader=True, initial_delay=None):
+        """
+        Args:
+            name (str): The job name, used for its lease and metrics.
+            func (callable): The zero-argument function to run. Its return value
+                (e.g. a stats dict) is kept as `last_result`.
+            interval (float): Seconds between runs.
+            leader (bool): Run in only one worker at a time, under a lease.
+            initial_delay (float): Seconds before the first run. Defaults to a
+                random point within the first interval.
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.leader = leader
+        self.initial_delay = initial_delay
+        self.running = False
+        self.next_run = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped_overlap = 0
+        self.skipped_not_leader = 0
+        self.last_duration_ms = None
+        self.last_run_at = None
+        self.last_error = None
+        self.last_result = None
+
+    def stats(self):
+        """
+        Returns the job's run statistics.
+        """
+        return {
+            "interval": self.interval,
+            "leader": self.leader,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_overlap": self.skipped_overlap,
+            "skipped_not_leader": self.skipped_not_leader,
+            "last_duration_ms": self.last_duration_ms,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+        }
+
+
+class Scheduler:
+    """
+    Runs jobs on a background thread, each at its own jittered interval.
+    """
+
+    def __init__(self, lease=None, jitter=0.1, max_workers=4):
+        """
+        Args:
+            lease (FirestoreLease): The lease used by leader jobs.
+            jitter (float): Random spread applied to each interval, as a fraction.
+            max_workers (int): Maximum number of jobs running at once.
+        """
+        self.lease = lease or FirestoreLease()
+        self.jitter = jitter
+        self.jobs = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler-job")
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, interval, leader=True, initial_delay=None):
+        """
+        Registers a job. Jobs with a non-positive interval are ignored.
+
+        Returns:
+            Job: The job, or None if it is disabled.
+        """
+        if interval <= 0:
+            return None
+        job = Job(name, func, interval, leader=leader, initial_delay=initial_delay)
+        with self._lock:
+            self.jobs[name] = job
+        self._wakeup.set()
+        return job
+
+    def _delay(self, interval):
+        """
+        Returns `interval` with random jitter applied.
+        """
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def start(self):
+        """
+        Starts the scheduler thread (once).
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        metrics.register_collector("scheduler", self.stats)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                jobs = list(self.jobs.values())
+            for job in jobs:
+                if job.next_run is None:
+                    delay = job.initial_delay
+                    if delay is None:
+                        delay = random.uniform(0, job.interval)
+                    job.next_run = now + delay
+                if job.next_run <= now:
+                    job.next_run = now + self._delay(job.interval)
+                    self._dispatch(job)
+            next_due = min((job.next_run for job in jobs), default=now + 60)
+            self._wakeup.wait(timeout=max(0.05, next_due - time.monotonic()))
+            self._wakeup.clear()
+
+    def _dispatch(self, job):
+        """
+        Starts a run of a job unless its previous run is still going.
+        """
+        with self._lock:
+            if job.running:
+                job.skipped_overlap += 1
+                metrics.incr(f"scheduler.{job.name}.skipped_overlap")
+                return
+            job.running = True
+        try:
+            self._pool.submit(self._run, job)
+        except RuntimeError:
+            # The pool is shut down when the interpreter exits
+            job.running = False
+
+    def _run(self, job):
+        """
+        Runs a job once, under its lease if it is a leader job, and records the outcome.
+        """
+        try:
+            if job.leader:
+                try:
+                    is_leader = self.lease.acquire(job.name, job.interval)
+                except Exception as e:
+                    logger.warning(f"Scheduler lease for {job.name} failed: {e}")
+                    is_leader = False
+                if not is_leader:
+                    job.skipped_not_leader += 1
+                    metrics.incr(f"scheduler.{job.name}.skipped_not_leader")
+                    return
+            start = time.perf_counter()
+            job.last_run_at = time.time()
+            try:
+                job.last_result = job.func()
+                job.last_error = None
+                metrics.incr(f"scheduler.{job.name}.runs")
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                metrics.incr(f"scheduler.{job.name}.failures")
+                logger.exception(f"Scheduled job {job.name} failed")
+            finally:
+                job.runs += 1
+                job.last_duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        finally:
+            with self._lock:
+                job.running = False
+
+    def stats(self):
+        """
+        Reports every job's run statistics.
+
+        Returns:
+            dict: Job name -> statistics.
+        """
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return {job.name: job.stats() for job in jobs}
+
+
+scheduler = Scheduler(jitter=Config.SCHEDULER_JITTER)
+
+
+def prewarm_feed():
+    """
+    Refreshes the feed cache entries that clients asked for recently.
+
+    Returns:
+        dict: The number of feed variants refreshed.
+    """
+    from .models import LostItemModel, feed_cache
+    keys = feed_cache.hot_keys(within=max(60, 4 * Config.FEED_CACHE_TTL))
+    for limit, fields in keys:
+        LostItemModel.get_recent_feed(limit=limit, fields=list(fields) if fields else None, refresh=True)
+    return {"refreshed": len(keys)}
+
+
+def archive_stale_reports():
+    """
+    Archives lost item reports that stayed unapproved for `STALE_REPORT_DAYS`.
+    """
+    from .models import LostItemModel
+    return LostItemModel.archive_stale_reports(older_than_days=Config.STALE_REPORT_DAYS)
+
+
+def compact_messages():
+    """
+    Runs one message archive compaction pass.
+    """
+    from .models import MessageChunkModel
+    return MessageChunkModel.compact()
+
+
+def collect_orphaned_images():
+    """
+    Deletes bucket images no longer referenced by any item.
+    """
+    from .image_gc import collect_orphaned_images as collect
+    return collect(dry_run=False)
+
+
+def refresh_signing_keys():
+    """
+    Refreshes the ID token signing certificates of this worker.
+    """
+    from .auth import refresh_signing_keys as refresh
+    return {"refreshed": refresh()}
+
+
+def maintenance_jobs():
+    """
+    Returns the enabled jobs that act on shared data (run under a lease).
+
+    Returns:
+        dict: Job name -> (function, interval in seconds).
+    """
+    jobs = {}
+    if Config.STALE_REPORT_DAYS > 0:
+        jobs["archive_stale_reports"] = (archive_stale_reports, Config.STALE_REPORT_INTERVAL)
+    if Config.MESSAGE_ARCHIVE_AFTER_DAYS > 0:
+        jobs["compact_messages"] = (compact_messages, Config.MESSAGE_COMPACT_INTERVAL)
+    jobs["collect_orphaned_images"] = (collect_orphaned_images, Config.IMAGE_GC_INTERVAL)
+    return {name: job for name, job in jobs.items() if job[1] > 0}
+
+
+def run_maintenance(names=None):
+    """
+    Runs the maintenance jobs once, in the calling thread, without the scheduler.
+
+    Used by cron triggers on deployments without background threads. Each job
+    still takes its lease, so a job already run within its interval (by another
+    trigger or worker) is skipped.
+
+    Args:
+        names (list): Only run these jobs. Defaults to all enabled jobs.
+
+    Returns:
+        dict: Job name -> run statistics (see `Job.stats`).
+    """
+    results = {}
+    for name, (func, interval) in maintenance_jobs().items():
+        if names and name not in names:
+            continue
+        job = Job(name, func, interval)
+        scheduler._run(job)
+        results[name] = job.stats()
+    return results
+
+
+def start_scheduler():
+    """
+    Registers the maintenance jobs and starts the scheduler, if enabled.
+
+    Returns:
+        Scheduler: The scheduler, or None if `SCHEDULER_ENABLED` is off.
+    """
+    if not Config.SCHEDULER_ENABLED:
+        return None
+    if Config.FEED_CACHE_TTL > 0:
+        # Refresh shortly before entries expire, in every worker (the cache is per process)
+        scheduler.add_job("prewarm_feed", prewarm_feed, Config.FEED_CACHE_TTL * 0.8, leader=False)
+    scheduler.add_job("refresh_signing_keys", refresh_signing_keys, Config.TOKEN_KEY_REFRESH_INTERVAL,
+                      leader=False, initial_delay=0)
+    for name, (func, interval) in maintenance_jobs().items():
+        scheduler.add_job(name, func, interval)
+    scheduler.start()
+    return scheduler
@@ -5,10 +5,13 @@ Utility functions for AppWrite Storage operations.
 Handles uploading images to AppWrite Storage and generating download URLs.
 """
 
+import json
 import os
+import httpx
 import requests
 from datetime import datetime
 from typing import Optional
+from .request_log import span
 
 # AppWrite configuration - loaded from environment variables
 APPWRITE_ENDPOINT = os.getenv('APPWRITE_ENDPOINT', '')
@@ -36,6 +39,82 @@ def _get_headers() -> dict:
     }
 
 
+def _prepare_upload(file_data: bytes, filename: str, folder: str) -> dict:
+    """
+    Build the AppWrite request arguments for an image upload.
+    
+    Args:
+        file_data: The file data (bytes).
+        filename: The name of the file to save.
+        folder: The folder/path in Storage.
+    
+    Returns:
+        dict: Keyword arguments (url, files, data, headers) for the HTTP client.
+    
+    Raises:
+        Exception: If AppWrite is not configured.
+    """
+    if not APPWRITE_ENDPOINT:
+        raise Exception("APPWRITE_ENDPOINT environment variable is required")
+    if not APPWRITE_STORAGE_BUCKET_ID:
+        raise Exception("APPWRITE_STORAGE_BUCKET_ID environment variable is required")
+    
+    # Create a unique filename with timestamp to avoid conflicts
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
+    safe_filename = os.path.basename(filename).replace(' ', '_')
+    unique_filename = f"{timestamp}_{safe_filename}"
+    
+    # AppWrite Storage API endpoint
+    url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files"
+    
+    # Prepare multipart form data
+    files = {
+        'file': (unique_filename, file_data, _get_content_type(filename))
+    }
+    
+    data = {
+        'fileId': 'unique()',  # Auto-generate file ID
+    }
+    
+    # Make request (without Content-Type header for multipart)
+    headers = {
+        'X-Appwrite-Project': APPWRITE_PROJECT_ID,
+        'X-Appwrite-Key': APPWRITE_API_KEY,
+    }
+    
+    return {'url': url, 'files': files, 'data': data, 'headers': headers}
+
+
+def _file_url_from_response(response) -> str:
+    """
+    Turn an AppWrite upload response into the file view URL.
+    
+    Args:
+        response: The HTTP response (requests or httpx).
+    
+    Returns:
+        str: The view URL of the uploaded file.
+    
+    Raises:
+        Exception: If AppWrite rejected the upload.
+    """
+    if response.status_code != 201:
+        error_msg = response.text
+        try:
+            error_json = response.json()
+            error_msg = error_json.get('message', error_msg)
+        except:
+            pass
+        raise Exception(f"AppWrite API error ({response.status_code}): {error_msg}")
+    
+    # Get file ID from response
+    file_info = response.json()
+    file_id = file_info.get('$id', '')
+    
+    # Return the file view URL
+    return f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files/{file_id}/view"
+
+
 def upload_image_to_storage(file_data: bytes, filename: str, folder: str = 'lost-items') -> str:
     """
     Upload an image file to AppWrite Storage.
@@ -52,55 +131,11 @@ def upload_image_to_storage(file_data: bytes, filename: str, folder: str = 'lost
         Exception: If upload fails.
     """
     try:
-        if not APPWRITE_ENDPOINT:
-            raise Exception("APPWRITE_ENDPOINT environment variable is required")
-        if not APPWRITE_STORAGE_BUCKET_ID:
-            raise Exception("APPWRITE_STORAGE_BUCKET_ID environment variable is required")
-        
-        # Create a unique filename with timestamp to avoid conflicts
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
-        safe_filename = os.path.basename(filename).replace(' ', '_')
-        unique_filename = f"{timestamp}_{safe_filename}"
-        
-        # Create file path
-        file_path = f"{folder}/{unique_filename}" if folder else unique_filename
-        
-        # AppWrite Storage API endpoint
-        url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files"
-        
-        # Prepare multipart form data
-        files = {
-            'file': (unique_filename, file_data, _get_content_type(filename))
-        }
-        
-        data = {
-            'fileId': 'unique()',  # Auto-generate file ID
-        }
-        
-        # Make request (without Content-Type header for multipart)
-        headers = {
-            'X-Appwrite-Project': APPWRITE_PROJECT_ID,
-            'X-Appwrite-Key': APPWRITE_API_KEY,
-        }
-        
-        response = requests.post(url, files=files, data=data, headers=headers)
-        
-        if response.status_code != 201:
-            error_msg = response.text
-            try:
-                error_json = response.json()
-                error_msg = error_json.get('message', error_msg)
-            except:
-                pass
-            raise Exception(f"AppWrite API error ({response.status_code}): {error_msg}")
-        
-        # Get file ID from response
-        file_info = response.json()
-        file_id = file_info.get('$id', '')
-        
-        # Return the file view URL
-        file_url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files/{file_id}/view"
-        return file_url
+        request_args = _prepare_upload(file_data, filename, folder)
+        with span('appwrite.upload', folder=folder, bytes=len(file_data)) as call:
+            response = requests.post(**request_args)
+            call['status'] = response.status_code
+        return _file_url_from_response(response)
         
     except requests.exceptions.RequestException as e:
         raise Exception(f"Failed to upload image to AppWrite Storage: {str(e)}")
@@ -108,6 +143,37 @@ def upload_image_to_storage(file_data: bytes, filename: str, folder: str = 'lost
         raise Exception(f"Failed to upload image to AppWrite Storage: {str(e)}")
 
 
+async def upload_image_to_storage_async(file_data: bytes, filename: str, folder: str = 'lost-items') -> str:
+    """
+    Upload an image file to AppWrite Storage without blocking the event loop.
+    
+    Async counterpart of `upload_image_to_storage`, used by the async views.
+    
+    Args:
+        file_data: The file data (bytes).
+        filename: The name of the file to save.
+        folder: The folder/path in Storage (default: 'lost-items').
+    
+    Returns:
+        str: The URL of the uploaded image.
+    
+    Raises:
+        Exception: If upload fails.
+    """
+    try:
+        request_args = _prepare_upload(file_data, filename, folder)
+        with span('appwrite.upload', folder=folder, bytes=len(file_data)) as call:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(**request_args)
+            call['status'] = response.status_code
+        return _file_url_from_response(response)
+        
+    except httpx.HTTPError as e:
+        raise Exception(f"Failed to upload image to AppWrite Storage: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Failed to upload image to AppWrite Storage: {str(e)}")
+
+
 def _get_content_type(filename: str) -> str:
     """
     Get content type based on file extension.
@@ -128,6 +194,84 @@ def _get_content_type(filename: str) -> str:
     return content_types.get(extension, 'image/jpeg')
 
 
+def file_id_from_url(file_url: str) -> Optional[str]:
+    """
+    Extract the AppWrite file ID from a file view URL.
+    
+    Args:
+        file_url: A URL of the form https://endpoint/storage/buckets/{bucketId}/files/{fileId}/view.
+    
+    Returns:
+        str: The file ID, or None if the URL does not point to a storage file.
+    """
+    if not file_url or '/files/' not in file_url:
+        return None
+    file_id = file_url.split('/files/', 1)[1].split('/')[0].split('?')[0]
+    return file_id or None
+
+
+def list_storage_files(page_size: int = 100):
+    """
+    Stream the files of the storage bucket, page by page.
+    
+    At most two pages are held in memory at a time; pages are fetched with
+    cursor pagination so listing cost does not grow with the offset.
+    
+    Args:
+        page_size: The number of files requested per page (at most 100).
+    
+    Yields:
+        dict: The AppWrite file objects (`$id`, `$createdAt`, `sizeOriginal`, ...).
+    
+    Raises:
+        Exception: If listing fails.
+    """
+    url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files"
+    headers = _get_headers()
+    
+    def fetch(cursor):
+        queries = [json.dumps({'method': 'limit', 'values': [page_size]})]
+        if cursor:
+            queries.append(json.dumps({'method': 'cursorAfter', 'values': [cursor]}))
+        try:
+            with span('appwrite.list', limit=page_size, cursor=bool(cursor)) as call:
+                response = requests.get(url, headers=headers, params={'queries[]': queries}, timeout=30)
+                call['status'] = response.status_code
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to list AppWrite Storage files: {str(e)}")
+        if response.status_code != 200:
+            raise Exception(f"AppWrite API error ({response.status_code}): {response.text}")
+        return response.json().get('files', [])
+    
+    # The next page is fetched before the current one is handed out, so callers
+    # may delete the files they are given without invalidating the cursor.
+    files = fetch(None)
+    while files:
+        following = fetch(files[-1]['$id']) if len(files) >= page_size else []
+        yield from files
+        files = following
+
+
+def delete_storage_file(file_id: str) -> bool:
+    """
+    Delete a file from AppWrite Storage by ID.
+    
+    Args:
+        file_id: The ID of the file to delete.
+    
+    Returns:
+        bool: True if the file was deleted or no longer exists.
+    
+    Raises:
+        Exception: If the request fails.
+    """
+    url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files/{file_id}"
+    with span('appwrite.delete', file_id=file_id) as call:
+        response = requests.delete(url, headers=_get_headers(), timeout=30)
+        call['status'] = response.status_code
+    return response.status_code in [200, 204, 404]
+
+
 def delete_image_from_storage(file_url: str) -> bool:
     """
     Delete an image from AppWrite Storage using its URL.
@@ -142,19 +286,11 @@ def delete_image_from_storage(file_url: str) -> bool:
         if not APPWRITE_ENDPOINT or not APPWRITE_STORAGE_BUCKET_ID:
             return False
         
-        # Extract file ID from URL
-        # URL format: https://endpoint/storage/buckets/{bucketId}/files/{fileId}/view
-        url_parts = file_url.split('/files/')
-        if len(url_parts) < 2:
+        file_id = file_id_from_url(file_url)
+        if not file_id:
             return False
         
-        file_id = url_parts[1].split('/')[0]
-        
-        # Delete file
-        url = f"{APPWRITE_ENDPOINT}/storage/buckets/{APPWRITE_STORAGE_BUCKET_ID}/files/{file_id}"
-        response = requests.delete(url, headers=_get_headers())
-        
-        return response.status_code in [200, 204]
+        return delete_storage_file(file_id)
     except Exception as e:
         print(f"Error deleting image from AppWrite Storage: {str(e)}")
         return False
@@ -6,8 +6,8 @@ input validation. It includes methods to handle common operations such as
 validating user input, hashing passwords, and validating phone numbers or NSU IDs.
 """
 
-import bcrypt
 import re
+from . import passwords
 
 def validate_input(data, required_fields):
     """
@@ -27,27 +27,37 @@ def hash_password(password):
     """
     Hashes a plaintext password using bcrypt.
 
+    The work runs on the password hashing process pool (see `passwords.py`).
+
     Args:
         password (str): The plaintext password to hash.
 
     Returns:
         str: The hashed password as a string.
+
+    Raises:
+        PasswordHashingBusy: If the hashing queue is full.
     """
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return passwords.hash_password(password)
 
 
 def check_password(password, hashed_password):
     """
     Verifies if a plaintext password matches a given hashed password.
 
+    The work runs on the password hashing process pool (see `passwords.py`).
+
     Args:
         password (str): The plaintext password.
         hashed_password (str): The hashed password to compare against.
 
     Returns:
         bool: True if the passwords match, False otherwise.
+
+    Raises:
+        PasswordHashingBusy: If the hashing queue is full.
     """
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+    return passwords.check_password(password, hashed_password)
 
 
 def is_valid_phone_number(phone_number):
@@ -1,14 +1,48 @@
-from flask import Blueprint, request, jsonify
-from .models import UserModel, LostItemModel, MessageModel, FoundItemModel
+from flask import Blueprint, current_app, request, jsonify
+from .models import UserModel, LostItemModel, MessageModel, FoundItemModel, DuplicateUserError, parse_message_cursor
+from .models import ItemSyncModel, ItemStatsModel, ItemGeoModel, parse_sync_cursor
 from .utils import hash_password, check_password, is_valid_phone_number, is_valid_nsu_id
+from .passwords import PasswordHashingBusy, needs_rehash
+from .ratelimit import auth_limiter
+from . import metrics
 from .storage import upload_image_to_storage
+from .geo import parse_coordinates
+from .http_cache import conditional_json
+from .serialization import wants_stream, stream_json_array
+from . import events
+from config import Config
+import hmac
 import os
+import re
 from werkzeug.utils import secure_filename
 
 main_bp = Blueprint("main", __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+# Compact set of fields returned for feed cards unless `fields` says otherwise
+FEED_CARD_FIELDS = ["description", "location", "image", "reported_by", "created_at"]
+
+# Error messages for unique user fields that are already taken
+DUPLICATE_FIELD_ERRORS = {
+    "email": "Email already exists",
+    "nsu_id": "NSU ID already exists",
+    "firebase_uid": "Account already linked",
+}
+
+FIELD_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+def hashing_busy_response():
+    """
+    Builds the response returned when the password hashing queue is full.
+
+    @return: A 503 JSON response asking the client to retry shortly.
+    """
+    response = jsonify({"error": "Server busy, please retry"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
 def allowed_file(filename):
     """
     Checks if the file extension is allowed.
@@ -18,7 +52,81 @@ def allowed_file(filename):
     """
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def parse_fields(default=None):
+    """
+    Parses the `fields` query parameter into a list of response field names.
+
+    `fields` is a comma-separated list such as `description,location,image`. `_id`
+    is always returned. Names that are not plain field paths are ignored, and
+    `fields=all` requests full documents.
+
+    @param default: The field list to use when the parameter is absent.
+    @return: The list of requested fields, or None for full documents.
+    """
+    raw = request.args.get("fields")
+    if raw is None:
+        return default
+    if raw.strip().lower() in ("", "all", "*"):
+        return None
+    fields = []
+    for name in raw.split(","):
+        name = name.strip()
+        if FIELD_NAME_RE.fullmatch(name) and name not in fields and name != "password":
+            fields.append(name)
+    return fields or None
+
+def projection_for(fields):
+    """
+    Maps response field names to the Firestore field paths to `select()`.
+
+    The `image` response field is read from `image_path`, and `_id` is the document
+    ID, so it needs no field.
+
+    @param fields: The response field names, or None.
+    @return: The Firestore field paths, or None to read whole documents.
+    """
+    if not fields:
+        return None
+    projection = []
+    for name in fields:
+        path = "image_path" if name == "image" else name
+        if name != "_id" and path not in projection:
+            projection.append(path)
+    return projection or ["__name__"]
+
+def with_image_url(item, fields=None):
+    """
+    Adds the `image` field the app expects to an item.
+
+    Image URLs are already stored in the `image_path` field (AppWrite Storage URLs),
+    so they are used directly. With a `fields` selection, `image` is only added when
+    requested and `image_path` is dropped unless it was requested itself, so the URL
+    is not sent twice.
+
+    @param item: The item dict to update in place.
+    @param fields: The requested response fields, or None for full documents.
+    @return: The same item, for convenience.
+    """
+    if fields is None or "image" in fields:
+        item["image"] = item.get("image_path") or None
+    if fields is not None and "image_path" not in fields:
+        item.pop("image_path", None)
+    return item
+
+def attach_image_urls(items, fields=None):
+    """
+    Adds the `image` field the app expects to each item in a list.
+
+    @param items: The list of item dicts to update in place.
+    @param fields: The requested response fields, or None for full documents.
+    @return: The same list, for convenience.
+    """
+    for item in items:
+        with_image_url(item, fields)
+    return items
+
 @main_bp.route("/users", methods=["POST"])
+@auth_limiter.limit(account_field="email")
 def create_user():
     """
     Endpoint to create a new user.
@@ -37,28 +145,41 @@ def create_user():
         return jsonify({"error": "User already exists"}), 400
 
     # Password hashing
-    data["password"] = hash_password(data["password"])
+    try:
+        data["password"] = hash_password(data["password"])
+    except PasswordHashingBusy:
+        return hashing_busy_response()
     user_id = UserModel.create_user({"username": data["username"], "email": data["email"], "password": data["password"]})
     return jsonify({"message": "User created successfully", "id": user_id}), 201
 
 @main_bp.route("/login", methods=["POST"])
+@auth_limiter.limit(account_field="email")
 def login():
     """
     Endpoint for user login.
 
     This endpoint expects a JSON body with `email` and `password`. It checks if the user exists 
-    and if the provided password matches. If successful, it returns a success message.
+    and if the provided password matches. If successful, it returns a success message. Hashes
+    made with an outdated bcrypt cost are rehashed on the way.
 
     @return: JSON response with login success message or error.
     """
     data = request.get_json()
     user = UserModel.get_user_by_email(data["email"])
-    if not user or not check_password(data["password"], user["password"]):
-        return jsonify({"error": "Invalid email or password"}), 400
+    try:
+        if not user or not check_password(data["password"], user["password"]):
+            return jsonify({"error": "Invalid email or password"}), 400
+
+        # Transparently upgrade hashes made with a different work factor
+        if needs_rehash(user["password"]):
+            UserModel.update_user(user["_id"], {"password": hash_password(data["password"])})
+    except PasswordHashingBusy:
+        return hashing_busy_response()
 
     return jsonify({"message": "Login successful", "email": str(user["email"])}), 200
 
 @main_bp.route("/signup", methods=["POST"])
+@auth_limiter.limit(account_field="email")
 def signup():
     """
     Endpoint to sign up a new user.
@@ -82,15 +203,21 @@ def signup():
     if not is_valid_nsu_id(data["nsu_id"]):
         return jsonify({"error": "Invalid NSU ID"}), 400
 
-    if UserModel.get_user_by_email(data["email"]):
-        return jsonify({"error": "Email already exists"}), 400
+    # Fail fast (before hashing) if the email or NSU ID is taken; one batched read
+    taken = UserModel.find_taken_field({"email": data["email"], "nsu_id": data["nsu_id"]})
+    if taken:
+        return jsonify({"error": DUPLICATE_FIELD_ERRORS[taken]}), 400
 
-    if UserModel.get_user_by_nsu_id(data["nsu_id"]):
-        return jsonify({"error": "NSU ID already exists"}), 400
-
-    data["password"] = hash_password(data["password"])
+    try:
+        data["password"] = hash_password(data["password"])
+    except PasswordHashingBusy:
+        return hashing_busy_response()
 
-    user_id = UserModel.create_user(data)
+    # The uniqueness check is repeated atomically with the write
+    try:
+        user_id = UserModel.create_user(data)
+    except DuplicateUserError as e:
+        return jsonify({"error": DUPLICATE_FIELD_ERRORS[e.field]}), 400
     return jsonify({"message": "User created successfully", "id": user_id}), 201
 
 # Removed local filesystem upload endpoint - images are now served directly from AppWrite Storage URLs
@@ -101,7 +228,9 @@ def report_lost_item():
     Endpoint to report a lost item.
 
     This endpoint accepts form data to report a lost item. It handles image uploads, 
-    validates required fields, and saves the lost item in the database.
+    validates required fields, and saves the lost item in the database. Optional `lat`
+    and `lng` fields make the item findable through `/items/nearby`. A near-duplicate of
+    the user's own open report is merged into it and answered with 200 and `duplicate`.
 
     @return: JSON response with success message or error.
     """
@@ -136,13 +265,22 @@ def report_lost_item():
     if not description or not location or not reported_by:
         return jsonify({"error": "Missing required fields"}), 400
 
-    # Report lost item in the database
-    lost_item_id = LostItemModel.report_lost_item(
+    # Optional coordinates for the nearby items search
+    try:
+        coordinates = parse_coordinates(data.get("lat"), data.get("lng"))
+    except ValueError:
+        return jsonify({"error": "Invalid coordinates"}), 400
+
+    # Report lost item in the database (repeated reports are merged into the original)
+    lost_item_id, merged = LostItemModel.report_lost_item(
         description=description,
         location=location,
         image_path=image_url,  # Store AppWrite Storage URL
         reported_by=reported_by,
+        coordinates=coordinates,
     )
+    if merged:
+        return jsonify({"message": "Lost item already reported", "id": lost_item_id, "duplicate": True}), 200
     return jsonify({"message": "Lost item reported successfully", "id": lost_item_id}), 201
 
 @main_bp.route('/lost-items', methods=['GET'])
@@ -152,30 +290,33 @@ def get_lost_items():
 
     This endpoint returns a paginated list of lost items. It includes optional `limit` and `skip` 
     query parameters for pagination. If an item has an image, the image URL is also included.
+    Large pages (or `stream=true`) are streamed item by item instead of being validated with an ETag.
+    An optional `fields` parameter limits which fields are read and returned.
 
     @return: JSON response with list of lost items.
     """
     limit = int(request.args.get("limit", 10))
     skip = int(request.args.get("skip", 0))
 
-    items = LostItemModel.get_lost_items(limit=limit, skip=skip)
+    fields = parse_fields()
 
-    # Image URLs are already stored in image_path field (Firebase Storage URLs)
-    for item in items:
-        if "image_path" in item and item["image_path"]:
-            item["image"] = item["image_path"]  # Use Firebase Storage URL directly
-        else:
-            item["image"] = None
-    
-    return jsonify(items), 200
+    if wants_stream(limit):
+        items = LostItemModel.iter_lost_items(limit=limit, skip=skip, fields=projection_for(fields))
+        return stream_json_array(items, transform=lambda item: with_image_url(item, fields))
+
+    items = LostItemModel.get_lost_items(limit=limit, skip=skip, fields=projection_for(fields))
+
+    attach_image_urls(items, fields)
+
+    return conditional_json(items)
 
 @main_bp.route('/found-items', methods=['POST'])
 def report_found_item():
     """
     Endpoint to report a found item.
 
-    This endpoint accepts a JSON body with the description, location, and image path of the found item.
-    It saves the found item in the database.
+    This endpoint accepts a JSON body with the description, location, and image path of the found item,
+    and optionally its `lat` and `lng`. It saves the found item in the database.
 
     @return: JSON response with success message or error.
     """
@@ -185,11 +326,17 @@ def report_found_item():
     if not data.get("description") or not data.get("location") or not data.get("image_path"):
         return jsonify({"error": "Missing required fields"}), 400
 
+    try:
+        coordinates = parse_coordinates(data.get("lat"), data.get("lng"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid coordinates"}), 400
+
     # Call the model to save the found item
     found_item_id = FoundItemModel.report_found_item(
         description=data["description"],
         location=data["location"],
-        image_path=data["image_path"]
+        image_path=data["image_path"],
+        coordinates=coordinates,
     )
 
     return jsonify({"message": "Found item reported successfully", "id": found_item_id}), 201
@@ -218,22 +365,84 @@ def get_found_items():
 
     This endpoint returns a paginated list of found items. It includes optional `limit` and `skip` 
     query parameters for pagination. If an item has an image, the image URL is also included.
+    Large pages (or `stream=true`) are streamed item by item instead of being validated with an ETag.
+    An optional `fields` parameter limits which fields are read and returned.
 
     @return: JSON response with list of found items.
     """
     limit = int(request.args.get("limit", 100))
     skip = int(request.args.get("skip", 0))
-    
-    items = FoundItemModel.get_found_items(limit=limit, skip=skip)
 
-    # Image URLs are already stored in image_path field (Firebase Storage URLs)
-    for item in items:
-        if "image_path" in item and item["image_path"]:
-            item["image"] = item["image_path"]  # Use Firebase Storage URL directly
-        else:
-            item["image"] = None
-            
-    return jsonify(items), 200
+    fields = parse_fields()
+
+    if wants_stream(limit):
+        items = FoundItemModel.iter_found_items(limit=limit, skip=skip, fields=projection_for(fields))
+        return stream_json_array(items, transform=lambda item: with_image_url(item, fields))
+
+    items = FoundItemModel.get_found_items(limit=limit, skip=skip, fields=projection_for(fields))
+
+    attach_image_urls(items, fields)
+
+    return conditional_json(items)
+
+@main_bp.route('/items/changes', methods=['GET'])
+def get_item_changes():
+    """
+    Endpoint to sync a local mirror of lost and found items.
+
+    Accepts an `updated_since` cursor (the `cursor` of the previous response, or 0
+    for a full sync), an optional `limit` and an optional `fields` parameter. The
+    response lists `add`, `update` and `remove` deltas across both collections,
+    oldest first; clients repeat the call with the new cursor while `has_more` is true.
+
+    @return: JSON response with `changes`, `cursor` and `has_more`.
+    """
+    try:
+        since = parse_sync_cursor(request.args.get("updated_since", ""))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "updated_since must be a cursor returned by this endpoint, or 0"}), 400
+    limit = int(request.args.get("limit", 100))
+    limit = max(1, min(limit, current_app.config.get("ITEM_SYNC_MAX_LIMIT", 500)))
+
+    fields = parse_fields()
+    result = ItemSyncModel.get_changes(since, limit=limit, fields=projection_for(fields))
+    for change in result["changes"]:
+        if "item" in change:
+            with_image_url(change["item"], fields)
+    return jsonify(result), 200
+
+@main_bp.route('/items/nearby', methods=['GET'])
+def get_nearby_items():
+    """
+    Endpoint to retrieve the items reported nearest to a point.
+
+    Requires `lat` and `lng`. `type` is `lost` (approved, open lost items; the default)
+    or `found`. With `radius` (meters, at most `GEO_MAX_RADIUS`) all items within it are
+    considered; without it the search widens until `limit` items (default 20) are found.
+    Only items reported with coordinates are returned, nearest first, each with its
+    `distance_m`.
+
+    @return: JSON response with `items`, the `radius_m` searched and `truncated`.
+    """
+    collections = {"lost": "lost_items", "found": "found_items"}
+    collection = collections.get(request.args.get("type", "lost"))
+    if collection is None:
+        return jsonify({"error": "type must be lost or found"}), 400
+    try:
+        coordinates = parse_coordinates(request.args.get("lat"), request.args.get("lng"))
+        limit = max(1, min(int(request.args.get("limit", 20)), 100))
+        radius = request.args.get("radius")
+        radius = float(radius) if radius else None
+    except ValueError:
+        return jsonify({"error": "Invalid lat, lng, radius or limit"}), 400
+    if coordinates is None:
+        return jsonify({"error": "lat and lng are required"}), 400
+    if radius is not None and not 0 < radius <= current_app.config.get("GEO_MAX_RADIUS", 5000):
+        return jsonify({"error": "radius out of range"}), 400
+
+    result = ItemGeoModel.find_nearest(collection, coordinates[0], coordinates[1], limit=limit, radius_m=radius)
+    attach_image_urls(result["items"])
+    return jsonify(result), 200
 
 @main_bp.route("/activity-feed", methods=["GET"])
 def activity_feed():
@@ -241,13 +450,17 @@ def activity_feed():
     Endpoint to retrieve a feed of recent lost items.
 
     This endpoint returns a paginated list of recent lost items. It includes an optional `limit` 
-    query parameter for pagination.
+    query parameter for pagination. Only the fields needed for feed cards are returned unless
+    `fields` selects others (`fields=all` returns full documents).
 
     @return: JSON response with activity feed.
     """
     limit = int(request.args.get("limit", 10))
-    feed = LostItemModel.get_recent_feed(limit=limit)
-    return jsonify(feed), 200
+    fields = parse_fields(default=FEED_CARD_FIELDS)
+    feed = LostItemModel.get_recent_feed(limit=limit, fields=projection_for(fields))
+    if fields is not None:
+        attach_image_urls(feed, fields)
+    return conditional_json(feed)
 
 
 
@@ -280,7 +493,11 @@ def get_messages():
     This endpoint expects a JSON body with `author_id` and `receiver_id`. 
     It returns a paginated list of messages with optional `limit` and `skip` query parameters.
 
-    @return: JSON response with the list of messages.
+    With a `since` cursor (in the body or as a query parameter), only what changed
+    after the cursor is returned: newer messages in ascending order, tombstones and
+    edits, and the cursor to use next (see `MessageModel.get_messages_since`).
+
+    @return: JSON response with the list of messages, or the sync result for `since`.
     """
     data = request.json
     author_id = data.get("author_id")
@@ -288,6 +505,15 @@ def get_messages():
     limit = int(request.args.get("limit", 50))
     skip = int(request.args.get("skip", 0))
 
+    since = data.get("since") or request.args.get("since")
+    if since:
+        try:
+            cursor = parse_message_cursor(since)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = max(1, min(limit, current_app.config.get("MESSAGE_SYNC_MAX_LIMIT", 200)))
+        return jsonify(MessageModel.get_messages_since(author_id, receiver_id, cursor, limit=limit)), 200
+
     messages = MessageModel.get_messages(author_id, receiver_id, limit=limit, skip=skip)
     
     # Convert _id to string if it exists (Firestore already returns string IDs)
@@ -318,6 +544,55 @@ def get_chats():
 
     return jsonify(chat_list), 200
 
+@main_bp.route('/mark_read', methods=['POST'])
+def mark_read():
+    """
+    Endpoint to mark a conversation as read.
+
+    This endpoint expects a JSON body with `user_id` (the reader) and `chat_id`
+    (the other participant, as returned by `/get_chats`) and resets the reader's
+    unread count for that conversation.
+
+    @return: JSON response with the number of messages marked as read.
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = data.get("user_id")
+    chat_id = data.get("chat_id")
+    if not user_id or not chat_id:
+        return jsonify({"error": "user_id and chat_id are required"}), 400
+
+    cleared = MessageModel.mark_read(user_id, chat_id)
+    return jsonify({"marked_read": cleared, "unread_count": 0}), 200
+
+@main_bp.route('/events', methods=['GET'])
+def event_stream():
+    """
+    Endpoint to receive real-time updates as server-sent events.
+
+    Accepts an optional `user_id` query parameter and a comma-separated `topics`
+    parameter (`chats`, `feed`; both by default). The stream carries `message`
+    and `chat` events for the user's conversations and `item_approved` events for
+    the activity feed. A `resync` event means events were dropped because the
+    client fell behind, and the client should refetch through the regular endpoints.
+
+    @return: A `text/event-stream` response, or an error if nothing can be subscribed.
+    """
+    if not Config.EVENTS_ENABLED:
+        return jsonify({"error": "Event streaming is disabled"}), 404
+
+    topics = events.topics_for(request.args.get("user_id"), request.args.get("topics"))
+    if not topics:
+        return jsonify({"error": "user_id is required for the chats topic"}), 400
+
+    subscription = events.broker.subscribe(topics)
+    if subscription is None:
+        response = jsonify({"error": "Too many open event streams, please retry"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+
+    return events.stream_events(subscription)
+
 @main_bp.route('/search-lost-items', methods=['GET'])
 def search_lost_items():
     """
@@ -332,31 +607,9 @@ def search_lost_items():
     if not query:
         return jsonify({"error": "No search query provided"}), 400
 
-    # Firestore doesn't support full-text search natively, so we do a simple contains check
+    # Firestore doesn't support full-text search natively, so the model filters in Python.
     # For production, consider using Algolia or similar for full-text search
-    from firebase_admin import firestore
-    db = firestore.client()
-    items_ref = db.collection('lost_items')
-    
-    # Query for approved and not found items where description contains query (case-insensitive)
-    # Note: Firestore doesn't support case-insensitive contains, so we'll filter in Python
-    query_result = items_ref.where('is_approved', '==', True).where('is_found', '==', False).limit(100).stream()
-
-    result = []
-    query_lower = query.lower()
-    for doc in query_result:
-        item = doc.to_dict()
-        description = item.get("description", "").lower()
-        if query_lower in description:
-            result.append({
-                "_id": doc.id,
-                "description": item.get("description"),
-                "location": item.get("location"),
-                "image": item.get("image_path") if item.get("image_path") else None,  # Use AppWrite Storage URL directly
-                "reported_by": item.get("reported_by")
-            })
-            if len(result) >= 20:
-                break
+    result = LostItemModel.search(query)
 
     return jsonify(result), 200
 
@@ -394,19 +647,79 @@ def get_lost_items_admin():
     Endpoint to retrieve a list of lost items for the admin.
 
     This endpoint returns a paginated list of lost items, with optional `limit` and `skip` query parameters.
+    Large pages (or `stream=true`) are streamed item by item. An optional `fields` parameter
+    limits which fields are read and returned.
 
     @return: JSON response with the list of lost items for the admin.
     """
     limit = int(request.args.get("limit", 10))
     skip = int(request.args.get("skip", 0))
 
-    items = LostItemModel.get_lost_items_admin(limit=limit, skip=skip)
+    fields = parse_fields()
 
-    # Image URLs are already stored in image_path field (Firebase Storage URLs)
-    for item in items:
-        if "image_path" in item and item["image_path"]:
-            item["image"] = item["image_path"]  # Use Firebase Storage URL directly
-        else:
-            item["image"] = None
+    if wants_stream(limit):
+        items = LostItemModel.iter_lost_items_admin(limit=limit, skip=skip, fields=projection_for(fields))
+        return stream_json_array(items, transform=lambda item: with_image_url(item, fields))
+
+    items = LostItemModel.get_lost_items_admin(limit=limit, skip=skip, fields=projection_for(fields))
+
+    attach_image_urls(items, fields)
 
     return jsonify(items), 200
+
+@main_bp.route('/statistics', methods=['GET'])
+def get_statistics():
+    """
+    Endpoint to retrieve item statistics for the admin dashboard.
+
+    Returns the daily number of lost item reports, approvals, lost items marked as
+    found and found item reports for the last `days` days (default 30, at most
+    `ITEM_STATS_MAX_DAYS`), with all-time totals. An optional `location` parameter
+    restricts the daily series to one location and adds its all-time totals. The
+    counters are precomputed, so no item collection is read.
+
+    @return: JSON response with the daily series and totals.
+    """
+    try:
+        days = int(request.args.get("days", 30))
+    except ValueError:
+        return jsonify({"error": "Invalid days"}), 400
+    days = max(1, min(days, current_app.config.get("ITEM_STATS_MAX_DAYS", 90)))
+    stats = ItemStatsModel.get_statistics(days=days, location=request.args.get("location"))
+    return jsonify(stats), 200
+
+@main_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Endpoint to retrieve in-process metrics.
+
+    Returns the counters and component statistics (rate limiting, caches, queues)
+    of the worker that serves the request. Requires the `X-Metrics-Token` header
+    set to `METRICS_TOKEN`.
+
+    @return: JSON response with the metrics snapshot.
+    """
+    token = current_app.config.get("METRICS_TOKEN", "")
+    supplied = request.headers.get("X-Metrics-Token", "")
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(metrics.snapshot()), 200
+
+@main_bp.route('/cron/maintenance', methods=['GET', 'POST'])
+def run_maintenance():
+    """
+    Endpoint that runs the maintenance jobs once, for cron triggers (Vercel Cron).
+
+    Requires `Authorization: Bearer <CRON_SECRET>`. An optional `jobs` parameter
+    (comma-separated) restricts the run to some jobs; each job is skipped if it
+    already ran within its interval.
+
+    @return: JSON response with each job's run statistics.
+    """
+    secret = current_app.config.get("CRON_SECRET", "")
+    supplied = request.headers.get("Authorization", "")
+    if not secret or not hmac.compare_digest(supplied.encode(), f"Bearer {secret}".encode()):
+        return jsonify({"error": "Not found"}), 404
+    from .scheduler import run_maintenance as run
+    names = [name for name in request.args.get("jobs", "").split(",") if name]
+    return jsonify(run(names or None)), 200
@@ -0,0 +1,19 @@
+import os
+from a2wsgi import WSGIMiddleware
+from app import create_app
+
+# Create the Flask application with async views enabled
+app = create_app(async_mode=True)
+"""
+ASGI entry point for the async serving mode.
+
+Run with an ASGI server, for example:
+
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 8000
+
+Async views are awaited on a single shared event loop, so each request only
+occupies a lightweight bridge thread while its Firestore and AppWrite calls are
+in flight. `ASGI_THREADS` bounds how many requests one process keeps in flight.
+"""
+
+asgi_app = WSGIMiddleware(app, workers=int(os.getenv("ASGI_THREADS", "256")))
@@ -53,3 +53,440 @@ class Config:
     AppWrite Storage Bucket ID.
     Create a bucket in AppWrite Console → Storage and use its ID.
     """
+
+    # Serving configuration
+    ASYNC_MODE = os.getenv("ASYNC_MODE", "").lower() in ("1", "true", "yes")
+    """
+    Serve the I/O-heavy routes with async views backed by the Firestore AsyncClient
+    and an async AppWrite client. Enabled automatically by `asgi.py`.
+    """
+
+    QUERY_POOL_SIZE = int(os.getenv("QUERY_POOL_SIZE", "16"))
+    """
+    Number of threads in the shared pool that runs independent Firestore queries
+    of a single request in parallel (see `models.run_concurrently`).
+    """
+
+    # HTTP caching and compression
+    FEED_MAX_AGE = int(os.getenv("FEED_MAX_AGE", "15"))
+    """
+    Seconds that clients and proxies may reuse the public list responses
+    (`/lost-items`, `/found-items`, `/activity-feed`) before revalidating with
+    `If-None-Match`.
+    """
+
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    """
+    Minimum response size in bytes before gzip/brotli compression is applied.
+    """
+
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "5"))
+    """
+    Compression level used for gzip and brotli responses.
+    """
+
+    STREAM_MIN_LIMIT = int(os.getenv("STREAM_MIN_LIMIT", "200"))
+    """
+    Page size from which list endpoints stream their JSON array item by item
+    instead of building the whole response in memory. Clients can also request
+    streaming explicitly with `stream=true`.
+    """
+
+    # Password hashing
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    """
+    bcrypt work factor for new hashes. Passwords hashed with a different cost are
+    rehashed transparently at the next login. Use `python -m app.passwords
+    --target-ms 250` to pick a value for the deployed CPU.
+    """
+
+    BCRYPT_POOL_SIZE = int(os.getenv("BCRYPT_POOL_SIZE", "0"))
+    """
+    Number of worker processes used for bcrypt hashing and verification.
+    0 (the default) hashes inline on the request thread, which is what
+    serverless deployments (Vercel/AWS Lambda, without `/dev/shm`) need; set it
+    to the CPU count on long-running servers.
+    """
+
+    BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+    """
+    Maximum number of hashing jobs queued or running per server worker.
+    """
+
+    BCRYPT_QUEUE_TIMEOUT = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "2.0"))
+    """
+    Seconds a request waits for a hashing slot before it is rejected with 503.
+    """
+
+    # Rate limiting for auth routes (/login, /signup, /users, /firebase-google-login)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    """
+    Enables the per-IP and per-account token buckets on the auth routes.
+    """
+
+    RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "1"))
+    """
+    Auth requests per second refilled into each client IP's bucket.
+    """
+
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+    """
+    Maximum burst of auth requests from one client IP.
+    """
+
+    RATE_LIMIT_ACCOUNT_RATE = float(os.getenv("RATE_LIMIT_ACCOUNT_RATE", "0.2"))
+    """
+    Auth requests per second refilled into each account's (email's) bucket.
+    """
+
+    RATE_LIMIT_ACCOUNT_BURST = float(os.getenv("RATE_LIMIT_ACCOUNT_BURST", "5"))
+    """
+    Maximum burst of auth requests for one account.
+    """
+
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+    """
+    Maximum number of buckets kept per limiter; the least recently used are dropped first.
+    """
+
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1" if os.getenv("VERCEL") else "0"))
+    """
+    Number of proxies in front of the app that append to `X-Forwarded-For`
+    (1 on Vercel, the default there). The client IP is the entry that many hops
+    from the right, so clients cannot pick it by sending the header themselves.
+    Leave at 0 when the app is reached directly.
+    """
+
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    """
+    Secret required in the `X-Metrics-Token` header to read `/metrics`.
+    Unset disables the endpoint.
+    """
+
+    # Firebase ID token verification
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    """
+    Maximum number of verified ID tokens whose claims are cached until their `exp`.
+    Set to 0 to verify every request.
+    """
+
+    TOKEN_KEY_REFRESH_INTERVAL = float(os.getenv("TOKEN_KEY_REFRESH_INTERVAL", "3600"))
+    """
+    Seconds between background refreshes of Google's ID token signing certificates.
+    Set to 0 to disable the refresher.
+    """
+
+    # User lookups
+    USER_LOOKUP_FALLBACK = os.getenv("USER_LOOKUP_FALLBACK", "true").lower() in ("1", "true", "yes")
+    """
+    Fall back to a collection query when a user's lookup document is missing.
+    Disable once `python manage.py backfill-user-lookups` has run, so lookups of
+    unknown users cost a single read.
+    """
+
+    # Real-time push (/events server-sent events, /ws WebSocket)
+    EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "false" if os.getenv("VERCEL") else "true").lower() in ("1", "true", "yes")
+    """
+    Serves `/events` and `/ws` and publishes new messages, chat summaries and
+    approved items to connected clients. Each connection holds a server thread
+    for its lifetime, so this is off by default on Vercel, whose functions time
+    out and cannot upgrade to WebSocket; clients there poll the sync endpoints.
+    """
+
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    """
+    Maximum number of undelivered events per connection. A client that falls
+    further behind gets a `resync` event instead and should refetch.
+    """
+
+    EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "500"))
+    """
+    Maximum number of concurrent event stream connections per server worker.
+    """
+
+    EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+    """
+    Seconds between keep-alive comments on idle event streams.
+    """
+
+    # Incremental message sync (/get_messages with `since`)
+    MESSAGE_SYNC_MAX_LIMIT = int(os.getenv("MESSAGE_SYNC_MAX_LIMIT", "200"))
+    """
+    Upper bound on the messages and change records returned by one sync call.
+    """
+
+    # Item change feed (/items/changes)
+    ITEM_SYNC_MAX_LIMIT = int(os.getenv("ITEM_SYNC_MAX_LIMIT", "500"))
+    """
+    Upper bound on the changes read per collection by one change feed call.
+    """
+
+    # Unread message counters
+    UNREAD_COUNTER_SHARDS = int(os.getenv("UNREAD_COUNTER_SHARDS", "4"))
+    """
+    Number of shard documents per (user, conversation) unread counter. More shards
+    allow more messages per second into one conversation; reads cost one document
+    per shard in use.
+    """
+
+    # Conversation-keyed message reads
+    MESSAGE_READ_MODE = os.getenv("MESSAGE_READ_MODE", "legacy").lower()
+    """
+    How conversations are read: `legacy` (one query per direction), `dual` (both
+    the conversation key and the legacy queries, merged) or `conversation` (one
+    query). New messages always get the key. Run `python manage.py
+    backfill-conversation-keys`, switch to `dual` until the
+    `messages.dual_read.legacy_only` metric stays at 0, then use `conversation`.
+    """
+
+    # Message archive compaction
+    MESSAGE_ARCHIVE_AFTER_DAYS = float(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "30"))
+    """
+    Messages older than this many days are packed into `message_chunks` by the
+    compactor (`python manage.py compact-messages`). Set to 0 to disable compaction.
+    """
+
+    MESSAGE_CHUNK_SIZE = int(os.getenv("MESSAGE_CHUNK_SIZE", "200"))
+    """
+    Maximum number of messages per archive chunk (at most 499). Chunks also stop
+    growing at about 900 KB to stay within Firestore's document size limit.
+    """
+
+    # Maintenance scheduler
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false" if os.getenv("VERCEL") else "true").lower() in ("1", "true", "yes")
+    """
+    Runs the periodic maintenance jobs in each server worker. Jobs on shared data
+    take a lease in `scheduler_leases`, so only one worker runs them at a time.
+    Off by default on Vercel (serverless functions are frozen between requests);
+    run the jobs there from `/cron/maintenance` or `python manage.py run-maintenance`.
+    """
+
+    CRON_SECRET = os.getenv("CRON_SECRET", "")
+    """
+    Secret expected as `Authorization: Bearer <secret>` by `/cron/maintenance`
+    (Vercel Cron sends it automatically). Unset disables the endpoint.
+    """
+
+    SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+    """
+    Random spread applied to job intervals, as a fraction of the interval.
+    """
+
+    FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "10"))
+    """
+    Seconds a page of the activity feed is cached per worker; the scheduler
+    refreshes recently requested pages before they expire. Set to 0 to disable.
+    """
+
+    STALE_REPORT_DAYS = float(os.getenv("STALE_REPORT_DAYS", "30"))
+    """
+    Lost item reports still unapproved after this many days are moved to
+    `archived_lost_items`. Set to 0 to keep them.
+    """
+
+    STALE_REPORT_INTERVAL = float(os.getenv("STALE_REPORT_INTERVAL", "3600"))
+    """
+    Seconds between runs of the stale report archiver.
+    """
+
+    MESSAGE_COMPACT_INTERVAL = float(os.getenv("MESSAGE_COMPACT_INTERVAL", "21600"))
+    """
+    Seconds between message archive compaction passes. Set to 0 to run
+    compaction only through `python manage.py compact-messages`.
+    """
+
+    # Orphaned image garbage collection
+    IMAGE_GC_INTERVAL = float(os.getenv("IMAGE_GC_INTERVAL", "0"))
+    """
+    Seconds between scheduled runs of the orphaned image collector. Off (0) by
+    default; check the output of `python manage.py gc-images --dry-run` first.
+    """
+
+    IMAGE_GC_GRACE_HOURS = float(os.getenv("IMAGE_GC_GRACE_HOURS", "24"))
+    """
+    Images uploaded more recently than this are never collected, so uploads
+    whose report is still being written are not deleted.
+    """
+
+    IMAGE_GC_CONCURRENCY = int(os.getenv("IMAGE_GC_CONCURRENCY", "4"))
+    """
+    Number of orphaned images deleted in parallel.
+    """
+
+    IMAGE_GC_DELETE_RATE = float(os.getenv("IMAGE_GC_DELETE_RATE", "5"))
+    """
+    Maximum number of storage deletions per second.
+    """
+
+    # Admission control (load shedding) per route class
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+    """
+    Bounds in-flight requests per route class and rejects requests with 503
+    when they would wait longer than the class's budget.
+    """
+
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+    """
+    Maximum number of requests in flight per server worker. Keep it at or below
+    the worker's thread count.
+    """
+
+    ADMISSION_READ_RESERVE = int(os.getenv("ADMISSION_READ_RESERVE", "16"))
+    """
+    Slots of `ADMISSION_MAX_IN_FLIGHT` kept free for reads, which are also
+    admitted ahead of the other classes when requests wait.
+    """
+
+    ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "64"))
+    ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "24"))
+    ADMISSION_AUTH_LIMIT = int(os.getenv("ADMISSION_AUTH_LIMIT", "16"))
+    ADMISSION_UPLOAD_LIMIT = int(os.getenv("ADMISSION_UPLOAD_LIMIT", "8"))
+    """
+    Maximum number of requests in flight per class: reads (GET and the POST
+    message/chat reads), writes, auth (login, signup, user creation) and
+    uploads (multipart requests carrying an image).
+    """
+
+    ADMISSION_READ_BUDGET = float(os.getenv("ADMISSION_READ_BUDGET", "1"))
+    ADMISSION_WRITE_BUDGET = float(os.getenv("ADMISSION_WRITE_BUDGET", "2"))
+    ADMISSION_AUTH_BUDGET = float(os.getenv("ADMISSION_AUTH_BUDGET", "2"))
+    ADMISSION_UPLOAD_BUDGET = float(os.getenv("ADMISSION_UPLOAD_BUDGET", "3"))
+    """
+    Seconds a request of each class may wait for a slot. Requests whose
+    expected wait (from recent service times) exceeds the budget are rejected
+    immediately.
+    """
+
+    # Single-flight read coalescing
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+    """
+    Lets concurrent identical lost item list, feed and search reads share one
+    Firestore query per worker. Per-key counts are reported under
+    `singleflight.item_reads` on `/metrics`.
+    """
+
+    # Item statistics
+    ITEM_STATS_SHARDS = int(os.getenv("ITEM_STATS_SHARDS", "4"))
+    """
+    Number of shard documents per day (and for the totals) in `item_stats`.
+    Statistics reads cost (days + 1) x shards document reads; lowering the
+    value later leaves the counts of the dropped shards out of the sums.
+    """
+
+    ITEM_STATS_MAX_DAYS = int(os.getenv("ITEM_STATS_MAX_DAYS", "90"))
+    """
+    Maximum number of days `/statistics` returns.
+    """
+
+    # Nearby items search
+    GEO_MAX_RADIUS = float(os.getenv("GEO_MAX_RADIUS", "5000"))
+    """
+    Largest radius in meters `/items/nearby` searches.
+    """
+
+    GEO_NEAREST_START_RADIUS = float(os.getenv("GEO_NEAREST_START_RADIUS", "250"))
+    """
+    Radius in meters of the first nearest-items search; it doubles until enough
+    items are found or `GEO_MAX_RADIUS` is reached.
+    """
+
+    GEO_SCAN_LIMIT = int(os.getenv("GEO_SCAN_LIMIT", "500"))
+    """
+    Maximum number of items read per geohash range query, bounding the cost of
+    searches in very dense areas.
+    """
+
+    GEO_MAX_RANGES = int(os.getenv("GEO_MAX_RANGES", "24"))
+    """
+    Maximum number of geohash range queries per nearby search. More ranges
+    allow smaller cells that fit the search circle more tightly.
+    """
+
+    # Near-duplicate lost item reports
+    DEDUPE_ENABLED = os.getenv("DEDUPE_ENABLED", "true").lower() in ("1", "true", "yes")
+    """
+    Checks new lost item reports against recent open reports with MinHash/LSH
+    signatures kept in `lost_item_signatures`.
+    """
+
+    DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.6"))
+    """
+    Estimated Jaccard similarity of the description and location shingles above
+    which a report counts as a duplicate.
+    """
+
+    DEDUPE_MERGE = os.getenv("DEDUPE_MERGE", "true").lower() in ("1", "true", "yes")
+    """
+    Merge a user's repeated report into their open original. Duplicates of other
+    users' reports are only flagged with `possible_duplicate_of`.
+    """
+
+    DEDUPE_WINDOW_DAYS = float(os.getenv("DEDUPE_WINDOW_DAYS", "14"))
+    """
+    Only reports from the last this many days are considered.
+    """
+
+    DEDUPE_MAX_CANDIDATES = int(os.getenv("DEDUPE_MAX_CANDIDATES", "50"))
+    """
+    Maximum number of LSH candidates read per check.
+    """
+
+    # Request and startup profiling
+    PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+    """
+    Secret that enables profiling of a request sent with `X-Profile: <token>`,
+    and access to the saved profiles at `/profiles`. Unset disables both.
+    """
+
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+    """
+    Fraction of requests profiled at random (e.g. 0.001).
+    """
+
+    PROFILER_DIR = os.getenv("PROFILER_DIR", os.path.join(os.getenv("TMPDIR", "/tmp"), "khuje_nao_profiles"))
+    """
+    Directory where request and startup profiles are saved.
+    """
+
+    PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", "50"))
+    """
+    Number of most recent request profiles kept.
+    """
+
+    # Slow request log
+    REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+    """
+    Logs slow and sampled requests, with a timeline of their Firestore and
+    AppWrite calls, as JSON lines to `REQUEST_LOG_PATH`.
+    """
+
+    REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+    """
+    Requests taking at least this many milliseconds are always logged.
+    """
+
+    REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+    """
+    Fraction of the other requests logged at random, as a baseline.
+    """
+
+    REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH",
+                                 os.path.join(os.getenv("TMPDIR", "/tmp"), "khuje_nao_slow_requests.log"))
+    """
+    File the request log is written to.
+    """
+
+    REQUEST_LOG_MAX_BYTES = int(os.getenv("REQUEST_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    """
+    Size at which the log file is rotated.
+    """
+
+    REQUEST_LOG_BACKUPS = int(os.getenv("REQUEST_LOG_BACKUPS", "5"))
+    """
+    Number of rotated log files kept.
+    """
+
+    REQUEST_LOG_QUEUE_SIZE = int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "1000"))
+    """
+    Entries waiting to be written; further entries are dropped until the writer catches up.
+    """
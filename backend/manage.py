@@ -0,0 +1,141 @@
+"""
+Maintenance commands for the backend.
+
+Usage:
+    python manage.py backfill-user-lookups [--batch-size N]
+    python manage.py backfill-item-timestamps [--batch-size N]
+    python manage.py backfill-conversation-keys [--batch-size N] [--start-after MESSAGE_ID]
+    python manage.py compact-messages [--older-than-days D] [--chunk-size N] [--max-conversations N]
+    python manage.py gc-images [--dry-run] [--grace-hours H] [--concurrency N] [--rate R]
+    python manage.py profile-startup [--top N]
+    python manage.py run-maintenance [JOB ...]
+"""
+
+import argparse
+import json
+from config import Config
+from app import create_app
+
+
+def backfill_user_lookups(args):
+    """
+    Creates the email / NSU ID / Firebase UID lookup documents for existing users.
+    """
+    from app.models import UserModel
+    stats = UserModel.backfill_lookups(batch_size=args.batch_size)
+    print(json.dumps(stats))
+
+
+def backfill_item_timestamps(args):
+    """
+    Sets `updated_at` on lost and found items created before the change feed.
+    """
+    from app.models import ItemSyncModel
+    stats = ItemSyncModel.backfill_updated_at(batch_size=args.batch_size)
+    print(json.dumps(stats))
+
+
+def backfill_conversation_keys(args):
+    """
+    Adds conversation keys to existing messages, printing progress after each batch.
+    """
+    from app.models import MessageModel
+    stats = MessageModel.backfill_conversation_keys(
+        batch_size=args.batch_size,
+        start_after=args.start_after,
+        progress=lambda stats: print(json.dumps(stats), flush=True),
+    )
+    print(json.dumps(stats))
+
+
+def compact_messages(args):
+    """
+    Packs old messages into per-conversation archive chunks.
+    """
+    from app.models import MessageChunkModel
+    stats = MessageChunkModel.compact(
+        older_than_days=args.older_than_days,
+        chunk_size=args.chunk_size,
+        max_conversations=args.max_conversations,
+    )
+    print(json.dumps(stats))
+
+
+def gc_images(args):
+    """
+    Deletes (or with --dry-run, counts) storage images no item references.
+    """
+    from app.image_gc import collect_orphaned_images
+    stats = collect_orphaned_images(
+        dry_run=args.dry_run,
+        grace_hours=args.grace_hours,
+        concurrency=args.concurrency,
+        delete_rate=args.rate,
+    )
+    print(json.dumps(stats))
+
+
+def profile_startup(args):
+    """
+    Reports per-module import time and where `create_app` spends its time.
+    """
+    from app.profiling import startup_report
+    print(json.dumps(startup_report(create_app, top=args.top), indent=2))
+
+
+def run_maintenance(args):
+    """
+    Runs the maintenance jobs once (for cron on deployments without the scheduler).
+    """
+    from app.scheduler import run_maintenance as run
+    print(json.dumps(run(args.jobs or None), default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend maintenance commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-user-lookups", help="create missing user lookup documents")
+    backfill.add_argument("--batch-size", type=int, default=100, help="users per batch (at most 160)")
+    backfill.set_defaults(func=backfill_user_lookups)
+
+    timestamps = commands.add_parser("backfill-item-timestamps", help="set updated_at on existing items")
+    timestamps.add_argument("--batch-size", type=int, default=200)
+    timestamps.set_defaults(func=backfill_item_timestamps)
+
+    conversations = commands.add_parser("backfill-conversation-keys", help="add conversation keys to existing messages")
+    conversations.add_argument("--batch-size", type=int, default=200)
+    conversations.add_argument("--start-after", help="resume after this message ID (the last reported last_id)")
+    conversations.set_defaults(func=backfill_conversation_keys)
+
+    compact = commands.add_parser("compact-messages", help="archive old messages into chunk documents")
+    compact.add_argument("--older-than-days", type=float, help="defaults to MESSAGE_ARCHIVE_AFTER_DAYS")
+    compact.add_argument("--chunk-size", type=int, help="defaults to MESSAGE_CHUNK_SIZE")
+    compact.add_argument("--max-conversations", type=int, default=100)
+    compact.set_defaults(func=compact_messages)
+
+    images = commands.add_parser("gc-images", help="delete orphaned images from AppWrite storage")
+    images.add_argument("--dry-run", action="store_true", help="only count the orphaned images")
+    images.add_argument("--grace-hours", type=float, help="defaults to IMAGE_GC_GRACE_HOURS")
+    images.add_argument("--concurrency", type=int, help="defaults to IMAGE_GC_CONCURRENCY")
+    images.add_argument("--rate", type=float, help="deletions per second; defaults to IMAGE_GC_DELETE_RATE")
+    images.set_defaults(func=gc_images)
+
+    startup = commands.add_parser("profile-startup", help="profile module imports and app initialization")
+    startup.add_argument("--top", type=int, default=30)
+    startup.set_defaults(func=profile_startup, init_app=False)
+
+    maintenance = commands.add_parser("run-maintenance", help="run the scheduled maintenance jobs once")
+    maintenance.add_argument("jobs", nargs="*", help="job names; defaults to all enabled jobs")
+    maintenance.set_defaults(func=run_maintenance)
+
+    args = parser.parse_args()
+    # Initializes Firebase the same way the server does, without the background jobs
+    Config.SCHEDULER_ENABLED = False
+    if getattr(args, "init_app", True):
+        create_app()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()